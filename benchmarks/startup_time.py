@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Measure how long a module takes to import, and which of its imports cost the most.
+
+Each run imports the module in a fresh interpreter with `python -X importtime`
+and records the wall time of the import. The per-package breakdown comes from
+the fastest run: the time spent in each module's own import, summed by
+top-level package (interpreter start-up modules such as site included).
+
+    python benchmarks/startup_time.py                      # simple_gradio_app
+    python benchmarks/startup_time.py weather_api --repeat 5 --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_once(module):
+    """
+    Import a module in a new interpreter.
+
+    Returns:
+        (seconds, {top-level package: seconds spent importing its modules})
+    """
+    code = ("import time; started = time.perf_counter(); "
+            f"import {module}; "
+            "print(time.perf_counter() - started)")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=REPO_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    packages = {}
+    for line in result.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        # Summing self times credits every submodule to its package without double counting
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1e6
+    return float(result.stdout.strip().splitlines()[-1]), packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('module', nargs='?', default='simple_gradio_app')
+    parser.add_argument('--repeat', type=int, default=3, help='Imports to time (default 3)')
+    parser.add_argument('--top', type=int, default=15, help='Packages to list (default 15)')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    runs = [import_once(args.module) for _ in range(args.repeat)]
+    times = [seconds for seconds, _ in runs]
+    _, packages = min(runs, key=lambda run: run[0])
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    if args.json:
+        print(json.dumps({
+            'module': args.module,
+            'import_seconds': {'min': min(times), 'median': statistics.median(times), 'max': max(times)},
+            'packages': dict(slowest),
+        }, indent=2))
+        return
+
+    print(f"import {args.module}: min {min(times):.3f}s, median {statistics.median(times):.3f}s "
+          f"over {len(times)} runs")
+    for package, seconds in slowest:
+        print(f"  {seconds:8.3f}s  {package}")
+
+
+if __name__ == '__main__':
+    main()
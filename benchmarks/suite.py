@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Benchmark the weather API, the louver recommender and the render service.
+
+Everything runs locally and deterministically, so results from two commits on
+the same machine can be compared:
+
+- /weather and /validate-location go through the Flask test client with
+  Earth Engine and the geocoder replaced by stubs that sleep for
+  --ee-latency and --geocode-latency seconds. Caches live in a temporary
+  directory, so the uncached pass always misses and the cached pass always hits.
+- get_louver_recommendations runs over every dropdown combination against
+  synthetic catalogues of --catalogue-sizes louvers.
+- get_rain_class is timed for single means and for 8-sector wind roses.
+- /render/ is served by uvicorn from a copy of sample_code/backend, with
+  tools/fake_blender.py as Blender taking --render-latency seconds a render.
+
+Each benchmark reports its requests, errors, throughput and p50/p95/p99
+latency in milliseconds. The JSON results also record the commit and the
+settings; --compare checks a run against an earlier one.
+
+    python benchmarks/suite.py --output before.json
+    python benchmarks/suite.py --only weather,rain_class --output after.json
+    python benchmarks/suite.py --compare before.json after.json
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(REPO_DIR, 'sample_code', 'backend')
+
+# Bump when benchmarks are added, removed or change what they measure
+SCHEMA_VERSION = 1
+SUITES = ('weather', 'recommendations', 'rain_class', 'render')
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank q-th percentile (0-100) of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, errors, seconds, **extra):
+    """Benchmark result from per-call latencies (seconds) and the wall time of the run"""
+    ordered = sorted(latencies)
+    ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'seconds': round(seconds, 4),
+        'throughput': round(len(ordered) / seconds, 2) if seconds > 0 else None,
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'max_ms': ms(ordered[-1]) if ordered else None,
+        **extra
+    }
+
+
+def measure(calls, concurrency=1, **extra):
+    """
+    Time a list of calls, running `concurrency` of them at once.
+
+    Args:
+        calls: Zero-argument callables returning True on success
+        concurrency: Worker threads making the calls
+        **extra: Extra fields for the result
+
+    Returns:
+        The summarize() result
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed_call(call):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            ok = call()
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors += not ok
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for call in calls:
+            timed_call(call)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed_call, calls))
+    return summarize(latencies, errors, time.perf_counter() - started, concurrency=concurrency, **extra)
+
+
+def random_points(count, seed):
+    """Distinct land-or-sea coordinates, far enough apart to fall in different ERA5 cells"""
+    rng = random.Random(seed)
+    return [(round(rng.uniform(-60, 60), 4), round(rng.uniform(-180, 180), 4)) for _ in range(count)]
+
+
+class StubComputation:
+    """Stands in for an Earth Engine computed object: getInfo() sleeps, then returns a fixed result"""
+
+    def __init__(self, result, latency):
+        self.result = result
+        self.latency = latency
+
+    def getInfo(self):
+        time.sleep(self.latency)
+        return self.result
+
+
+def stub_era5_means(latitude, longitude):
+    """Plausible ERA5 band means for a point, the same on every run"""
+    return {
+        'mean_2m_air_temperature': 300.0 - abs(latitude) * 0.4,
+        'total_precipitation': 0.002 + 0.004 * abs(math.cos(math.radians(latitude * 3))),
+        'u_component_of_wind_10m': 3.0 * math.sin(math.radians(longitude)),
+        'v_component_of_wind_10m': 3.0 * math.cos(math.radians(longitude + latitude)),
+    }
+
+
+def load_weather_api(workdir, args):
+    """
+    Import weather_api with its caches in workdir, Earth Engine stubbed and ready,
+    and a stub geocoder that knows 'Site 0' .. 'Site <requests - 1>'.
+    """
+    os.environ.update({
+        'WEATHER_ENGINE': 'earthengine',
+        'CLIMATE_CACHE_PATH': os.path.join(workdir, 'climate_cache.sqlite3'),
+        'SITE_INDEX_PATH': os.path.join(workdir, 'site_index.sqlite3'),
+        'CLIMATE_GRID_PATH': os.path.join(workdir, 'no-grid'),
+        'GEOCODE_CACHE_PATH': os.path.join(workdir, 'geocode_cache.json'),
+        'GEOCODER_BACKEND': 'stub',
+        'GEOCODER_RATE_PER_SECOND': '0',
+        'LOG_LEVEL': 'WARNING',
+        'SLOW_REQUEST_SECONDS': '0',
+    })
+    sys.path.insert(0, REPO_DIR)
+    import weather_api
+    from ee_monitor import READY
+    from geocoding import StubGeocoder
+
+    # Stop the real initialization attempts and report Earth Engine as ready
+    monitor = weather_api.earth_engine
+    monitor.stop()
+    if monitor._thread is not None:
+        monitor._thread.join()
+    monitor.state = READY
+    monitor._ready.set()
+
+    def fetch_climate(latitude, longitude):
+        # Same round trip through ee_get_info() (slots, timeouts, latency
+        # histogram) as the real fetch_climate(), minus the expression building
+        means = weather_api.ee_get_info(StubComputation(stub_era5_means(latitude, longitude), args.ee_latency))
+        return weather_api.climate_from_means(means, weather_api.CLIMATE_START_DATE, weather_api.CLIMATE_END_DATE)
+
+    weather_api.fetch_climate = fetch_climate
+    places = {f'Site {i}': point for i, point in enumerate(random_points(args.requests, args.seed + 1))}
+    weather_api.geocoder.backend = StubGeocoder(places, latency=args.geocode_latency)
+    return weather_api
+
+
+def bench_weather(args, workdir):
+    weather_api = load_weather_api(workdir, args)
+    clients = threading.local()
+
+    def client():
+        if not hasattr(clients, 'client'):
+            clients.client = weather_api.app.test_client()
+        return clients.client
+
+    def get_weather(latitude, longitude):
+        return lambda: client().get(f'/weather?lat={latitude}&lon={longitude}').status_code == 200
+
+    def validate(address):
+        return lambda: client().post('/validate-location', json={'location': address}).status_code == 200
+
+    points = random_points(args.requests, args.seed)
+    addresses = [f'Site {i}' for i in range(args.requests)]
+    return {
+        'weather_uncached': measure([get_weather(*point) for point in points], args.concurrency,
+                                    ee_latency=args.ee_latency),
+        'weather_cached': measure([get_weather(*point) for point in points], args.concurrency),
+        'validate_location_uncached': measure([validate(address) for address in addresses], args.concurrency,
+                                              geocode_latency=args.geocode_latency),
+        'validate_location_cached': measure([validate(address) for address in addresses], args.concurrency),
+    }
+
+
+def synthetic_catalogue(size, seed):
+    """Catalogue DataFrame with the columns of LOUVER_CATALOGUE and random ratings"""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    airflow = rng.integers(40, 96, size)
+    water = rng.integers(50, 96, size)
+    return pd.DataFrame({
+        'model': [f'SYN-{i:06d}' for i in range(size)],
+        'airflow_rating': airflow,
+        'water_resistance': water,
+        'cost_factor': rng.uniform(0.8, 2.2, size).round(2),
+        'profile_depth': rng.choice([50, 70, 75, 100], size),
+        'rain_defense_class': np.select([water >= 85, water >= 75, water >= 65], ['A', 'B', 'C'], 'D'),
+    })
+
+
+def bench_recommendations(args, workdir):
+    os.environ.setdefault('CHART_CACHE_DIR', os.path.join(workdir, 'charts'))
+    sys.path.insert(0, REPO_DIR)
+    import simple_gradio_app as gradio_app
+
+    combinations = list(itertools.product(
+        gradio_app.BUILDING_TYPES, gradio_app.PRIMARY_PURPOSES, gradio_app.PERFORMANCE_PRIORITIES,
+        gradio_app.BUILDING_HEIGHTS, gradio_app.ENVIRONMENTAL_EXPOSURES))
+    results = {}
+    for size in args.catalogue_sizes:
+        catalogue = synthetic_catalogue(size, args.seed)
+        started = time.perf_counter()
+        gradio_app.reload_catalogue(catalogue)
+        index_seconds = time.perf_counter() - started
+        calls = [lambda inputs=inputs: len(gradio_app.get_louver_recommendations(*inputs)) > 0
+                 for inputs in combinations]
+        results[f'recommendations_{size}'] = measure(calls, catalogue_size=size,
+                                                     index_build_ms=round(index_seconds * 1000, 3))
+    return results
+
+
+def bench_rain_class(args, workdir):
+    sys.path.insert(0, REPO_DIR)
+    from rain_class import get_rain_class
+
+    rng = random.Random(args.seed)
+    exposures = ('low', 'medium', 'high')
+    means = [(rng.uniform(0, 15), rng.uniform(0, 12), rng.uniform(0, 2 * math.pi), rng.choice(exposures))
+             for _ in range(args.iterations)]
+    sectors = [2 * math.pi * i / 8 for i in range(8)]
+    roses = [(rng.uniform(0, 40), [rng.uniform(0, 12) for _ in sectors], sectors, rng.choice(exposures))
+             for _ in range(args.iterations)]
+    return {
+        'rain_class': measure([lambda values=values: get_rain_class(*values) in 'ABCD' for values in means]),
+        'rain_class_wind_rose': measure([lambda values=values: get_rain_class(*values) in 'ABCD'
+                                         for values in roses]),
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def multipart_body(fields, file_field, filename, content):
+    """multipart/form-data body and content type for one file plus text fields"""
+    boundary = uuid.uuid4().hex
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+             for name, value in fields.items()]
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+                 f'Content-Type: image/png\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def http_json(url, data=None, content_type=None, timeout=60):
+    """(status, decoded JSON body) of a GET, or a POST when data is given"""
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': content_type} if content_type else {})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+@contextlib.contextmanager
+def render_service(workdir, args):
+    """Base URL of a render service running from a copy of sample_code/backend with the fake Blender"""
+    service_dir = os.path.join(workdir, 'backend')
+    shutil.copytree(BACKEND_DIR, service_dir,
+                    ignore=shutil.ignore_patterns('__pycache__', 'uploads', 'assets', 'renders', 'models'))
+    os.makedirs(os.path.join(service_dir, 'models'))
+    with open(os.path.join(service_dir, 'models', 'phone.glb'), 'wb') as f:
+        f.write(random.Random(args.seed).randbytes(64 * 1024))
+
+    port = free_port()
+    env = dict(os.environ,
+               BLENDER_EXECUTABLE=f'{sys.executable} {os.path.join(service_dir, "tools", "fake_blender.py")}',
+               FAKE_BLENDER_DELAY=str(args.render_latency),
+               RENDER_PUBLIC_URL=f'http://127.0.0.1:{port}')
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port),
+                               '--log-level', 'warning'],
+                              cwd=service_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"Render service exited:\n{server.stderr.read().decode()[-2000:]}")
+            try:
+                if http_json(f'{base_url}/render/presets', timeout=1)[0] == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError('Render service did not start within 60s')
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def bench_render(args, workdir):
+    with open(os.path.join(BACKEND_DIR, 'input.png'), 'rb') as f:
+        photo = f.read()
+
+    with render_service(workdir, args) as base_url:
+        def render(i):
+            # Bytes after the PNG's end chunk give each request its own photo hash
+            content = photo + f'benchmark-{args.seed}-{i}'.encode()
+
+            def call():
+                body, content_type = multipart_body({'preset': 'preview'}, 'image', f'photo-{i}.png', content)
+                status, job = http_json(f'{base_url}/render/', body, content_type)
+                while status == 202 and job['status'] not in ('done', 'failed'):
+                    status, job = http_json(f'{base_url}/render/{job["job_id"]}?wait=30')
+                return status == 200 and job['status'] == 'done'
+            return call
+
+        # Start the Blender workers and build the model's asset before timing anything
+        if not render('warm-up')():
+            raise RuntimeError('Warm-up render failed')
+        count = args.render_requests
+        return {
+            'render_uncached': measure([render(i) for i in range(count)], args.concurrency,
+                                       render_latency=args.render_latency),
+            'render_cached': measure([render(i) for i in range(count)], args.concurrency),
+        }
+
+
+def git_revision():
+    """Commit the benchmarks ran on, and whether tracked files had local changes"""
+    def git(*command):
+        result = subprocess.run(['git', *command], cwd=REPO_DIR, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {'commit': git('rev-parse', 'HEAD'), 'dirty': bool(status) if status is not None else None}
+
+
+def run(args):
+    benchmarks = {
+        'weather': bench_weather,
+        'recommendations': bench_recommendations,
+        'rain_class': bench_rain_class,
+        'render': bench_render,
+    }
+    results = {}
+    skipped = {}
+    with tempfile.TemporaryDirectory(prefix='louverboy-bench-') as workdir:
+        for suite in args.only:
+            print(f"Running {suite} benchmarks...", file=sys.stderr)
+            suite_dir = os.path.join(workdir, suite)
+            os.makedirs(suite_dir)
+            try:
+                # Code under test may print progress; keep stdout for the JSON results
+                with contextlib.redirect_stdout(sys.stderr):
+                    results.update(benchmarks[suite](args, suite_dir))
+            except ImportError as e:
+                print(f"Skipping {suite}: {e}", file=sys.stderr)
+                skipped[suite] = str(e)
+    return {
+        'schema': SCHEMA_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'settings': {
+            'requests': args.requests,
+            'render_requests': args.render_requests,
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+            'catalogue_sizes': args.catalogue_sizes,
+            'ee_latency': args.ee_latency,
+            'geocode_latency': args.geocode_latency,
+            'render_latency': args.render_latency,
+            'seed': args.seed,
+        },
+        'skipped': skipped,
+        'results': results,
+    }
+
+
+def compare(baseline, current, tolerance):
+    """
+    Print p95 latency and throughput changes per benchmark.
+
+    Returns:
+        Names of benchmarks whose p95 rose, or throughput fell, by more than tolerance
+    """
+    if baseline['settings'] != current['settings']:
+        print("Warning: the runs used different settings; differences may not be regressions", file=sys.stderr)
+    regressions = []
+    print(f"{'benchmark':32} {'p95 ms':>21} {'change':>8} {'req/s':>21} {'change':>8}")
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:32} (new)")
+            continue
+        changes = []
+        for key, worse in (('p95_ms', 1), ('throughput', -1)):
+            old, new = before.get(key), result.get(key)
+            change = (new - old) / old if old and new is not None else None
+            changes.append((old, new, change))
+            if change is not None and change * worse > tolerance:
+                regressions.append(name)
+        cells = ''.join(f" {old!s:>10}->{new!s:<10} " + (f"{change:+8.1%}" if change is not None else f"{'':8}")
+                        for old, new, change in changes)
+        print(f"{name:32}{cells}{'  REGRESSION' if name in regressions else ''}")
+    return sorted(set(regressions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', default=','.join(SUITES),
+                        help=f"Comma-separated benchmarks to run (default {','.join(SUITES)})")
+    parser.add_argument('--requests', type=int, default=200, help='Requests per weather benchmark (default 200)')
+    parser.add_argument('--render-requests', type=int, default=20, help='Requests per render benchmark (default 20)')
+    parser.add_argument('--iterations', type=int, default=2000, help='Calls per rain class benchmark (default 2000)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent HTTP requests (default 8)')
+    parser.add_argument('--catalogue-sizes', default='10,1000,100000',
+                        help='Synthetic catalogue sizes for the recommender (default 10,1000,100000)')
+    parser.add_argument('--ee-latency', type=float, default=0.5, help='Stub Earth Engine seconds per call (default 0.5)')
+    parser.add_argument('--geocode-latency', type=float, default=0.2,
+                        help='Stub geocoder seconds per lookup (default 0.2)')
+    parser.add_argument('--render-latency', type=float, default=0.2, help='Fake Blender seconds per render (default 0.2)')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the synthetic inputs (default 1)')
+    parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+    parser.add_argument('--compare', nargs='+', metavar='RESULTS',
+                        help='Compare a baseline results file with a new run, or with a second file')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Relative p95/throughput change reported as a regression (default 0.2)')
+    args = parser.parse_args()
+
+    args.only = [suite.strip() for suite in args.only.split(',') if suite.strip()]
+    unknown = set(args.only) - set(SUITES)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    args.catalogue_sizes = [int(size) for size in args.catalogue_sizes.split(',')]
+
+    if args.compare and len(args.compare) > 2:
+        parser.error('--compare takes a baseline file and optionally a second results file')
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+    else:
+        current = run(args)
+        for name, result in current['results'].items():
+            print(f"{name:32} p50 {result['p50_ms']}ms  p95 {result['p95_ms']}ms  p99 {result['p99_ms']}ms  "
+                  f"{result['throughput']} req/s  {result['errors']} errors", file=sys.stderr)
+        text = json.dumps(current, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text + '\n')
+        elif not args.compare:
+            print(text)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.tolerance)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Comparison charts for the Gradio app, rendered off the request threads to cached PNGs.
+
+Each chart is drawn on its own matplotlib Figure with the Agg canvas, never
+through pyplot, so concurrent renders share no "current figure" and nothing
+is left open afterwards. Renders run on a small thread pool and are written
+to a cache directory keyed by a hash of the plotted values: a recommendation
+set is drawn once and every later request for it is a file lookup. Two
+requests for the same uncached chart wait on one render. matplotlib is
+imported when the first chart is drawn.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Bump when the chart's look changes so cached PNGs are redrawn
+CHART_VERSION = 1
+CHART_STYLE = 'seaborn-v0_8'
+
+_matplotlib = None
+_matplotlib_lock = threading.Lock()
+
+
+def agg_figure_classes():
+    """(Figure, FigureCanvasAgg), importing matplotlib and applying the chart style on first use"""
+    global _matplotlib
+    with _matplotlib_lock:
+        if _matplotlib is None:
+            import matplotlib.style
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            # Sets the rcParams defaults once, before any figure exists; figures only read them
+            matplotlib.style.use(CHART_STYLE)
+            _matplotlib = (Figure, FigureCanvasAgg)
+        return _matplotlib
+
+
+def draw_comparison_chart(path, models, airflow, water, cost):
+    """
+    Draw the grouped bar chart of recommended louvers to a PNG file.
+
+    Args:
+        path: Output PNG path; written to a temporary file and renamed into place
+        models: Model names, one group of bars each
+        airflow: Airflow ratings (0-100)
+        water: Water resistance ratings (0-100)
+        cost: Cost factors, scaled by 50 to share the rating axis
+    """
+    Figure, FigureCanvasAgg = agg_figure_classes()
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+
+    x = list(range(len(models)))
+    width = 0.25
+    axes.bar([i - width for i in x], airflow, width, label='Airflow Rating', color='skyblue')
+    axes.bar(x, water, width, label='Water Resistance', color='navy')
+    axes.bar([i + width for i in x], [c * 50 for c in cost], width, label='Cost (scaled)', color='darkred')
+
+    axes.set_xlabel('Louver Models')
+    axes.set_ylabel('Rating')
+    axes.set_title('Louver Comparison')
+    axes.set_xticks(x)
+    axes.set_xticklabels(models)
+    axes.set_ylim(0, 100)
+    axes.legend()
+    axes.grid(axis='y', linestyle='--', alpha=0.7)
+
+    temp_path = f'{path}.{threading.get_ident()}.tmp'
+    figure.savefig(temp_path, format='png')
+    os.replace(temp_path, path)
+
+
+class ChartCache:
+    """
+    Renders comparison charts on a thread pool and keeps the PNGs on disk.
+
+    Args:
+        cache_dir: Directory for the PNG files (created if missing)
+        workers: Charts rendered at the same time
+    """
+
+    def __init__(self, cache_dir, workers=2):
+        self.cache_dir = cache_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chart')
+        self.lock = threading.Lock()
+        # Key to the future of a render in progress
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def chart_key(models, airflow, water, cost):
+        """Hash of everything that appears on the chart"""
+        payload = json.dumps([CHART_VERSION, list(models), list(airflow), list(water), list(cost)])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def comparison_chart(self, models, airflow, water, cost):
+        """
+        Path of the comparison chart PNG for a set of louvers, rendering it if needed.
+
+        Args are as for draw_comparison_chart(), as plain Python sequences.
+
+        Returns:
+            Path of the PNG file
+        """
+        models, airflow, water, cost = (list(values) for values in (models, airflow, water, cost))
+        key = self.chart_key(models, airflow, water, cost)
+        path = os.path.join(self.cache_dir, f'{key}.png')
+        with self.lock:
+            if os.path.exists(path):
+                self.hits += 1
+                return path
+            future = self.pending.get(key)
+            if future is None:
+                self.misses += 1
+                future = self.executor.submit(draw_comparison_chart, path, models, airflow, water, cost)
+                self.pending[key] = future
+        try:
+            future.result()
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+        return path
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'rendering': len(self.pending),
+        }
@@ -0,0 +1,158 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+
+# ERA5 is published on a 0.25° grid (~28 km at the equator) with pixel centres
+# on multiples of 0.25°. weather_api.py reduces in that grid, so every coordinate
+# nearer one pixel centre than any other reads the same pixel; cells are keyed
+# on the nearest centre to match.
+ERA5_CELL_DEG = 0.25
+
+
+class ClimateCache:
+    """
+    Persistent climate result cache keyed by ERA5 grid cell.
+
+    Results are stored in SQLite so they survive restarts. The cache is bounded
+    by `max_entries` (least recently used cells are evicted first) and entries
+    older than `ttl_seconds` are treated as misses and dropped.
+
+    Args:
+        path: SQLite database file (':memory:' for a throwaway cache)
+        namespace: Identifies the climate window/settings the values belong to.
+            Entries from another namespace are never returned.
+        cell_size_deg: Size of a cache cell in degrees
+        max_entries: Maximum number of cells kept on disk
+        ttl_seconds: Maximum age of an entry, or None to keep entries forever
+    """
+
+    def __init__(self, path, namespace='default', cell_size_deg=ERA5_CELL_DEG,
+                 max_entries=10000, ttl_seconds=None):
+        self.path = path
+        self.namespace = namespace
+        self.cell_size_deg = cell_size_deg
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS climate_cache (
+                namespace TEXT NOT NULL,
+                cell_lat INTEGER NOT NULL,
+                cell_lon INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, cell_lat, cell_lon)
+            )
+        """)
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS climate_cache_lru ON climate_cache (namespace, last_access)'
+        )
+        self._conn.commit()
+        self._entries = self._conn.execute(
+            'SELECT COUNT(*) FROM climate_cache WHERE namespace = ?', (namespace,)
+        ).fetchone()[0]
+
+    def cell_key(self, latitude, longitude):
+        """Snap a coordinate to the integer (row, column) of the nearest cell centre"""
+        longitude = ((longitude + 180.0) % 360.0) - 180.0
+        column = int(math.floor(longitude / self.cell_size_deg + 0.5))
+        # -180° and 180° are the same meridian
+        if column == int(round(180.0 / self.cell_size_deg)):
+            column = -column
+        return (int(math.floor(latitude / self.cell_size_deg + 0.5)), column)
+
+    def get(self, latitude, longitude):
+        """Return the cached result for the cell containing the point, or None"""
+        cell_lat, cell_lon = self.cell_key(latitude, longitude)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data, created_at FROM climate_cache '
+                'WHERE namespace = ? AND cell_lat = ? AND cell_lon = ?',
+                (self.namespace, cell_lat, cell_lon)
+            ).fetchone()
+
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute(
+                    'DELETE FROM climate_cache WHERE namespace = ? AND cell_lat = ? AND cell_lon = ?',
+                    (self.namespace, cell_lat, cell_lon)
+                )
+                self._conn.commit()
+                self._entries -= 1
+                self.evictions += 1
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                'UPDATE climate_cache SET last_access = ? '
+                'WHERE namespace = ? AND cell_lat = ? AND cell_lon = ?',
+                (now, self.namespace, cell_lat, cell_lon)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, latitude, longitude, value):
+        """Store a JSON-serializable result for the cell containing the point"""
+        cell_lat, cell_lon = self.cell_key(latitude, longitude)
+        now = time.time()
+        data = json.dumps(value)
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE climate_cache SET data = ?, created_at = ?, last_access = ? '
+                'WHERE namespace = ? AND cell_lat = ? AND cell_lon = ?',
+                (data, now, now, self.namespace, cell_lat, cell_lon)
+            )
+            if cursor.rowcount == 0:
+                self._conn.execute(
+                    'INSERT INTO climate_cache VALUES (?, ?, ?, ?, ?, ?)',
+                    (self.namespace, cell_lat, cell_lon, data, now, now)
+                )
+                self._entries += 1
+
+            overflow = self._entries - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    'DELETE FROM climate_cache WHERE rowid IN ('
+                    'SELECT rowid FROM climate_cache WHERE namespace = ? '
+                    'ORDER BY last_access LIMIT ?)',
+                    (self.namespace, overflow)
+                )
+                self._entries -= overflow
+                self.evictions += overflow
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every entry in this cache's namespace"""
+        with self._lock:
+            self._conn.execute('DELETE FROM climate_cache WHERE namespace = ?', (self.namespace,))
+            self._conn.commit()
+            self._entries = 0
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current cache size"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'evictions': self.evictions,
+            'entries': self._entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'cell_size_deg': self.cell_size_deg,
+        }
@@ -0,0 +1,266 @@
+"""
+Offline ERA5 climatology grid.
+
+A grid holds the mean of each ERA5 band over a fixed period on a regular
+lat/lon lattice covering a bounding box. Values are stored in raw ERA5 units
+(K, m, m/s) so weather_api.climate_from_means() can convert them exactly like
+an Earth Engine result.
+
+A grid is two files sharing a base path:
+    <base>.npy   float32 array of shape (bands, rows, columns), rows south to north
+    <base>.json  metadata (bands, bounding box, resolution, period, source)
+
+Build a grid once with Earth Engine, or a synthetic one for offline testing:
+
+    python climate_grid.py build --bbox 1.1 103.5 1.5 104.1 --out grids/era5_2015_2020
+    python climate_grid.py build --bbox -10 95 10 120 --synthetic --out grids/synthetic
+    python climate_grid.py lookup grids/era5_2015_2020 1.35 103.82
+"""
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+
+GRID_BANDS = ['mean_2m_air_temperature', 'total_precipitation', 'u_component_of_wind_10m', 'v_component_of_wind_10m']
+DEFAULT_START_DATE = '2015-07-09'
+DEFAULT_END_DATE = '2020-07-09'
+DEFAULT_RESOLUTION = 0.25  # ERA5 native grid spacing in degrees
+
+# computePixels refuses large requests, so Earth Engine builds are fetched in tiles
+EE_TILE_SIZE = 256
+
+
+def _base_path(path):
+    """Strip a .npy/.json suffix so either file (or the bare base) can be passed"""
+    root, ext = os.path.splitext(path)
+    return root if ext in ('.npy', '.json') else path
+
+
+class ClimateGrid:
+    """
+    Regular lat/lon grid of mean ERA5 band values with bilinear point lookup.
+
+    Args:
+        values: Array of shape (bands, rows, columns); row 0 is the southern edge
+        south: Latitude of the first row of grid points
+        west: Longitude of the first column of grid points
+        resolution: Spacing between grid points in degrees
+        metadata: Dict with at least 'bands', 'start_date' and 'end_date'
+    """
+
+    def __init__(self, values, south, west, resolution, metadata):
+        self.values = values
+        self.south = float(south)
+        self.west = float(west)
+        self.resolution = float(resolution)
+        self.metadata = metadata
+        self.bands = list(metadata['bands'])
+        self.rows = values.shape[1]
+        self.columns = values.shape[2]
+
+    @property
+    def north(self):
+        return self.south + (self.rows - 1) * self.resolution
+
+    @property
+    def east(self):
+        return self.west + (self.columns - 1) * self.resolution
+
+    @classmethod
+    def load(cls, path):
+        """Open a saved grid; the value array is memory-mapped, not read into memory"""
+        base = _base_path(path)
+        with open(base + '.json') as f:
+            metadata = json.load(f)
+        values = np.load(base + '.npy', mmap_mode='r')
+        return cls(values, metadata['south'], metadata['west'], metadata['resolution'], metadata)
+
+    def save(self, path):
+        """Write the grid to <path>.npy and <path>.json"""
+        base = _base_path(path)
+        directory = os.path.dirname(base)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.save(base + '.npy', np.ascontiguousarray(self.values, dtype=np.float32))
+        metadata = dict(self.metadata, south=self.south, west=self.west, north=self.north,
+                        east=self.east, resolution=self.resolution, bands=self.bands)
+        with open(base + '.json', 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+    def lookup(self, latitudes, longitudes):
+        """
+        Bilinearly interpolate every band at many points at once.
+
+        Args:
+            latitudes: Array-like of latitudes in degrees
+            longitudes: Array-like of longitudes in degrees (same shape)
+
+        Returns:
+            A dict of band name to float64 array; points outside the grid are NaN
+        """
+        lat = np.asarray(latitudes, dtype=np.float64)
+        lon = np.asarray(longitudes, dtype=np.float64)
+
+        row = (lat - self.south) / self.resolution
+        col = (lon - self.west) / self.resolution
+        inside = (row >= 0) & (row <= self.rows - 1) & (col >= 0) & (col <= self.columns - 1)
+
+        # Clamp the lower corner so points on the north/east edge still get a full cell
+        row0 = np.clip(np.floor(np.nan_to_num(row)), 0, max(self.rows - 2, 0)).astype(np.intp)
+        col0 = np.clip(np.floor(np.nan_to_num(col)), 0, max(self.columns - 2, 0)).astype(np.intp)
+        row1 = np.minimum(row0 + 1, self.rows - 1)
+        col1 = np.minimum(col0 + 1, self.columns - 1)
+        dy = np.clip(row - row0, 0.0, 1.0)
+        dx = np.clip(col - col0, 0.0, 1.0)
+
+        # Fancy indexing on the memory map only touches the four corner cells per point
+        v00 = self.values[:, row0, col0]
+        v01 = self.values[:, row0, col1]
+        v10 = self.values[:, row1, col0]
+        v11 = self.values[:, row1, col1]
+        interpolated = (v00 * (1 - dx) * (1 - dy) + v01 * dx * (1 - dy)
+                        + v10 * (1 - dx) * dy + v11 * dx * dy)
+        interpolated = np.where(inside, interpolated, np.nan)
+
+        return {band: interpolated[i] for i, band in enumerate(self.bands)}
+
+    def lookup_point(self, latitude, longitude):
+        """Interpolate one point; returns a dict of band name to float, or None if outside the grid"""
+        values = self.lookup([latitude], [longitude])
+        if any(math.isnan(values[band][0]) for band in self.bands):
+            return None
+        return {band: float(values[band][0]) for band in self.bands}
+
+
+def _grid_axes(bbox, resolution):
+    """Grid point coordinates covering bbox = (south, west, north, east)"""
+    south, west, north, east = bbox
+    if north <= south or east <= west:
+        raise ValueError('Bounding box must be south west north east with north > south and east > west')
+    rows = int(math.ceil((north - south) / resolution - 1e-9)) + 1
+    columns = int(math.ceil((east - west) / resolution - 1e-9)) + 1
+    latitudes = south + np.arange(rows) * resolution
+    longitudes = west + np.arange(columns) * resolution
+    return latitudes, longitudes
+
+
+def build_synthetic_grid(bbox, resolution=DEFAULT_RESOLUTION):
+    """
+    Build a deterministic, smooth synthetic grid for testing without network access.
+
+    The fields are plausible in magnitude (tropics warmer and wetter, winds of a
+    few m/s) but are not real climate data.
+    """
+    latitudes, longitudes = _grid_axes(bbox, resolution)
+    lat, lon = np.meshgrid(np.radians(latitudes), np.radians(longitudes), indexing='ij')
+
+    values = np.stack([
+        273.15 + 28.0 * np.cos(lat) ** 2 - 4.0,            # mean_2m_air_temperature (K)
+        0.001 + 0.006 * np.cos(lat) ** 4 * (1.2 + np.sin(3 * lon)) / 2.2,  # total_precipitation (m/day)
+        4.0 * np.sin(2 * lat) + 1.5 * np.cos(lon),          # u_component_of_wind_10m (m/s)
+        2.0 * np.cos(lat) * np.sin(2 * lon),                # v_component_of_wind_10m (m/s)
+    ]).astype(np.float32)
+
+    metadata = {
+        'bands': GRID_BANDS,
+        'start_date': DEFAULT_START_DATE,
+        'end_date': DEFAULT_END_DATE,
+        'source': 'synthetic',
+    }
+    return ClimateGrid(values, latitudes[0], longitudes[0], resolution, metadata)
+
+
+def build_earth_engine_grid(bbox, resolution=DEFAULT_RESOLUTION, start_date=DEFAULT_START_DATE,
+                            end_date=DEFAULT_END_DATE, project=None):
+    """
+    Export the mean ERA5 image over a period for a bounding box from Earth Engine.
+
+    Pixels are requested with ee.data.computePixels on a grid whose pixel
+    centres are the grid points, in tiles of EE_TILE_SIZE x EE_TILE_SIZE.
+    """
+    import ee
+
+    ee.Initialize(project=project)
+
+    latitudes, longitudes = _grid_axes(bbox, resolution)
+    rows, columns = len(latitudes), len(longitudes)
+    image = ee.ImageCollection('ECMWF/ERA5/DAILY') \
+              .select(GRID_BANDS) \
+              .filterDate(start_date, end_date) \
+              .mean()
+
+    values = np.full((len(GRID_BANDS), rows, columns), np.nan, dtype=np.float32)
+    north = latitudes[-1]
+    west = longitudes[0]
+
+    for top in range(0, rows, EE_TILE_SIZE):
+        for left in range(0, columns, EE_TILE_SIZE):
+            height = min(EE_TILE_SIZE, rows - top)
+            width = min(EE_TILE_SIZE, columns - left)
+            print(f"Fetching tile rows {top}-{top + height} columns {left}-{left + width}")
+            # Rows are returned north to south; top is counted down from the northern edge
+            tile = ee.data.computePixels({
+                'expression': image,
+                'fileFormat': 'NUMPY_NDARRAY',
+                'grid': {
+                    'dimensions': {'width': width, 'height': height},
+                    'affineTransform': {
+                        'scaleX': resolution,
+                        'shearX': 0,
+                        'translateX': west + (left - 0.5) * resolution,
+                        'shearY': 0,
+                        'scaleY': -resolution,
+                        'translateY': north - (top - 0.5) * resolution,
+                    },
+                    'crsCode': 'EPSG:4326',
+                },
+            })
+            south_row = rows - top - height
+            for i, band in enumerate(GRID_BANDS):
+                values[i, south_row:rows - top, left:left + width] = np.flipud(tile[band])
+
+    metadata = {
+        'bands': GRID_BANDS,
+        'start_date': start_date,
+        'end_date': end_date,
+        'source': 'ECMWF/ERA5/DAILY via Google Earth Engine',
+    }
+    return ClimateGrid(values, latitudes[0], longitudes[0], resolution, metadata)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query an offline ERA5 climatology grid')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='Export a grid for a bounding box')
+    build.add_argument('--bbox', nargs=4, type=float, required=True, metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'))
+    build.add_argument('--resolution', type=float, default=DEFAULT_RESOLUTION, help='Grid spacing in degrees')
+    build.add_argument('--start', default=DEFAULT_START_DATE)
+    build.add_argument('--end', default=DEFAULT_END_DATE)
+    build.add_argument('--project', default='ivory-alcove-426308-d9', help='Earth Engine project ID')
+    build.add_argument('--synthetic', action='store_true', help='Generate synthetic data instead of calling Earth Engine')
+    build.add_argument('--out', required=True, help='Output base path (writes .npy and .json)')
+
+    lookup = subparsers.add_parser('lookup', help='Interpolate a grid at a point')
+    lookup.add_argument('grid')
+    lookup.add_argument('lat', type=float)
+    lookup.add_argument('lon', type=float)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        if args.synthetic:
+            grid = build_synthetic_grid(args.bbox, args.resolution)
+        else:
+            grid = build_earth_engine_grid(args.bbox, args.resolution, args.start, args.end, args.project)
+        grid.save(args.out)
+        print(f"Wrote {grid.rows}x{grid.columns} grid to {_base_path(args.out)}.npy")
+    else:
+        grid = ClimateGrid.load(args.grid)
+        print(json.dumps(grid.lookup_point(args.lat, args.lon), indent=2))
+
+
+if __name__ == '__main__':
+    main()
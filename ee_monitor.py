@@ -0,0 +1,139 @@
+"""
+Background Earth Engine initialization and liveness probing.
+
+ee.Initialize() and the first request can take seconds, or fail while the
+network or the Earth Engine API is having a bad minute. EarthEngineMonitor
+does both on a daemon thread, so the server starts serving cached and offline
+data at once, and retries with exponential backoff until Earth Engine
+answers. Once it is ready, a lightweight probe runs periodically; a failing
+probe marks it unavailable again and the probes back off the same way until
+it recovers.
+"""
+import logging
+import random
+import threading
+import time
+
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Readiness states reported by EarthEngineMonitor.status()
+STARTING = 'starting'        # start() not called yet
+INITIALIZING = 'initializing'  # retrying ee.Initialize() and the first probe
+READY = 'ready'
+DEGRADED = 'degraded'        # was ready, the latest probe failed
+
+
+class EarthEngineMonitor:
+    """
+    Initializes Earth Engine in the background and keeps checking it is alive.
+
+    Args:
+        initialize: Callable that calls ee.Initialize(); raises on failure
+        probe: Callable making a cheap Earth Engine request; raises on failure
+        probe_interval: Seconds between probes while Earth Engine is ready
+        initial_backoff: First retry delay after a failure, doubled per failure
+        max_backoff: Upper bound on the retry delay
+    """
+
+    def __init__(self, initialize, probe, probe_interval=60.0, initial_backoff=1.0, max_backoff=300.0):
+        self.initialize = initialize
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self.state = STARTING
+        self.initialized = False
+        self.attempts = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.last_success = None
+        self.ready_since = None
+        self.probe_latency = Histogram()
+
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        """True while Earth Engine is initialized and the latest probe succeeded"""
+        return self.state == READY
+
+    def start(self):
+        """Start the background thread; returns immediately"""
+        if self._thread is None:
+            self.state = INITIALIZING
+            self._thread = threading.Thread(target=self._run, name='earthengine-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def wait_ready(self, timeout=None):
+        """Block until Earth Engine is ready or the timeout passes; returns ready"""
+        return self._ready.wait(timeout)
+
+    def check(self):
+        """
+        One initialization attempt (until the first success) followed by a probe.
+
+        Returns:
+            True if Earth Engine answered
+        """
+        self.attempts += 1
+        started = time.perf_counter()
+        try:
+            if not self.initialized:
+                self.initialize()
+                self.initialized = True
+            self.probe()
+        except Exception as e:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = f'{type(e).__name__}: {e}'
+            if self.state == READY:
+                self.state = DEGRADED
+                self.ready_since = None
+                self._ready.clear()
+            logger.warning("Earth Engine check failed (%d in a row): %s", self.consecutive_failures, e)
+            return False
+
+        self.probe_latency.observe(time.perf_counter() - started)
+        self.consecutive_failures = 0
+        self.last_success = time.time()
+        if self.state != READY:
+            self.ready_since = self.last_success
+            logger.info("Earth Engine is ready (after %d checks)", self.attempts)
+        self.state = READY
+        self._ready.set()
+        return True
+
+    def next_delay(self):
+        """Seconds until the next check: the probe interval, or the backoff after failures"""
+        if self.consecutive_failures == 0:
+            return self.probe_interval
+        backoff = min(self.max_backoff, self.initial_backoff * 2 ** (self.consecutive_failures - 1))
+        # Jitter so many workers started together don't retry in lockstep
+        return backoff * random.uniform(0.8, 1.2)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.next_delay())
+
+    def status(self):
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error,
+            'last_success': self.last_success,
+            'ready_since': self.ready_since,
+            'probe_latency': self.probe_latency.snapshot(),
+        }
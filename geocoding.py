@@ -0,0 +1,325 @@
+"""
+Cached, rate-limited geocoding shared by the weather API endpoints.
+
+Nominatim's usage policy allows about one request per second, so every lookup
+goes through a normalized-address LRU cache (persisted to disk), identical
+lookups already in flight are shared instead of repeated, and requests that do
+reach the backend pass through a token bucket.
+
+Backends are anything with a geopy-style `geocode(query)` method returning an
+object with `address`, `latitude` and `longitude` (or None when not found).
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_address(query):
+    """Canonical cache key for an address, folding case, Unicode form, spacing and comma style"""
+    query = unicodedata.normalize('NFKC', query).casefold()
+    query = re.sub(r'\s*,\s*', ', ', query)
+    query = re.sub(r'\s+', ' ', query)
+    return query.strip(' ,.')
+
+
+class GeocodeResult:
+    """Geocoded location with the same attributes as a geopy Location"""
+
+    def __init__(self, address, latitude, longitude):
+        self.address = address
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+
+    def to_dict(self):
+        return {'address': self.address, 'latitude': self.latitude, 'longitude': self.longitude}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['address'], data['latitude'], data['longitude'])
+
+
+class GeocodingRateLimited(Exception):
+    """Raised when a lookup could not get a rate-limit token in time"""
+
+
+class StubGeocoder:
+    """
+    Local geocoder backend for tests and offline runs.
+
+    Args:
+        places: Dict of address to (latitude, longitude) or
+            (latitude, longitude, display address)
+        latency: Seconds to sleep per lookup, to mimic a remote service
+    """
+
+    def __init__(self, places=None, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.places = {}
+        for query, place in (places or {}).items():
+            latitude, longitude = place[0], place[1]
+            address = place[2] if len(place) > 2 else query
+            self.places[normalize_address(query)] = GeocodeResult(address, latitude, longitude)
+
+    @classmethod
+    def from_file(cls, path, latency=0.0):
+        """Load places from a JSON object of address -> [lat, lon] or [lat, lon, display address]"""
+        with open(path) as f:
+            return cls(json.load(f), latency)
+
+    def geocode(self, query):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.places.get(normalize_address(query))
+
+
+def create_backend(name, stub_path=None, user_agent='louvre_selector', timeout=10):
+    """
+    Build a geocoder backend by name.
+
+    Args:
+        name: 'nominatim' or 'stub'
+        stub_path: JSON places file for the stub backend (optional)
+        user_agent: Nominatim user agent
+        timeout: Nominatim request timeout in seconds
+    """
+    if name == 'nominatim':
+        from geopy.geocoders import Nominatim
+        return Nominatim(user_agent=user_agent, timeout=timeout)
+    if name == 'stub':
+        if stub_path:
+            return StubGeocoder.from_file(stub_path)
+        return StubGeocoder()
+    raise ValueError(f"Unknown geocoder backend '{name}', expected 'nominatim' or 'stub'")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Args:
+        rate: Tokens added per second
+        capacity: Maximum burst size
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Take one token, waiting up to `timeout` seconds (forever if None). Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class GeocodeCache:
+    """
+    In-memory LRU cache of geocoding results, saved to a JSON file.
+
+    Values are GeocodeResult objects, or None for addresses the backend could
+    not find (so repeated bad input does not cost another remote call).
+
+    Args:
+        path: JSON file to load from and save to, or None for memory only
+        max_entries: Maximum number of addresses kept
+        save_every: Save to disk after this many new entries
+    """
+
+    def __init__(self, path=None, max_entries=10000, save_every=20):
+        self.path = path
+        self.max_entries = max_entries
+        self.save_every = save_every
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable geocode cache %s: %s", self.path, e)
+            return
+        for key, value in stored[-self.max_entries:]:
+            self._entries[key] = GeocodeResult.from_dict(value) if value is not None else None
+
+    def get(self, key):
+        """Return (found, result) for a normalized address"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def save(self):
+        """Write the cache to disk atomically, least recently used first"""
+        if not self.path:
+            return
+        with self._lock:
+            stored = [[key, value.to_dict() if value is not None else None]
+                      for key, value in self._entries.items()]
+            self._unsaved = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(stored, f)
+        os.replace(temp_path, self.path)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+        }
+
+
+class Geocoder:
+    """
+    Cached, deduplicated and rate-limited front end for a geocoder backend.
+
+    Args:
+        backend: Object with a geopy-style geocode(query) method
+        cache: GeocodeCache shared by every caller
+        rate_limiter: TokenBucket gating backend calls, or None for no limit
+        max_wait: Seconds a lookup may wait for a rate-limit token
+        max_workers: Threads used by geocode_many()
+    """
+
+    def __init__(self, backend, cache=None, rate_limiter=None, max_wait=30, max_workers=4):
+        self.backend = backend
+        self.cache = cache if cache is not None else GeocodeCache()
+        self.rate_limiter = rate_limiter
+        self.max_wait = max_wait
+        self.backend_calls = 0
+        self.shared_lookups = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='geocode')
+
+    def geocode(self, query):
+        """
+        Geocode one address.
+
+        Returns:
+            A GeocodeResult, or None if the address could not be found
+
+        Raises:
+            GeocodingRateLimited: If no rate-limit token was available within max_wait
+            Exception: Whatever the backend raises (errors are not cached)
+        """
+        key = normalize_address(query)
+        found, result = self.cache.get(key)
+        if found:
+            return result
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.shared_lookups += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._lookup(query)
+            self.cache.put(key, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _lookup(self, query):
+        if self.rate_limiter is not None and not self.rate_limiter.acquire(self.max_wait):
+            raise GeocodingRateLimited('Geocoding rate limit exceeded, try again shortly')
+        self.backend_calls += 1
+        location = self.backend.geocode(query)
+        if not location:
+            return None
+        return GeocodeResult(location.address, location.latitude, location.longitude)
+
+    def submit(self, query):
+        """Start geocoding an address on the background pool, returning a Future for geocode(query)"""
+        return self._executor.submit(self.geocode, query)
+
+    def geocode_many(self, queries):
+        """
+        Geocode many addresses, sharing lookups for repeated addresses.
+
+        Returns:
+            A list in input order holding a GeocodeResult, None (not found) or
+            the exception raised for that address
+        """
+        futures = {}
+        for query in queries:
+            key = normalize_address(query)
+            if key not in futures:
+                futures[key] = self.submit(query)
+
+        results = []
+        for query in queries:
+            future = futures[normalize_address(query)]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def stats(self):
+        return dict(self.cache.stats(), backend_calls=self.backend_calls,
+                    shared_lookups=self.shared_lookups, in_flight=len(self._in_flight))
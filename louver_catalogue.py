@@ -0,0 +1,234 @@
+"""
+Typed, columnar louver catalogue loaded from louverdata.csv.
+
+The CSV is parsed once into NumPy arrays. Text columns become small-integer
+category codes and numeric columns become numeric arrays. The per-velocity rain
+class columns ("Airflow Velocity: 0.0" ... "3.5") become one int8 table with
+a row per louver and a column per velocity. The parsed arrays are cached in an
+.npz sidecar next to the CSV and rebuilt only when the CSV's modification time
+or size changes.
+"""
+import csv
+import hashlib
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  'louvre-selector-app', 'src', 'louverdata.csv')
+MODEL_COLUMN = 'Louver Model'
+VELOCITY_PREFIX = 'Airflow Velocity: '
+
+# Rain defence classes, best first; the table stores the index, -1 for blank/unknown
+RAIN_CLASSES = ['A', 'B', 'C', 'D']
+
+# Bump when the sidecar layout changes so old sidecars are rebuilt
+SIDECAR_FORMAT = 1
+
+
+def _code_dtype(count):
+    """Smallest signed integer type that can hold values up to `count`"""
+    if count <= np.iinfo(np.int8).max:
+        return np.int8
+    if count <= np.iinfo(np.int16).max:
+        return np.int16
+    return np.int32
+
+
+def _parse_number(text):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+class LouverCatalogue:
+    """
+    Column-oriented louver catalogue.
+
+    Attributes:
+        columns: Non-velocity column names in CSV order
+        data: Dict of column name to array; category codes for text columns
+        categories: Dict of text column name to its list of category labels
+        velocities: float32 array of tabulated face velocities (m/s)
+        rain_classes: int8 array (louvers, velocities) of RAIN_CLASSES indexes
+        version: Short content hash of the source CSV
+        source_mtime_ns: Modification time of the CSV the arrays came from
+        source_size: Size in bytes of the CSV the arrays came from
+    """
+
+    def __init__(self, columns, data, categories, velocities, rain_classes, version,
+                 source_mtime_ns=0, source_size=0):
+        self.columns = list(columns)
+        self.data = data
+        self.categories = categories
+        self.velocities = velocities
+        self.rain_classes = rain_classes
+        self.version = version
+        self.source_mtime_ns = source_mtime_ns
+        self.source_size = source_size
+
+    def __len__(self):
+        return len(self.rain_classes)
+
+    def column(self, name):
+        """Decoded values of a column (labels for text columns)"""
+        values = self.data[name]
+        if name in self.categories:
+            labels = np.array(self.categories[name], dtype=object)
+            return labels[values]
+        return values
+
+    @property
+    def models(self):
+        return self.column(MODEL_COLUMN)
+
+    def velocity_columns(self):
+        """CSV header names of the per-velocity rain class columns"""
+        return [f'{VELOCITY_PREFIX}{velocity:.1f}' for velocity in self.velocities]
+
+    def to_columns(self):
+        """JSON-ready columnar form: decoded columns plus the velocity/rain class table"""
+        columns = {}
+        for name in self.columns:
+            values = self.column(name)
+            columns[name] = values.tolist()
+        return {
+            'columns': columns,
+            'velocities': self.velocities.tolist(),
+            'rain_classes': [[RAIN_CLASSES[code] if code >= 0 else None for code in row]
+                             for row in self.rain_classes.tolist()],
+        }
+
+    def to_rows(self):
+        """JSON-ready list of dicts keyed by the CSV headers, like a header-mode CSV parse"""
+        decoded = {name: self.column(name).tolist() for name in self.columns}
+        velocity_columns = self.velocity_columns()
+        rows = []
+        for i, classes in enumerate(self.rain_classes.tolist()):
+            row = {name: decoded[name][i] for name in self.columns}
+            for name, code in zip(velocity_columns, classes):
+                row[name] = RAIN_CLASSES[code] if code >= 0 else None
+            rows.append(row)
+        return rows
+
+
+def parse_catalogue_csv(path):
+    """Parse a louver catalogue CSV into a LouverCatalogue"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    stat = os.stat(path)
+    version = hashlib.sha256(raw).hexdigest()[:16]
+
+    reader = csv.DictReader(raw.decode('utf-8-sig').splitlines())
+    rows = [row for row in reader if row.get(MODEL_COLUMN, '').strip()]
+    headers = reader.fieldnames or []
+
+    velocity_headers = [name for name in headers if name.startswith(VELOCITY_PREFIX)]
+    velocity_headers.sort(key=lambda name: float(name[len(VELOCITY_PREFIX):]))
+    velocities = np.array([float(name[len(VELOCITY_PREFIX):]) for name in velocity_headers], dtype=np.float32)
+
+    class_codes = {label: code for code, label in enumerate(RAIN_CLASSES)}
+    rain_classes = np.array(
+        [[class_codes.get(row[name].strip().upper(), -1) for name in velocity_headers] for row in rows],
+        dtype=np.int8
+    ).reshape(len(rows), len(velocity_headers))
+
+    columns = [name for name in headers if name not in velocity_headers]
+    data = {}
+    categories = {}
+    for name in columns:
+        texts = [row[name].strip() for row in rows]
+        numbers = [_parse_number(text) for text in texts]
+        if name != MODEL_COLUMN and texts and all(number is not None for number in numbers):
+            if all(number.is_integer() for number in numbers):
+                largest = int(max(abs(number) for number in numbers))
+                data[name] = np.array(numbers, dtype=_code_dtype(largest))
+            else:
+                # float64 so values such as 0.292 round-trip exactly to JSON
+                data[name] = np.array(numbers, dtype=np.float64)
+        else:
+            labels = sorted(set(texts))
+            lookup = {label: code for code, label in enumerate(labels)}
+            data[name] = np.array([lookup[text] for text in texts], dtype=_code_dtype(len(labels)))
+            categories[name] = labels
+
+    return LouverCatalogue(columns, data, categories, velocities, rain_classes, version,
+                           stat.st_mtime_ns, stat.st_size)
+
+
+def _save_sidecar(catalogue, sidecar_path):
+    arrays = {
+        'format': np.array(SIDECAR_FORMAT),
+        'columns': np.array(catalogue.columns, dtype=str),
+        'velocities': catalogue.velocities,
+        'rain_classes': catalogue.rain_classes,
+        'version': np.array(catalogue.version),
+        'source_mtime_ns': np.array(catalogue.source_mtime_ns, dtype=np.int64),
+        'source_size': np.array(catalogue.source_size, dtype=np.int64),
+    }
+    for i, name in enumerate(catalogue.columns):
+        arrays[f'data_{i}'] = catalogue.data[name]
+        if name in catalogue.categories:
+            arrays[f'categories_{i}'] = np.array(catalogue.categories[name], dtype=str)
+    temp_path = f'{sidecar_path}.{os.getpid()}.tmp.npz'
+    np.savez(temp_path, **arrays)
+    os.replace(temp_path, sidecar_path)
+
+
+def _load_sidecar(sidecar_path):
+    with np.load(sidecar_path, allow_pickle=False) as stored:
+        if int(stored['format']) != SIDECAR_FORMAT:
+            return None
+        columns = stored['columns'].tolist()
+        data = {}
+        categories = {}
+        for i, name in enumerate(columns):
+            data[name] = stored[f'data_{i}']
+            if f'categories_{i}' in stored.files:
+                categories[name] = stored[f'categories_{i}'].tolist()
+        return LouverCatalogue(columns, data, categories, stored['velocities'], stored['rain_classes'],
+                               str(stored['version']), int(stored['source_mtime_ns']), int(stored['source_size']))
+
+
+def load_catalogue(path=CATALOGUE_CSV_PATH, sidecar_path=None):
+    """
+    Load the catalogue, using the binary sidecar when it matches the CSV.
+
+    Args:
+        path: Catalogue CSV
+        sidecar_path: Where to cache the parsed arrays (defaults to <path>.npz)
+
+    Returns:
+        A LouverCatalogue
+    """
+    sidecar_path = sidecar_path or path + '.npz'
+    stat = os.stat(path)
+
+    if os.path.exists(sidecar_path):
+        try:
+            catalogue = _load_sidecar(sidecar_path)
+            if (catalogue is not None and catalogue.source_mtime_ns == stat.st_mtime_ns
+                    and catalogue.source_size == stat.st_size):
+                return catalogue
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Rebuilding unreadable catalogue sidecar %s: %s", sidecar_path, e)
+
+    catalogue = parse_catalogue_csv(path)
+    try:
+        _save_sidecar(catalogue, sidecar_path)
+    except OSError as e:
+        logger.warning("Could not write catalogue sidecar %s: %s", sidecar_path, e)
+    return catalogue
+
+
+def is_stale(catalogue, path=CATALOGUE_CSV_PATH):
+    """True if the CSV changed since the catalogue was loaded"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return stat.st_mtime_ns != catalogue.source_mtime_ns or stat.st_size != catalogue.source_size
@@ -0,0 +1,194 @@
+"""
+Immutable, NumPy-backed index over a louver catalogue.
+
+The index sorts each ranking column once when it is built. After that, a query
+finds rows that pass a threshold with a binary search on the sorted column and
+picks the top k with argpartition. Neither step copies or fully sorts the
+catalogue.
+"""
+import numpy as np
+
+from pareto import ParetoFront
+
+# Ranking keys and whether larger values rank higher
+RANKING_KEYS = {
+    'airflow_rating': True,
+    'water_resistance': True,
+    'cost_factor': False,
+    'balanced_score': True,
+}
+
+
+def balanced_score(airflow_rating, water_resistance, cost_factor):
+    """Weighted score used by the 'Balanced cost/performance' priority"""
+    return airflow_rating * 0.4 + water_resistance * 0.4 + (100 - cost_factor * 50) * 0.2
+
+
+class LouverIndex:
+    """
+    Read-only index over a catalogue DataFrame.
+
+    Args:
+        catalogue: DataFrame with at least airflow_rating, water_resistance
+            and cost_factor columns. It is copied once; later changes to the
+            original frame do not affect the index.
+    """
+
+    def __init__(self, catalogue):
+        frame = catalogue.reset_index(drop=True).copy()
+        frame['balanced_score'] = balanced_score(
+            frame['airflow_rating'], frame['water_resistance'], frame['cost_factor']
+        )
+        self.frame = frame
+
+        self._values = {}
+        self._order = {}
+        self._sorted = {}
+        for column in RANKING_KEYS:
+            values = frame[column].to_numpy(dtype=np.float64, copy=True)
+            order = np.argsort(values, kind='stable')
+            sorted_values = values[order]
+            for array in (values, order, sorted_values):
+                array.setflags(write=False)
+            self._values[column] = values
+            self._order[column] = order
+            self._sorted[column] = sorted_values
+        self._front = None
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _bounds(self, column, minimum=None, maximum=None):
+        """Range [start, stop) of the column's sorted order whose values lie within the bounds"""
+        sorted_values = self._sorted[column]
+        start = 0 if minimum is None else int(np.searchsorted(sorted_values, minimum, side='left'))
+        stop = len(sorted_values) if maximum is None else int(np.searchsorted(sorted_values, maximum, side='right'))
+        return start, max(start, stop)
+
+    def candidates(self, minimum=None, maximum=None):
+        """
+        Row positions passing inclusive thresholds, or None if there are no thresholds.
+
+        Args:
+            minimum: Dict of column to inclusive lower bound
+            maximum: Dict of column to inclusive upper bound
+        """
+        bounds = {}
+        for column, value in (minimum or {}).items():
+            bounds[column] = [value, None]
+        for column, value in (maximum or {}).items():
+            bounds.setdefault(column, [None, None])[1] = value
+        if not bounds:
+            return None
+
+        # Start from the most selective filter: a slice of its sorted order (a view, no copy)
+        ranges = {column: self._bounds(column, low, high) for column, (low, high) in bounds.items()}
+        narrowest = min(ranges, key=lambda column: ranges[column][1] - ranges[column][0])
+        start, stop = ranges[narrowest]
+        candidates = self._order[narrowest][start:stop]
+
+        # Apply the remaining filters to the candidates only
+        for column, (low, high) in bounds.items():
+            if column == narrowest or len(candidates) == 0:
+                continue
+            values = self._values[column][candidates]
+            keep = np.ones(len(candidates), dtype=bool)
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+            candidates = candidates[keep]
+        return candidates
+
+    def query(self, rank_by='balanced_score', k=3, minimum=None, maximum=None):
+        """
+        Row positions of the top k louvers passing the thresholds.
+
+        Args:
+            rank_by: One of RANKING_KEYS
+            k: Number of rows to return
+            minimum: Dict of column to inclusive lower bound
+            maximum: Dict of column to inclusive upper bound
+
+        Returns:
+            An int array of at most k row positions, best first. Ties keep
+            catalogue order.
+        """
+        candidates = self.candidates(minimum, maximum)
+        if candidates is not None:
+            return self._top_of(candidates, k, rank_by)
+
+        # Unfiltered: the answer is the end of the precomputed permutation
+        order = self._order[rank_by]
+        if not RANKING_KEYS[rank_by] or k <= 0:
+            return order[:max(k, 0)].copy()
+        # Take the tail of the ascending order, widened to every row tied
+        # with the k-th best so ties can be resolved in catalogue order
+        if k >= len(order):
+            return self._top_of(order, k, rank_by)
+        cutoff = self._sorted[rank_by][len(order) - k]
+        start = int(np.searchsorted(self._sorted[rank_by], cutoff, side='left'))
+        return self._top_of(order[start:], k, rank_by)
+
+    def pareto(self, k=3, minimum=None, maximum=None, weights=None):
+        """
+        Top k louvers from the Pareto front of airflow, water resistance and cost.
+
+        The front of the unfiltered catalogue is computed once and reused;
+        filtered queries compute the front of the matching rows only.
+
+        Args:
+            k: Number of rows to return
+            minimum: Dict of column to inclusive lower bound
+            maximum: Dict of column to inclusive upper bound
+            weights: Objective weights for choosing among front points (see ParetoFront.select)
+
+        Returns:
+            An int array of at most k row positions, best first
+        """
+        candidates = self.candidates(minimum, maximum)
+        if candidates is None:
+            front = self.front
+        else:
+            front = self._front_of(candidates)
+        return front.select(weights, k)
+
+    @property
+    def front(self):
+        """Pareto front of the whole catalogue, computed on first use"""
+        if self._front is None:
+            self._front = self._front_of(np.arange(len(self.frame)))
+        return self._front
+
+    def _front_of(self, positions):
+        return ParetoFront(
+            positions,
+            self._values['airflow_rating'][positions],
+            self._values['water_resistance'][positions],
+            self._values['cost_factor'][positions],
+        )
+
+    def _top_of(self, candidates, k, rank_by):
+        """Best k of the candidate rows by rank_by, without sorting all candidates"""
+        if len(candidates) == 0 or k <= 0:
+            return np.empty(0, dtype=np.intp)
+        keys = self._values[rank_by][candidates]
+        if RANKING_KEYS[rank_by]:
+            keys = -keys
+
+        if len(candidates) > k:
+            kth = keys[np.argpartition(keys, k - 1)[k - 1]]
+            better = np.flatnonzero(keys < kth)
+            # Fill the remaining places with the earliest catalogue rows tied at the cut-off
+            ties = np.flatnonzero(keys == kth)
+            ties = ties[np.argsort(candidates[ties], kind='stable')][:k - len(better)]
+            chosen = np.concatenate([better, ties])
+        else:
+            chosen = np.arange(len(candidates))
+
+        chosen = chosen[np.lexsort((candidates[chosen], keys[chosen]))]
+        return candidates[chosen]
+
+    def rows(self, positions):
+        """DataFrame rows (including balanced_score) for positions returned by query()"""
+        return self.frame.iloc[positions]
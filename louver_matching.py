@@ -0,0 +1,87 @@
+"""
+Velocity-aware louver matching against the catalogue's rain class table.
+
+The catalogue gives each louver's rain defence class at face velocities of 0.0
+to 3.5 m/s. Between two tabulated velocities a louver is rated at the next
+higher one, which is the conservative reading of the table. The table is also
+made monotone, so a louver never rates better at a higher velocity than at a
+lower one. After that, "louver meets class c at velocity v" is the same as
+"v <= the highest velocity at which the louver still rates c or better". That
+limit is precomputed for every class, so matching any number of openings is a
+single vectorized comparison.
+"""
+import numpy as np
+
+from louver_catalogue import RAIN_CLASSES
+
+# Rain class index used for louvers with no rating at a velocity
+UNRATED = len(RAIN_CLASSES)
+
+
+class VelocityMatcher:
+    """
+    Precomputed rain class / velocity index over a LouverCatalogue.
+
+    Args:
+        catalogue: LouverCatalogue with 'Airflow Coefficient' and 'Airflow Class' columns
+    """
+
+    def __init__(self, catalogue):
+        self.version = catalogue.version
+        self.models = catalogue.models
+        self.velocities = np.asarray(catalogue.velocities, dtype=np.float64)
+        self.airflow_coefficients = np.asarray(catalogue.column('Airflow Coefficient'), dtype=np.float64)
+        self.airflow_classes = np.asarray(catalogue.column('Airflow Class'))
+
+        table = np.asarray(catalogue.rain_classes, dtype=np.int16)
+        table = np.where(table < 0, UNRATED, table)
+        # Worst class seen at or below each velocity: the class can only get worse as velocity rises
+        self.envelope = np.maximum.accumulate(table, axis=1)
+
+        # max_velocity[c, i]: highest tabulated velocity at which louver i rates class c or better
+        rated_counts = np.stack([(self.envelope <= c).sum(axis=1) for c in range(len(RAIN_CLASSES))])
+        self.max_velocity = np.where(
+            rated_counts > 0,
+            self.velocities[np.maximum(rated_counts - 1, 0)],
+            -np.inf
+        )
+
+        # Best airflow first; ties keep catalogue order
+        self.ranking = np.argsort(-self.airflow_coefficients, kind='stable')
+        self._ranked_max_velocity = self.max_velocity[:, self.ranking]
+
+    def class_index(self, rain_class):
+        """Index of a rain class letter, raising ValueError for anything else"""
+        try:
+            return RAIN_CLASSES.index(str(rain_class).strip().upper())
+        except ValueError:
+            raise ValueError(f"Unknown rain class '{rain_class}', expected one of {', '.join(RAIN_CLASSES)}")
+
+    def classes_at(self, velocity):
+        """Rain class letter of every louver at a face velocity (None above the table or unrated)"""
+        column = int(np.searchsorted(self.velocities, max(float(velocity), 0.0), side='left'))
+        if column >= len(self.velocities):
+            return [None] * len(self.models)
+        codes = self.envelope[:, column]
+        return [RAIN_CLASSES[code] if code < UNRATED else None for code in codes.tolist()]
+
+    def match_many(self, rain_classes, velocities):
+        """
+        Louvers meeting each opening's class at its velocity, best airflow first.
+
+        Args:
+            rain_classes: Sequence of required class letters, one per opening
+            velocities: Sequence of design face velocities in m/s, one per opening
+
+        Returns:
+            A list with one int array of catalogue row positions per opening
+        """
+        class_indexes = np.array([self.class_index(rain_class) for rain_class in rain_classes], dtype=np.intp)
+        velocity_array = np.maximum(np.asarray(velocities, dtype=np.float64), 0.0)
+        # (openings, louvers) in ranked order
+        meets = self._ranked_max_velocity[class_indexes] >= velocity_array[:, np.newaxis]
+        return [self.ranking[row] for row in meets]
+
+    def match(self, rain_class, velocity):
+        """Row positions of louvers meeting one class at one velocity, best airflow first"""
+        return self.match_many([rain_class], [velocity])[0]
@@ -344,12 +344,10 @@ function App() {
     }
   };
   
-  // Load louver data from CSV file
+  // Load louver data from the API catalogue, falling back to the CSV file
   useEffect(() => {
-    const loadLouverData = () => {
+    const loadLouverDataFromCsv = () => {
       console.log('Loading louver data from CSV file...');
-      setLouverDataLoading(true);
-      setLouverDataError(null);
       
       try {
         // Fetch the CSV file from the public folder
@@ -409,6 +407,35 @@ function App() {
       }
     };
     
+    const loadLouverData = () => {
+      console.log('Loading louver data from catalogue API...');
+      setLouverDataLoading(true);
+      setLouverDataError(null);
+      
+      // The API serves the parsed catalogue with an ETag, so the browser
+      // revalidates it instead of re-downloading and re-parsing the CSV
+      fetch('http://localhost:5000/catalogue?format=rows')
+        .then(response => {
+          if (!response.ok) {
+            throw new Error(`Failed to fetch catalogue: ${response.status} ${response.statusText}`);
+          }
+          return response.json();
+        })
+        .then(catalogue => {
+          const validData = (catalogue.rows || []).filter(row => row && row['Louver Model']);
+          if (validData.length === 0) {
+            throw new Error('No valid louver models in catalogue');
+          }
+          console.log('Louver catalogue version', catalogue.version, 'loaded:', validData.length, 'models');
+          setLouverData(validData);
+          setLouverDataLoading(false);
+        })
+        .catch(error => {
+          console.warn('Catalogue API unavailable, falling back to CSV:', error.message);
+          loadLouverDataFromCsv();
+        });
+    };
+    
     loadLouverData();
   }, []);
   
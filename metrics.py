@@ -0,0 +1,151 @@
+"""
+Thread-safe latency histograms for the weather API's /health and /metrics.
+
+Buckets are cumulative with fixed upper bounds (the layout Prometheus uses),
+so observing a value is a short scan under a lock and a snapshot is cheap at
+any traffic level. Quantiles are estimated by interpolating inside a bucket.
+prometheus_histogram() and prometheus_metric() render the Prometheus text
+exposition format.
+"""
+import bisect
+import threading
+
+# Upper bounds in seconds, from a cache hit up to a slow Earth Engine reduction
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    Counts of observed values per bucket, plus their total.
+
+    Args:
+        buckets: Increasing bucket upper bounds; values above the last one
+            land in an implicit +Inf bucket
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q, counts=None):
+        """Estimated q-quantile (0 < q < 1), or None before the first observation"""
+        counts = self.counts if counts is None else counts
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def state(self):
+        """(per-bucket counts, sum) read together"""
+        with self._lock:
+            return list(self.counts), self.sum
+
+    def snapshot(self):
+        """Cumulative bucket counts keyed by upper bound, count, sum and p50/p95/p99"""
+        counts, total_sum = self.state()
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return {
+            'count': running,
+            'sum': round(total_sum, 6),
+            'buckets': {**{str(bound): n for bound, n in zip(self.buckets, cumulative)}, '+Inf': running},
+            'p50': self.quantile(0.5, counts),
+            'p95': self.quantile(0.95, counts),
+            'p99': self.quantile(0.99, counts),
+        }
+
+
+class Histograms:
+    """A Histogram per label (e.g. per route), created on first use"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def labels(self, label):
+        histogram = self._histograms.get(label)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(label, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, label, value):
+        self.labels(label).observe(value)
+
+    def items(self):
+        with self._lock:
+            return sorted(self._histograms.items())
+
+    def snapshot(self):
+        return {label: histogram.snapshot() for label, histogram in self.items()}
+
+
+def _label_text(labels):
+    """Prometheus label set, e.g. {route="/weather",le="0.5"}"""
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def prometheus_metric(name, kind, help_text, samples):
+    """
+    Text exposition lines for a counter or gauge.
+
+    Args:
+        name: Metric name
+        kind: 'counter' or 'gauge'
+        help_text: One-line description
+        samples: List of (labels dict, value); None values are skipped
+
+    Returns:
+        List of lines
+    """
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for labels, value in samples:
+        if value is not None:
+            lines.append(f'{name}{_label_text(labels)} {float(value)!r}')
+    return lines
+
+
+def prometheus_histogram(name, help_text, histograms, label=None):
+    """
+    Text exposition lines for a Histogram, or for a Histograms family with one
+    series per key under the label name `label`.
+    """
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    series = histograms.items() if isinstance(histograms, Histograms) else [(None, histograms)]
+    for key, histogram in series:
+        labels = {label: key} if label else {}
+        counts, total_sum = histogram.state()
+        running = 0
+        for bound, count in zip(list(histogram.buckets) + ['+Inf'], counts):
+            running += count
+            lines.append(f'{name}_bucket{_label_text({**labels, "le": bound})} {running}')
+        lines.append(f'{name}_sum{_label_text(labels)} {total_sum!r}')
+        lines.append(f'{name}_count{_label_text(labels)} {running}')
+    return lines
@@ -0,0 +1,132 @@
+"""
+Pareto front (skyline) of louvers over airflow, water resistance and cost.
+
+A louver is on the front if no other louver is at least as good on all three
+objectives and strictly better on one. The front is found with a sort-and-sweep
+skyline. Points are sorted best-airflow first, so any point that could dominate
+a given point has already been seen when that point is reached. A staircase of
+the (water resistance, cost) values seen so far answers "is this point
+dominated?" with one binary search. This is O(n log n) in comparisons.
+"""
+from bisect import bisect_left
+
+import numpy as np
+
+# Weights used when the caller does not give any, matching the balanced score
+DEFAULT_WEIGHTS = {'airflow_rating': 0.4, 'water_resistance': 0.4, 'cost_factor': 0.2}
+
+
+def pareto_front(airflow, water, cost):
+    """
+    Indexes of the non-dominated points.
+
+    Args:
+        airflow: Array of airflow ratings (higher is better)
+        water: Array of water resistance ratings (higher is better)
+        cost: Array of cost factors (lower is better)
+
+    Returns:
+        A sorted int array of indexes into the inputs. Identical points are
+        either all on the front or all off it.
+    """
+    points = np.column_stack([
+        np.asarray(airflow, dtype=np.float64),
+        np.asarray(water, dtype=np.float64),
+        -np.asarray(cost, dtype=np.float64),  # negate so every objective is maximized
+    ])
+    if len(points) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    # Best airflow first, then water, then cost; identical points end up adjacent
+    order = np.lexsort((-points[:, 2], -points[:, 1], -points[:, 0]))
+    ordered = points[order]
+    repeats = np.zeros(len(order), dtype=bool)
+    repeats[1:] = (ordered[1:] == ordered[:-1]).all(axis=1)
+
+    # Staircase of front points projected to (water, -cost): water ascending, -cost descending
+    stair_water = []
+    stair_cost = []
+    on_front = np.zeros(len(order), dtype=bool)
+    previous = False
+    for rank, ((_, w, c), repeat) in enumerate(zip(ordered.tolist(), repeats.tolist())):
+        if repeat:
+            # A duplicate shares its twin's fate
+            on_front[rank] = previous
+            continue
+        i = bisect_left(stair_water, w)
+        if i < len(stair_water) and stair_cost[i] >= c:
+            previous = False
+            continue  # an earlier point has >= airflow, >= water and >= -cost
+        on_front[rank] = previous = True
+        # Drop staircase entries the new point dominates in (water, -cost)
+        stop = i + 1 if i < len(stair_water) and stair_water[i] == w else i
+        start = i
+        while start > 0 and stair_cost[start - 1] <= c:
+            start -= 1
+        stair_water[start:stop] = [w]
+        stair_cost[start:stop] = [c]
+
+    return np.sort(order[on_front])
+
+
+class ParetoFront:
+    """
+    Immutable Pareto front over a set of louvers.
+
+    Args:
+        positions: Row positions of the candidate louvers
+        airflow, water, cost: Objective values aligned with positions
+    """
+
+    def __init__(self, positions, airflow, water, cost):
+        positions = np.asarray(positions, dtype=np.intp)
+        front = pareto_front(airflow, water, cost)
+        self.positions = positions[front]
+        self.airflow = np.asarray(airflow, dtype=np.float64)[front]
+        self.water = np.asarray(water, dtype=np.float64)[front]
+        self.cost = np.asarray(cost, dtype=np.float64)[front]
+        for array in (self.positions, self.airflow, self.water, self.cost):
+            array.setflags(write=False)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, positions, airflow, water, cost):
+        """
+        Front after adding louvers, as a new ParetoFront.
+
+        Points already off the front stay dominated when rows are added, so
+        only the current front and the new rows need to be swept.
+        """
+        return ParetoFront(
+            np.concatenate([self.positions, np.asarray(positions, dtype=np.intp)]),
+            np.concatenate([self.airflow, np.asarray(airflow, dtype=np.float64)]),
+            np.concatenate([self.water, np.asarray(water, dtype=np.float64)]),
+            np.concatenate([self.cost, np.asarray(cost, dtype=np.float64)]),
+        )
+
+    def select(self, weights=None, k=3):
+        """
+        Pick k front points by a weighted score of min-max normalized objectives.
+
+        Args:
+            weights: Dict with any of airflow_rating, water_resistance and
+                cost_factor; missing keys count as 0. Defaults to DEFAULT_WEIGHTS.
+            k: Number of points to return
+
+        Returns:
+            Row positions, best score first; ties keep row order
+        """
+        if len(self.positions) == 0 or k <= 0:
+            return np.empty(0, dtype=np.intp)
+        weights = DEFAULT_WEIGHTS if weights is None else weights
+
+        def normalized(values):
+            span = values.max() - values.min()
+            return (values - values.min()) / span if span > 0 else np.ones_like(values)
+
+        score = (weights.get('airflow_rating', 0) * normalized(self.airflow)
+                 + weights.get('water_resistance', 0) * normalized(self.water)
+                 + weights.get('cost_factor', 0) * normalized(-self.cost))
+        best = np.lexsort((self.positions, -score))[:k]
+        return self.positions[best]
@@ -0,0 +1,143 @@
+"""
+Rain class calculation per BS EN 13030:2001, vectorized with NumPy.
+
+Every argument may be a scalar or an array; arrays broadcast against each other,
+so one call can evaluate many sites, exposure types and facade orientations.
+"""
+import numpy as np
+
+# These exposure coefficients are directly from the standard
+EXPOSURE_COEFFICIENTS = {
+    'high': 0.35,    # Coastal areas, open terrain
+    'medium': 0.25,  # Suburban, forest
+    'low': 0.2,      # City centers, dense urban areas
+}
+DEFAULT_EXPOSURE_COEFFICIENT = EXPOSURE_COEFFICIENTS['medium']
+
+RAIN_CLASSES = np.array(['A', 'B', 'C', 'D'])
+# Minimum relative exposure for classes A, B and C; anything lower is D
+RAIN_CLASS_THRESHOLDS = (0.8, 0.4, 0.2)
+
+
+def exposure_coefficients(exposure_type):
+    """
+    Map exposure types to coefficients.
+
+    Args:
+        exposure_type: 'high', 'medium' or 'low' (unknown values count as
+            medium), an array of those, or numeric coefficients used as-is
+
+    Returns:
+        A float array with the shape of the input
+    """
+    exposure = np.asarray(exposure_type)
+    if exposure.dtype.kind in 'fiu':
+        return exposure.astype(np.float64)
+    # Map each distinct label once instead of once per element
+    labels, inverse = np.unique(exposure, return_inverse=True)
+    coefficients = np.array([EXPOSURE_COEFFICIENTS.get(str(label), DEFAULT_EXPOSURE_COEFFICIENT)
+                             for label in labels], dtype=np.float64)
+    return coefficients[inverse].reshape(exposure.shape)
+
+
+def relative_exposure(mean_rain_fall, mean_wind_speed, mean_wind_dir, exposure_type, exposure_dir=0):
+    """
+    Relative wind-driven rain exposure, broadcast over all arguments.
+
+    Args:
+        mean_rain_fall: Average rainfall in mm/day
+        mean_wind_speed: Wind speed in m/s
+        mean_wind_dir: Wind direction in radians
+        exposure_type: Exposure label(s) or coefficient(s), see exposure_coefficients
+        exposure_dir: Facade direction in radians
+
+    Returns:
+        A float array of relative exposure values
+    """
+    a = exposure_coefficients(exposure_type)
+
+    # Calculate wind-driven rain coefficient (C_wdr) as per BS EN 13030:2001
+    wind_angle_factor = np.abs(np.cos(np.asarray(mean_wind_dir, dtype=np.float64) - exposure_dir))
+    c_wdr = np.minimum(1, a * np.asarray(mean_wind_speed, dtype=np.float64) * wind_angle_factor)
+
+    # Calculate wind-driven rain rate (l/h per m²)
+    q_wdr = (np.asarray(mean_rain_fall, dtype=np.float64) / 24 * c_wdr) / 3600
+
+    return q_wdr / 20.83
+
+
+def rain_class_array(mean_rain_fall, mean_wind_speed, mean_wind_dir, exposure_type, exposure_dir=0):
+    """
+    Rain classes for arrays of sites, exposures and facade directions.
+
+    Arguments are as for relative_exposure() and broadcast together.
+
+    Returns:
+        An array of 'A' (high rain protection required) to 'D' (minimal)
+    """
+    exposure = relative_exposure(mean_rain_fall, mean_wind_speed, mean_wind_dir, exposure_type, exposure_dir)
+    return classify_exposure(exposure)
+
+
+def classify_exposure(exposure):
+    """Rain class ('A' to 'D') for relative exposure value(s)"""
+    exposure = np.asarray(exposure, dtype=np.float64)
+    a_min, b_min, c_min = RAIN_CLASS_THRESHOLDS
+    class_index = np.select([exposure >= a_min, exposure >= b_min, exposure >= c_min], [0, 1, 2], default=3)
+    return RAIN_CLASSES[class_index]
+
+
+def rain_class_matrix(mean_rain_fall, mean_wind_speed, mean_wind_dir,
+                      exposure_types=('high', 'medium', 'low'), directions=36):
+    """
+    Rain class of every site for every exposure type and facade orientation.
+
+    Args:
+        mean_rain_fall: Array of rainfall per site (mm/day)
+        mean_wind_speed: Array of wind speed per site (m/s)
+        mean_wind_dir: Array of wind direction per site (radians)
+        exposure_types: Exposure labels to evaluate
+        directions: Number of facade orientations evenly spaced around the
+            compass, or an array of facade directions in radians
+
+    Returns:
+        (classes, facade_dirs) where classes has shape
+        (sites, len(exposure_types), len(facade_dirs))
+    """
+    if np.ndim(directions) == 0:
+        facade_dirs = np.linspace(0, 2 * np.pi, int(directions), endpoint=False)
+    else:
+        facade_dirs = np.asarray(directions, dtype=np.float64)
+
+    sites = (slice(None), np.newaxis, np.newaxis)
+    classes = rain_class_array(
+        np.atleast_1d(mean_rain_fall)[sites],
+        np.atleast_1d(mean_wind_speed)[sites],
+        np.atleast_1d(mean_wind_dir)[sites],
+        np.asarray(exposure_types)[np.newaxis, :, np.newaxis],
+        facade_dirs[np.newaxis, np.newaxis, :],
+    )
+    return classes, facade_dirs
+
+
+def get_rain_class(mean_rain_fall, mean_wind_speed, mean_wind_dir, exposure_type, exposure_dir=0):
+    """
+    Calculate rain class based on BS EN 13030:2001 standard.
+
+    Design extremes can be passed instead of means: for example the 95th
+    percentile daily rainfall with the mean wind speed and direction of each
+    wind rose sector as arrays. Arrays are broadcast together and the most
+    demanding class over all the combinations is returned.
+
+    Args:
+        mean_rain_fall: Average (or design) rainfall in mm/day
+        mean_wind_speed: Wind speed in m/s
+        mean_wind_dir: Wind direction in radians
+        exposure_type: Level of exposure ('high', 'medium', 'low')
+        exposure_dir: Direction of exposure in radians (defaults to 0)
+
+    Returns:
+        A string representing the rain class ('A', 'B', 'C', or 'D')
+    """
+    exposure = relative_exposure(mean_rain_fall, mean_wind_speed, mean_wind_dir, exposure_type, exposure_dir)
+    return str(classify_exposure(np.max(exposure)))
@@ -0,0 +1,172 @@
+"""
+Preprocessed louver models: each GLB converted once into a .blend library.
+
+blender_scripts/build_asset_library.py imports a GLB, bakes in the normalized
+placement and writes one collection per level of detail. Renders link that
+library instead of parsing glTF on every model swap. Libraries are named
+<model>-<GLB sha256 prefix>-<recipe>.blend, so a changed GLB (or build script)
+gets a new library and an unchanged one is never rebuilt.
+"""
+import hashlib
+import json
+import logging
+import os
+import shlex
+import subprocess
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Share of faces kept at each level of detail
+DEFAULT_LODS = {"final": 1.0, "preview": 0.2}
+
+
+class AssetBuildError(Exception):
+    """Blender could not convert a GLB into a library"""
+
+
+class AssetLibrary:
+    """
+    Builds and finds .blend libraries for GLB models.
+
+    Args:
+        library_dir: Where libraries are written
+        executable: Blender executable; may include arguments
+        build_script: Path of build_asset_library.py
+        hash_file: Function returning a file's sha256 hex digest
+        lods: Level of detail name to decimation ratio
+        timeout: Seconds one build may take
+    """
+
+    def __init__(self, library_dir, executable, build_script, hash_file, lods=None, timeout=600):
+        self.library_dir = library_dir
+        self.command = shlex.split(executable) + ["--background", "--python", build_script, "--"]
+        self.build_script = build_script
+        self.hash_file = hash_file
+        self.lods = dict(lods or DEFAULT_LODS)
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.model_locks = {}
+        # Library path to error, so a GLB that fails to convert is not rebuilt on every request
+        self.failed = {}
+        # Library path to the number of queued or running jobs using it, and the
+        # superseded libraries to delete once no job uses them
+        self.in_use = {}
+        self.superseded = set()
+        self.counters = {"builds": 0, "failures": 0}
+        os.makedirs(library_dir, exist_ok=True)
+
+    def recipe(self):
+        """Short hash of the build script and LODs, so changing either rebuilds every library"""
+        payload = self.hash_file(self.build_script) + json.dumps(self.lods, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:8]
+
+    def library_path(self, glb_path):
+        name = os.path.splitext(os.path.basename(glb_path))[0]
+        return os.path.join(self.library_dir, f"{name}-{self.hash_file(glb_path)[:16]}-{self.recipe()}.blend")
+
+    def ensure(self, glb_path):
+        """
+        Library for a GLB, building it first if needed.
+
+        Returns:
+            Path of the .blend library
+
+        Raises:
+            AssetBuildError: If the build fails, now or earlier for the same GLB
+        """
+        path = self.library_path(glb_path)
+        if os.path.exists(path):
+            return path
+        if path in self.failed:
+            raise AssetBuildError(self.failed[path])
+
+        # One build per model at a time; other requests for it wait for the result
+        with self.lock:
+            model_lock = self.model_locks.setdefault(path, threading.Lock())
+        with model_lock:
+            if not os.path.exists(path) and path not in self.failed:
+                try:
+                    self._build(glb_path, path)
+                except AssetBuildError as e:
+                    self.failed[path] = str(e)
+                    raise
+        if path in self.failed:
+            raise AssetBuildError(self.failed[path])
+        return path
+
+    def _build(self, glb_path, path):
+        command = self.command + [glb_path, path, json.dumps(self.lods)]
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self._failed()
+            raise AssetBuildError(f"Could not build asset library for {glb_path}: {e}")
+        if result.returncode != 0 or not os.path.exists(path):
+            self._failed()
+            log = "\n".join((result.stdout + result.stderr).splitlines()[-20:])
+            raise AssetBuildError(f"Asset build for {glb_path} exited with code {result.returncode}:\n{log}")
+        with self.lock:
+            self.counters["builds"] += 1
+        self._remove_old_versions(path)
+
+    def _failed(self):
+        with self.lock:
+            self.counters["failures"] += 1
+
+    def pin(self, path):
+        """
+        Keep a library from being removed while a job uses it.
+
+        Returns:
+            False if the library is already gone, e.g. superseded by a newer build
+        """
+        with self.lock:
+            if not os.path.exists(path):
+                return False
+            self.in_use[path] = self.in_use.get(path, 0) + 1
+            return True
+
+    def unpin(self, *paths):
+        """Release libraries pinned by pin(), deleting superseded ones no job uses any more"""
+        with self.lock:
+            for path in paths:
+                count = self.in_use.get(path, 0) - 1
+                if count > 0:
+                    self.in_use[path] = count
+                    continue
+                self.in_use.pop(path, None)
+                if path in self.superseded:
+                    self.superseded.discard(path)
+                    self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _remove_old_versions(self, path):
+        """Delete libraries built from earlier versions of the same model, once no job uses them"""
+        name = os.path.basename(path).rsplit("-", 2)[0]
+        with self.lock:
+            for entry in os.listdir(self.library_dir):
+                if entry != os.path.basename(path) and entry.endswith(".blend") and entry.rsplit("-", 2)[0] == name:
+                    old_path = os.path.join(self.library_dir, entry)
+                    if old_path in self.in_use:
+                        self.superseded.add(old_path)
+                    else:
+                        self._remove(old_path)
+
+    def build_all(self, glb_paths):
+        """Build any missing libraries, reporting failures instead of raising"""
+        for glb_path in glb_paths:
+            try:
+                self.ensure(glb_path)
+            except (AssetBuildError, OSError) as e:
+                logger.warning("Asset library build failed: %s", e)
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "libraries": sum(name.endswith(".blend") for name in os.listdir(self.library_dir))}
@@ -0,0 +1,89 @@
+import bpy
+import json
+import os
+import sys
+
+from mathutils import Matrix
+
+# Usage: blender --background --python build_asset_library.py -- <model.glb> <library.blend> [<lods json>]
+#
+# Imports a louver GLB once and saves it as a .blend library that renders link
+# instead of re-parsing glTF. The model is normalized the way render_with_model.py
+# used to place it at runtime (half scale, root at the origin), merged into one
+# mesh with its transforms applied, and stored as one collection per level of
+# detail, e.g. {"final": 1.0, "preview": 0.2}, where the number is the share of
+# faces kept by decimation.
+
+# --- Get args passed after "--"
+args = sys.argv[sys.argv.index("--") + 1:]
+glb_path = args[0]
+library_path = args[1]
+lods = json.loads(args[2]) if len(args) > 2 else {"final": 1.0, "preview": 0.2}
+
+# --- Start from an empty file ---
+bpy.ops.wm.read_factory_settings(use_empty=True)
+
+# --- Import GLB ---
+if not os.path.exists(glb_path):
+    raise FileNotFoundError(f"GLB file not found: {glb_path}")
+bpy.ops.import_scene.gltf(filepath=glb_path)
+imported = list(bpy.context.selected_objects)
+if not imported:
+    raise RuntimeError(f"No objects imported from {glb_path}")
+
+# --- Normalize: root at the origin, half scale (the runtime placement, baked in) ---
+root = imported[0]
+root.location = (0, 0, 0)
+root.scale = (0.5, 0.5, 0.5)
+bpy.context.view_layer.update()
+
+# Bake world transforms into the mesh data and drop everything that isn't a mesh
+meshes = [obj for obj in imported if obj.type == 'MESH']
+if not meshes:
+    raise RuntimeError(f"No meshes in {glb_path}")
+for obj in meshes:
+    world = obj.matrix_world.copy()
+    obj.parent = None
+    obj.data = obj.data.copy()
+    obj.data.transform(world)
+    obj.matrix_world = Matrix.Identity(4)
+for obj in imported:
+    if obj.type != 'MESH':
+        bpy.data.objects.remove(obj, do_unlink=True)
+
+# --- Merge into one object ---
+bpy.ops.object.select_all(action='DESELECT')
+for obj in meshes:
+    obj.select_set(True)
+bpy.context.view_layer.objects.active = meshes[0]
+if len(meshes) > 1:
+    bpy.ops.object.join()
+model = bpy.context.view_layer.objects.active
+model.name = "Louver"
+
+# --- Levels of detail, one collection each ---
+depsgraph = bpy.context.evaluated_depsgraph_get()
+collections = set()
+for lod_name, ratio in lods.items():
+    collection = bpy.data.collections.new(lod_name)
+    bpy.context.scene.collection.children.link(collection)
+    lod = model.copy()
+    lod.name = f"Louver {lod_name}"
+    if ratio < 1.0:
+        decimate = lod.modifiers.new(name="Decimate", type='DECIMATE')
+        decimate.ratio = ratio
+        collection.objects.link(lod)
+        depsgraph.update()
+        # Bake the modifier into a new mesh so renders don't re-run it
+        lod.data = bpy.data.meshes.new_from_object(lod.evaluated_get(depsgraph))
+        lod.modifiers.clear()
+    else:
+        lod.data = model.data.copy()
+        collection.objects.link(lod)
+    collections.add(collection)
+
+# --- Write the library atomically ---
+temp_path = f"{library_path}.{os.getpid()}.tmp.blend"
+bpy.data.libraries.write(temp_path, collections, fake_user=True)
+os.replace(temp_path, library_path)
+print(f"Wrote {library_path} with levels of detail {', '.join(lods)}")
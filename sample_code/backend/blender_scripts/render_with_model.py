@@ -1,87 +1,286 @@
 import bpy
-import sys
+import json
 import os
+import sys
+import time
+
+# Lines starting with this marker carry job results; everything else on stdout is Blender's own log
+RESULT_MARKER = "@@RESULT "
+
+
+class SceneRenderer:
+    """
+    Camera, lighting, shadow catcher and compositor built once, reused for every render.
+
+    Only the background image and the louver model change between renders, so a
+    long-lived Blender process can render job after job without rebuilding the scene.
+    """
+
+    def __init__(self):
+        self.model = None
+        self.model_source = None
+        self.model_objects = []
+        self.model_library = None
+
+        # --- Reset Scene ---
+        bpy.ops.object.select_all(action='SELECT')
+        bpy.ops.object.delete(use_global=False)
+
+        # --- Add Camera ---
+        bpy.ops.object.camera_add(location=(3, -3, 2), rotation=(1.1, 0, 0.9))
+        self.camera = bpy.context.active_object
+        bpy.context.scene.camera = self.camera
+        self.camera.data.lens = 5  # in mm, common values: 18 (wide) – 135 (telephoto)
+
+        # Track camera to model (target is set when a model is loaded)
+        self.track = self.camera.constraints.new(type='TRACK_TO')
+        self.track.track_axis = 'TRACK_NEGATIVE_Z'
+        self.track.up_axis = 'UP_Y'
+
+        # --- Add Lighting (Point light for small scenes) ---
+        bpy.ops.object.light_add(type='POINT', location=(3, -3, 3))
+        light = bpy.context.active_object
+        light.data.energy = 500000
+
+        # --- Add Shadow Catcher Plane ---
+        bpy.ops.mesh.primitive_plane_add(size=10, location=(0, 0, 0))
+        plane = bpy.context.active_object
+        plane.name = "ShadowCatcher"
+        plane.rotation_euler[0] = 0
+
+        # Set plane as shadow catcher
+        plane_mat = bpy.data.materials.new(name="ShadowMat")
+        plane_mat.use_nodes = True
+        plane.data.materials.append(plane_mat)
+        plane.cycles.is_shadow_catcher = True
+
+        # --- Render Settings ---
+        scene = bpy.context.scene
+        scene.render.engine = 'CYCLES'
+        self.set_device('auto')
+
+        scene.render.film_transparent = True  # Set to False to debug background
+
+        # --- Compositing Setup ---
+        scene.use_nodes = True
+        tree = scene.node_tree
+        tree.nodes.clear()
+
+        # Nodes
+        self.bg_node = tree.nodes.new(type='CompositorNodeImage')
+
+        rl_node = tree.nodes.new(type='CompositorNodeRLayers')
+
+        alpha_node = tree.nodes.new(type='CompositorNodeAlphaOver')
+        alpha_node.location.x += 400
+        alpha_node.inputs[0].default_value = 1.0  # Ensure mix factor = 1
+
+        comp_node = tree.nodes.new(type='CompositorNodeComposite')
+
+        # Connect
+        tree.links.new(rl_node.outputs['Image'], alpha_node.inputs[2])
+        tree.links.new(self.bg_node.outputs['Image'], alpha_node.inputs[1])
+        tree.links.new(alpha_node.outputs['Image'], comp_node.inputs['Image'])
+
+        scene.render.image_settings.file_format = 'PNG'
+
+    def set_device(self, device):
+        """Render on 'CPU' or 'GPU'; 'auto' uses the GPU if Cycles has a compute device configured"""
+        if device == 'auto':
+            device = 'GPU' if bpy.context.preferences.addons['cycles'].preferences.compute_device_type != 'NONE' else 'CPU'
+        bpy.context.scene.cycles.device = device
+
+    def configure(self, settings):
+        """
+        Apply render quality settings (see render_presets.py on the server).
+
+        Keys: samples, adaptive_threshold (0 disables adaptive sampling), denoise,
+        threads (0 = all cores), tile_size, persistent_data and device. Missing
+        keys leave the current setting alone. ("lod" is read by render_batch.)
+        """
+        scene = bpy.context.scene
+        cycles = scene.cycles
+        if 'device' in settings:
+            self.set_device(settings['device'])
+        if 'samples' in settings:
+            cycles.samples = settings['samples']
+        if 'adaptive_threshold' in settings:
+            cycles.use_adaptive_sampling = settings['adaptive_threshold'] > 0
+            if settings['adaptive_threshold'] > 0:
+                cycles.adaptive_threshold = settings['adaptive_threshold']
+        if 'denoise' in settings:
+            cycles.use_denoising = bool(settings['denoise'])
+        if 'threads' in settings:
+            scene.render.threads_mode = 'FIXED' if settings['threads'] else 'AUTO'
+            if settings['threads']:
+                scene.render.threads = settings['threads']
+        if 'tile_size' in settings and hasattr(cycles, 'tile_size'):
+            cycles.use_auto_tile = True
+            cycles.tile_size = settings['tile_size']
+        if 'persistent_data' in settings:
+            # Keeps the BVH and shaders between renders when only the photo changes
+            scene.render.use_persistent_data = bool(settings['persistent_data'])
+
+    def set_background(self, image_path):
+        """Load the photo into the compositor, freeing the previous one"""
+        previous = self.bg_node.image
+        self.bg_node.image = bpy.data.images.load(image_path)
+        if previous is not None:
+            bpy.data.images.remove(previous)
+
+    def remove_model(self):
+        """
+        Remove the current model and everything it brought into bpy.data.
+
+        Unlinking the objects leaves their meshes, materials, images and the
+        linked library behind, so a long-lived worker would grow with every
+        model it loads; those orphans are purged here.
+        """
+        for obj in self.model_objects:
+            bpy.data.objects.remove(obj, do_unlink=True)
+        if self.model_library is not None:
+            bpy.data.libraries.remove(self.model_library)
+        self.model_objects = []
+        self.model_library = None
+        self.model = None
+        self.model_source = None
+        if hasattr(bpy.data, 'orphans_purge'):
+            bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+        else:
+            bpy.ops.outliner.orphans_purge()
+
+    def set_model(self, glb_path, asset_path=None, lod='final'):
+        """
+        Load a louver model unless it is already the one in the scene.
+
+        With asset_path (a library from build_asset_library.py) the model is
+        linked from the library's collection for the given level of detail,
+        already normalized. Otherwise the GLB is imported and placed at runtime.
+        """
+        source = (asset_path, lod) if asset_path else glb_path
+        if source == self.model_source:
+            return
+        if not os.path.exists(asset_path or glb_path):
+            raise FileNotFoundError(f"Model file not found: {asset_path or glb_path}")
+
+        self.remove_model()
+
+        if asset_path:
+            # --- Link the prepared asset as a collection instance ---
+            with bpy.data.libraries.load(asset_path, link=True) as (data_from, data_to):
+                data_to.collections = [lod if lod in data_from.collections else data_from.collections[0]]
+            model = bpy.data.objects.new(f"Louver {lod}", None)
+            model.instance_type = 'COLLECTION'
+            model.instance_collection = data_to.collections[0]
+            self.model_library = data_to.collections[0].library
+            bpy.context.scene.collection.objects.link(model)
+            model.location = (0, 0, 1)   # Raise above ground; scale is baked into the asset
+            self.model_objects = [model]
+        else:
+            # --- Import GLB ---
+            bpy.ops.import_scene.gltf(filepath=glb_path)
+            self.model_objects = list(bpy.context.selected_objects)
+            model = self.model_objects[0]
+            model.location = (0, 0, 1)   # Raise above ground
+            model.scale = (0.5, 0.5, 0.5)      # Scale up to ensure visibility
+
+        self.track.target = model
+        self.model = model
+        self.model_source = source
+
+    def render_batch(self, image_path, renders, resolution=None, settings=None):
+        """
+        Render several models over one photo, setting up the photo and settings once.
+
+        Args:
+            image_path: Background photo
+            renders: List of {"glb", "output"} dicts, rendered in order; an "asset"
+                library path, if present, is linked instead of importing the GLB
+            resolution: (width, height) in pixels, normally the photo's size so the
+                compositor lays the render over it one to one; None keeps the scene's
+            settings: Quality settings for configure()
+
+        Returns:
+            (timings, items): shared per-stage timings in seconds, and one
+            {"ok", "timings"} or {"ok": False, "error"} dict per render
+        """
+        timings = {}
+        started = time.perf_counter()
+        self.configure(settings or {})
+        scene = bpy.context.scene
+        if resolution:
+            scene.render.resolution_x, scene.render.resolution_y = resolution
+            scene.render.resolution_percentage = 100
+        timings['configure'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self.set_background(image_path)
+        timings['load_image'] = time.perf_counter() - started
+
+        items = []
+        for item in renders:
+            item_timings = {}
+            try:
+                started = time.perf_counter()
+                self.set_model(item["glb"], item.get("asset"), (settings or {}).get("lod", "final"))
+                item_timings['load_model'] = time.perf_counter() - started
+
+                # --- Render to File ---
+                started = time.perf_counter()
+                scene.render.filepath = item["output"]
+                bpy.ops.render.render(write_still=True)
+                item_timings['render'] = time.perf_counter() - started
+                items.append({"ok": True, "timings": item_timings})
+            except Exception as e:
+                items.append({"ok": False, "error": f"{type(e).__name__}: {e}", "timings": item_timings})
+        return timings, items
+
+    def render(self, image_path, render_output_path, glb_path, resolution=None, settings=None):
+        """Render one model over the photo to a PNG, returning per-stage timings in seconds"""
+        timings, (item,) = self.render_batch(image_path, [{"glb": glb_path, "output": render_output_path}],
+                                             resolution, settings)
+        if not item["ok"]:
+            raise RuntimeError(item["error"])
+        return {**timings, **item["timings"]}
+
+
+def report(result):
+    """Send a job result to the parent process"""
+    sys.stdout.write(RESULT_MARKER + json.dumps(result) + "\n")
+    sys.stdout.flush()
+
+
+def serve(renderer):
+    """
+    Worker mode: read one JSON job per line from stdin, render it and report the result.
+
+    A job is {"id", "image", "renders": [{"glb", "output"}, ...]} plus optional
+    "resolution" and "settings". The result is {"id", "ok", "timings", "items"}
+    with one item per render (see render_batch), or {"id", "ok": false, "error"}
+    if the job could not run at all. The process exits when stdin closes.
+    """
+    report({"ready": True})
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job_id = None
+        try:
+            job = json.loads(line)
+            job_id = job.get("id")
+            timings, items = renderer.render_batch(job["image"], job["renders"],
+                                                   job.get("resolution"), job.get("settings"))
+            report({"id": job_id, "ok": True, "timings": timings, "items": items})
+        except Exception as e:
+            report({"id": job_id, "ok": False, "error": f"{type(e).__name__}: {e}"})
+
 
 # --- Get args passed after "--"
 args = sys.argv[sys.argv.index("--") + 1:]
-image_path = args[0]
-render_output_path = args[1]
-glb_path = args[2]
-
-# --- Reset Scene ---
-bpy.ops.object.select_all(action='SELECT')
-bpy.ops.object.delete(use_global=False)
-
-# --- Import Image as Background (for compositor) ---
-img = bpy.data.images.load(image_path)
-
-# --- Import GLB ---
-if not os.path.exists(glb_path):
-    raise FileNotFoundError(f"GLB file not found: {glb_path}")
-bpy.ops.import_scene.gltf(filepath=glb_path)
-model = bpy.context.selected_objects[0]
-model.location = (0, 0, 1)   # Raise above ground
-model.scale = (0.5, 0.5, 0.5)      # Scale up to ensure visibility
-
-# --- Add Camera ---
-bpy.ops.object.camera_add(location=(3, -3, 2), rotation=(1.1, 0, 0.9))
-cam = bpy.context.active_object
-bpy.context.scene.camera = cam
-cam.data.lens = 5  # in mm, common values: 18 (wide) – 135 (telephoto)
-
-# Track camera to model
-track = cam.constraints.new(type='TRACK_TO')
-track.target = model
-track.track_axis = 'TRACK_NEGATIVE_Z'
-track.up_axis = 'UP_Y'
-
-# --- Add Lighting (Point light for small scenes) ---
-bpy.ops.object.light_add(type='POINT', location=(3, -3, 3))
-light = bpy.context.active_object
-light.data.energy = 500000
-
-# --- Add Shadow Catcher Plane ---
-bpy.ops.mesh.primitive_plane_add(size=10, location=(0, 0, 0))
-plane = bpy.context.active_object
-plane.name = "ShadowCatcher"
-plane.rotation_euler[0] = 0
-
-# Set plane as shadow catcher
-plane_mat = bpy.data.materials.new(name="ShadowMat")
-plane_mat.use_nodes = True
-plane.data.materials.append(plane_mat)
-plane.cycles.is_shadow_catcher = True
-
-# --- Render Settings ---
-scene = bpy.context.scene
-scene.render.engine = 'CYCLES'
-scene.cycles.device = 'GPU' if bpy.context.preferences.addons['cycles'].preferences.compute_device_type != 'NONE' else 'CPU'
-
-scene.render.film_transparent = True  # Set to False to debug background
-
-# --- Compositing Setup ---
-scene.use_nodes = True
-tree = scene.node_tree
-tree.nodes.clear()
-
-# Nodes
-bg_node = tree.nodes.new(type='CompositorNodeImage')
-bg_node.image = img
-
-rl_node = tree.nodes.new(type='CompositorNodeRLayers')
-
-alpha_node = tree.nodes.new(type='CompositorNodeAlphaOver')
-alpha_node.location.x += 400
-alpha_node.inputs[0].default_value = 1.0  # Ensure mix factor = 1
-
-comp_node = tree.nodes.new(type='CompositorNodeComposite')
-
-# Connect
-tree.links.new(rl_node.outputs['Image'], alpha_node.inputs[2])
-tree.links.new(bg_node.outputs['Image'], alpha_node.inputs[1])
-tree.links.new(alpha_node.outputs['Image'], comp_node.inputs['Image'])
-
-# --- Render to File ---
-scene.render.image_settings.file_format = 'PNG'
-scene.render.filepath = render_output_path
-bpy.ops.render.render(write_still=True)
\ No newline at end of file
+renderer = SceneRenderer()
+if args and args[0] == "--worker":
+    serve(renderer)
+else:
+    image_path = args[0]
+    render_output_path = args[1]
+    glb_path = args[2]
+    renderer.render(image_path, render_output_path, glb_path)
@@ -1,19 +1,127 @@
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
-import shutil
-import subprocess
+import asyncio
+import glob
+import hashlib
+import logging
+import threading
+import time
+import re
 import os
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-import os
+
+from asset_library import AssetBuildError, AssetLibrary
+from render_pool import DONE, RenderPool, RenderQueueFull
+from render_presets import DEFAULT_PRESET, RENDER_PRESETS, default_threads, preset_settings
+from render_store import RenderStore
+from upload_stream import UploadInvalid, UploadTooLarge, receive_upload
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+RENDER_DIR = os.path.join(STATIC_DIR, "renders")
+UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+RENDER_SCRIPT = os.path.join(BASE_DIR, "blender_scripts", "render_with_model.py")
+ASSET_DIR = os.path.join(BASE_DIR, "assets")
+ASSET_SCRIPT = os.path.join(BASE_DIR, "blender_scripts", "build_asset_library.py")
+PUBLIC_URL = os.environ.get("RENDER_PUBLIC_URL", "http://localhost:8000")
+
+# Blender (or tools/fake_blender.py, e.g. "python tools/fake_blender.py") and the worker pool size
+BLENDER_EXECUTABLE = os.environ.get("BLENDER_EXECUTABLE", "/Applications/Blender.app/Contents/MacOS/Blender")
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", "2"))
+RENDER_JOB_TIMEOUT = float(os.environ.get("RENDER_JOB_TIMEOUT", "600"))
+RENDER_MAX_PENDING = int(os.environ.get("RENDER_MAX_PENDING", "100"))
+# Jobs a Blender process runs before it is replaced with a fresh one (0 = never)
+RENDER_MAX_JOBS_PER_WORKER = int(os.environ.get("RENDER_MAX_JOBS_PER_WORKER", "200"))
+DEFAULT_MODEL = "phone"
+# Disk budget shared by uploads and cached renders, least recently used evicted first
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Largest accepted photo upload, and the size photos are downscaled to before rendering
+RENDER_MAX_UPLOAD_BYTES = int(os.environ.get("RENDER_MAX_UPLOAD_BYTES", str(64 * 1024 ** 2)))
+RENDER_MAX_WIDTH, RENDER_MAX_HEIGHT = (int(side) for side in os.environ.get("RENDER_MAX_RESOLUTION", "1920x1080").split("x"))
+# Cycles threads per worker (0 = all cores) and device ('CPU', 'GPU' or 'auto')
+RENDER_THREADS = int(os.environ.get("RENDER_THREADS", str(default_threads(RENDER_WORKERS))))
+RENDER_DEVICE = os.environ.get("RENDER_DEVICE", "auto")
+# Link models from preprocessed .blend libraries instead of importing the GLB each time
+RENDER_ASSETS = os.environ.get("RENDER_ASSETS", "1") != "0"
+# Most models one batch request may render
+RENDER_MAX_BATCH = int(os.environ.get("RENDER_MAX_BATCH", "10"))
+# Longest a status request may wait for its job to finish
+MAX_STATUS_WAIT = 30
 
 # Create the static folder if it doesn't exist
-os.makedirs("static", exist_ok=True)
+os.makedirs(STATIC_DIR, exist_ok=True)
+
+render_store = RenderStore(UPLOAD_DIR, RENDER_DIR, RENDER_CACHE_MAX_BYTES)
+
+
+asset_library = AssetLibrary(ASSET_DIR, BLENDER_EXECUTABLE, ASSET_SCRIPT, render_store.hash_file) if RENDER_ASSETS else None
+
+
+def release_assets(assets):
+    """Unpin asset libraries pinned by model_assets(), skipping None"""
+    if asset_library is not None:
+        asset_library.unpin(*(asset for asset in assets if asset))
 
 
+def finish_render(job):
+    """Publish each successful render under its cache key and release the job's photo and assets"""
+    try:
+        for render, item in zip(job.renders, job.items):
+            if item.get("ok"):
+                render_store.commit_render(render["output"], render["key"])
+            else:
+                render_store.discard(render["output"])
+    finally:
+        render_store.unpin(job.image_path)
+        release_assets(render.get("asset") for render in job.renders)
+    render_store.evict()
 
-app = FastAPI()
-app.mount("/static", StaticFiles(directory="static"), name="static")
+
+render_pool = RenderPool(BLENDER_EXECUTABLE, RENDER_SCRIPT, workers=RENDER_WORKERS,
+                         job_timeout=RENDER_JOB_TIMEOUT, max_pending=RENDER_MAX_PENDING,
+                         max_jobs_per_worker=RENDER_MAX_JOBS_PER_WORKER,
+                         on_finish=finish_render)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Start Blender once per worker up front so the first render doesn't pay for it
+    render_pool.start()
+    if asset_library is not None:
+        # Convert any new or changed models in the background
+        models = sorted(glob.glob(os.path.join(MODELS_DIR, "*.glb")))
+        threading.Thread(target=asset_library.build_all, args=(models,), name="asset-builder", daemon=True).start()
+    yield
+    await run_in_threadpool(render_pool.stop)
+
+
+class RenderFiles(StaticFiles):
+    """
+    Rendered PNGs, named by their cache key so they never change once published.
+
+    Responses support Range requests and conditional GETs (via FileResponse) and
+    may be cached by clients indefinitely. Partial renders are hidden.
+    """
+
+    async def get_response(self, path, scope):
+        if os.path.basename(path).startswith("."):
+            raise HTTPException(status_code=404)
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 206, 304):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+app = FastAPI(lifespan=lifespan)
+# Mounted before /static so it takes precedence for renders
+app.mount("/static/renders", RenderFiles(directory=RENDER_DIR), name="renders")
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3001"],  # frontend origin
@@ -21,22 +129,343 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-@app.post("/render/")
-async def render(image: UploadFile = File(...)):
-    input_path = "input.png"
-    output_path = "static/output.png"
-    glb_path = "models/phone.glb"
-
-    # Save uploaded image to disk
-    with open(input_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
-
-    # Run Blender script
-    subprocess.run([
-        "/Applications/Blender.app/Contents/MacOS/Blender", "--background",
-        "--python", "blender_scripts/render_with_model.py",
-        "--", input_path, output_path, glb_path
-    ], check=True)
-
-    # Return the path to the rendered image
-    return JSONResponse(content={"output_image_url": f"http://localhost:8000/{output_path}"})
\ No newline at end of file
+
+
+def model_path(name):
+    """Path of models/<name>.glb, rejecting anything that isn't a plain model name"""
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+        raise HTTPException(status_code=400, detail=f"Invalid model name: {name}")
+    path = os.path.join(MODELS_DIR, f"{name}.glb")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    return path
+
+
+def max_resolution(settings):
+    """Largest photo size for a preset's resolution scale"""
+    scale = settings["resolution_scale"]
+    return max(1, round(RENDER_MAX_WIDTH * scale)), max(1, round(RENDER_MAX_HEIGHT * scale))
+
+
+def render_params(settings, asset):
+    """Everything besides the photo and model that changes the rendered pixels"""
+    return {
+        "script": render_store.hash_file(RENDER_SCRIPT),
+        # Only a render that links a library depends on how libraries are built
+        "assets": asset_library.recipe() if asset else None,
+        "max_resolution": list(max_resolution(settings)),
+        "settings": settings,
+    }
+
+
+class StageTimer:
+    """Wall time of consecutive request stages, in seconds"""
+
+    def __init__(self):
+        self.timings = {}
+        self.started = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.timings[stage] = now - self.started
+        self.started = now
+
+
+def render_url(key):
+    return f"{PUBLIC_URL}/static/renders/{key}.png"
+
+
+def rounded(timings):
+    return {stage: round(seconds, 3) for stage, seconds in timings.items()}
+
+
+def job_response(job):
+    content = job.to_dict()
+    content["status_url"] = f"{PUBLIC_URL}/render/{job.id}"
+    if "models" in job.meta:
+        content["items"] = batch_items(job.meta["models"], job.meta["cached"], job)
+        # A batch is done if any model, cached or rendered, has an image
+        if job.done.is_set() and any(item["status"] == DONE for item in content["items"]):
+            content["status"] = DONE
+            content.pop("error", None)
+    elif job.status == DONE:
+        content["output_image_url"] = render_url(job.id)
+    return content
+
+
+def cached_response(key, timings=None):
+    content = {
+        "job_id": key,
+        "status": DONE,
+        "cached": True,
+        "status_url": f"{PUBLIC_URL}/render/{key}",
+        "output_image_url": render_url(key),
+    }
+    if timings:
+        content["timings"] = rounded(timings)
+    return content
+
+
+def batch_items(models, cached, job=None):
+    """
+    Per-model entries of a batch response, in request order.
+
+    Args:
+        models: Requested model names
+        cached: Dict of model name to render key for renders found in the cache
+        job: The RenderJob rendering the other models, if any
+    """
+    rendered = {}
+    if job is not None:
+        for render, item in zip(job.renders, job.items):
+            rendered[render["model"]] = (render["key"], item)
+
+    items = []
+    for model in models:
+        if model in cached:
+            items.append({"model": model, "render_id": cached[model], "status": DONE, "cached": True,
+                          "output_image_url": render_url(cached[model])})
+            continue
+        key, item = rendered[model]
+        entry = {"model": model, "render_id": key, "status": job.status, "cached": False}
+        if job.done.is_set():
+            entry["status"] = DONE if item.get("ok") else "failed"
+            if item.get("timings"):
+                entry["timings"] = rounded(item["timings"])
+            if item.get("ok"):
+                entry["output_image_url"] = render_url(key)
+            else:
+                entry["error"] = item.get("error", job.error)
+        items.append(entry)
+    return items
+
+
+async def receive_render_request(request, timer):
+    """
+    Stream the upload and read the preset.
+
+    Returns:
+        (form fields, photo hash, upload path, preset settings); the upload is
+        pinned until the caller unpins it
+    """
+    # Stream the photo to disk under its content hash, never holding it in memory
+    try:
+        fields, (image_hash, upload_path) = await receive_upload(
+            request, render_store, "image", RENDER_MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadInvalid as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    timer.lap("upload")
+
+    preset = fields.get("preset", DEFAULT_PRESET)
+    if preset not in RENDER_PRESETS:
+        render_store.unpin(upload_path)
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown preset '{preset}', expected one of {', '.join(RENDER_PRESETS)}")
+    return fields, image_hash, upload_path, preset_settings(preset, RENDER_THREADS, RENDER_DEVICE)
+
+
+def render_keys(image_hash, glb_paths, assets, settings):
+    """Cache key of the photo rendered with each model, linked from its asset library or not"""
+    return [RenderStore.render_key(image_hash, render_store.hash_file(glb_path), render_params(settings, asset))
+            for glb_path, asset in zip(glb_paths, assets)]
+
+
+def model_assets(glb_paths):
+    """
+    Asset library of each model, or None to import its GLB directly if it can't be built.
+
+    Libraries are pinned so a newer build of the model can't delete them before
+    the job has run; finish_render() releases them.
+    """
+    if asset_library is None:
+        return [None] * len(glb_paths)
+    assets = []
+    for glb_path in glb_paths:
+        try:
+            asset = asset_library.ensure(glb_path)
+        except AssetBuildError as e:
+            logger.warning("Rendering %s without an asset library: %s", glb_path, e)
+            asset = None
+        assets.append(asset if asset is not None and asset_library.pin(asset) else None)
+    return assets
+
+
+async def prepare_image(image_hash, upload_path, settings, timer):
+    """Photo copy for Blender, no larger than the render and at the photo's aspect ratio, pinned until unpin()"""
+    try:
+        prepared = await run_in_threadpool(
+            render_store.prepared_image, image_hash, upload_path, *max_resolution(settings))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    timer.lap("prepare_image")
+    return prepared
+
+
+def submit_renders(job_id, input_path, renders, resolution, settings, timer, meta=None):
+    """
+    Queue renders of one photo, keeping it from eviction until they finish.
+
+    The caller's pin on input_path passes to the job, which releases it in
+    finish_render(). If a job with this id is already queued or running (an
+    identical request got there first), that job is returned and nothing new
+    is queued.
+    """
+    try:
+        job = render_pool.submit_batch(input_path, renders, job_id=job_id,
+                                       options={"resolution": list(resolution), "settings": settings},
+                                       timings=timer.timings, meta=meta)
+    except RenderQueueFull as e:
+        render_store.unpin(input_path)
+        release_assets(render["asset"] for render in renders)
+        raise HTTPException(status_code=503, detail=str(e))
+    if job.renders is not renders:
+        # Joined an earlier job, which holds its own pins on the photo and assets
+        render_store.unpin(input_path)
+        release_assets(render["asset"] for render in renders)
+    return job
+
+
+@app.post("/render/", status_code=202)
+async def render(request: Request):
+    """
+    Queue a render of the model over the uploaded photo and return its job id straight away.
+
+    Form fields: image (the photo), optional model (a name under models/) and
+    optional preset (a key of RENDER_PRESETS, default standard). The job id is
+    the render's cache key, so a render already on disk is returned as done
+    (200) and a request matching a queued or running job joins that job.
+    """
+    timer = StageTimer()
+    fields, image_hash, upload_path, settings = await receive_render_request(request, timer)
+    try:
+        model = fields.get("model", DEFAULT_MODEL)
+        glb_path = model_path(model)
+
+        # Whether the model is linked from a library is part of the cache key
+        (asset,) = await run_in_threadpool(model_assets, [glb_path])
+        timer.lap("prepare_assets")
+        try:
+            (key,) = await run_in_threadpool(render_keys, image_hash, [glb_path], [asset], settings)
+            found = await run_in_threadpool(render_store.lookup, key)
+            timer.lap("lookup")
+            if found:
+                release_assets([asset])
+                return JSONResponse(status_code=200, content=cached_response(key, timer.timings))
+
+            input_path, resolution = await prepare_image(image_hash, upload_path, settings, timer)
+        except BaseException:
+            release_assets([asset])
+            raise
+    finally:
+        # The job only needs the prepared image, which holds its own pin
+        render_store.unpin(upload_path)
+
+    job = render_pool.get(key)
+    if job is not None and not job.done.is_set():
+        render_store.unpin(input_path)
+        release_assets([asset])
+        return JSONResponse(status_code=202, content=job_response(job))
+
+    renders = [{"glb": glb_path, "asset": asset, "output": render_store.partial_render_path(key),
+                "key": key, "model": model}]
+    job = submit_renders(key, input_path, renders, resolution, settings, timer)
+    await run_in_threadpool(render_store.evict)
+
+    return JSONResponse(status_code=202, content=job_response(job))
+
+
+@app.post("/render/batch", status_code=202)
+async def render_batch(request: Request):
+    """
+    Render one photo with several models in a single Blender session.
+
+    Form fields: image, models (comma-separated names under models/) and
+    optional preset. The photo, scene and settings are set up once and the
+    models are swapped in turn. Models already rendered for this photo and
+    preset come from the cache; if all of them do, the response is 200.
+    Otherwise it is 202 with a job id; poll /render/{job_id} for the items.
+    """
+    timer = StageTimer()
+    fields, image_hash, upload_path, settings = await receive_render_request(request, timer)
+    try:
+        models = list(dict.fromkeys(name.strip() for name in fields.get("models", "").split(",") if name.strip()))
+        if not models:
+            raise HTTPException(status_code=400, detail="No models given; send models=name1,name2")
+        if len(models) > RENDER_MAX_BATCH:
+            raise HTTPException(status_code=400, detail=f"At most {RENDER_MAX_BATCH} models per batch")
+        glb_paths = [model_path(model) for model in models]
+
+        assets = await run_in_threadpool(model_assets, glb_paths)
+        timer.lap("prepare_assets")
+        try:
+            keys = await run_in_threadpool(render_keys, image_hash, glb_paths, assets, settings)
+            cached = {}
+            for i, (model, key) in enumerate(zip(models, keys)):
+                if await run_in_threadpool(render_store.lookup, key):
+                    cached[model] = key
+                    release_assets([assets[i]])
+                    assets[i] = None
+            timer.lap("lookup")
+            if len(cached) == len(models):
+                return JSONResponse(status_code=200, content={
+                    "status": DONE, "timings": rounded(timer.timings), "items": batch_items(models, cached)})
+
+            input_path, resolution = await prepare_image(image_hash, upload_path, settings, timer)
+        except BaseException:
+            release_assets(assets)
+            raise
+    finally:
+        render_store.unpin(upload_path)
+
+    batch_id = hashlib.sha256(",".join(keys).encode("utf-8")).hexdigest()[:32]
+    job = render_pool.get(batch_id)
+    if job is not None and not job.done.is_set():
+        render_store.unpin(input_path)
+        release_assets(assets)
+        return JSONResponse(status_code=202, content=job_response(job))
+
+    renders = [{"glb": glb_path, "asset": asset, "output": render_store.partial_render_path(key),
+                "key": key, "model": model}
+               for model, glb_path, key, asset in zip(models, glb_paths, keys, assets) if model not in cached]
+    job = submit_renders(batch_id, input_path, renders, resolution, settings, timer,
+                         meta={"models": models, "cached": cached})
+    await run_in_threadpool(render_store.evict)
+
+    return JSONResponse(status_code=202, content=job_response(job))
+
+
+@app.get("/render/presets")
+async def render_presets():
+    return {"default": DEFAULT_PRESET, "presets": RENDER_PRESETS}
+
+
+@app.get("/render/stats")
+async def render_stats():
+    return {
+        **render_pool.stats(),
+        "store": await run_in_threadpool(render_store.stats),
+        "assets": await run_in_threadpool(asset_library.stats) if asset_library is not None else None,
+    }
+
+
+@app.get("/render/{job_id}")
+async def render_status(job_id: str, wait: float = 0):
+    """
+    Status of a render or batch job, with output_image_url(s) once it is done.
+
+    Pass wait=<seconds> (up to MAX_STATUS_WAIT) to hold the request until the job finishes.
+    """
+    job = render_pool.get(job_id)
+    if job is None:
+        if re.fullmatch(r"[0-9a-f]{32}", job_id) and await run_in_threadpool(render_store.lookup, job_id):
+            return cached_response(job_id)
+        raise HTTPException(status_code=404, detail=f"Unknown render job: {job_id}")
+    wait = min(max(wait, 0), MAX_STATUS_WAIT)
+    deadline = asyncio.get_running_loop().time() + wait
+    while not job.done.is_set() and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.1)
+    if "models" not in job.meta and job.status == DONE and not os.path.exists(render_store.render_path(job.id)):
+        raise HTTPException(status_code=410, detail="Render was evicted from the cache; submit it again")
+    return job_response(job)
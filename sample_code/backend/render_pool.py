@@ -0,0 +1,426 @@
+"""
+Pool of long-lived Blender processes that render jobs from a queue.
+
+Each worker process runs blender_scripts/render_with_model.py in worker mode: it
+builds the scene once, then reads one JSON job per line on stdin and answers
+with a result line on stdout. A thread per worker feeds it jobs from a shared
+queue. Request handlers only enqueue a job and return its id, so renders never
+block the event loop and Blender's startup cost is paid once per worker.
+"""
+import collections
+import json
+import logging
+import queue
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+RESULT_MARKER = "@@RESULT "
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class RenderQueueFull(Exception):
+    """Raised by submit() when the pending job queue is at its limit"""
+
+
+class RenderWorkerError(Exception):
+    """A worker process died, timed out or spoke out of protocol"""
+
+
+class RenderWorkerTimeout(RenderWorkerError):
+    """A worker took longer than the job timeout and was killed"""
+
+
+class RenderJob:
+    """
+    One render request and its outcome: one photo, one or more models.
+
+    Args:
+        image_path: Background photo
+        renders: List of dicts with at least "glb" and "output" paths, and optionally
+            a prepared "asset" library; other keys are kept for the caller
+        job_id: Id for the job (random if None)
+        options: Extra settings sent to the worker with the job
+        timings: Seconds already spent on the request by stage
+        meta: Caller data kept with the job and not sent to the worker
+    """
+
+    def __init__(self, image_path, renders, job_id=None, options=None, timings=None, meta=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.image_path = image_path
+        self.renders = renders
+        self.options = options or {}
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.error = None
+        self.timings = dict(timings or {})
+        # One {"ok", "timings", "error"} dict per render once the job has run
+        self.items = [{"ok": False} for _ in renders]
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    @property
+    def is_batch(self):
+        return len(self.renders) > 1
+
+    def complete(self, items, timings=None):
+        """Record the worker's results; the job is done if any render succeeded"""
+        self.items = items
+        self.timings.update(timings or {})
+        failures = [item.get("error", "Render failed") for item in items if not item.get("ok")]
+        if not self.is_batch:
+            # A single render reports its stages at the top level
+            self.timings.update(items[0].get("timings") or {})
+        if len(failures) < len(items):
+            self.status = DONE
+        else:
+            self.status = FAILED
+            self.error = failures[0] if len(failures) == 1 else f"All {len(failures)} renders failed"
+
+    def fail(self, error):
+        self.status = FAILED
+        self.error = error
+
+    def finish(self):
+        self.finished = time.time()
+        self.done.set()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; True if it did within the timeout"""
+        return self.done.wait(timeout)
+
+    def to_dict(self):
+        result = {
+            "job_id": self.id,
+            "status": self.status,
+            "queued_seconds": round((self.started or time.time()) - self.created, 3),
+        }
+        if self.finished is not None and self.started is not None:
+            result["run_seconds"] = round(self.finished - self.started, 3)
+        if self.timings:
+            result["timings"] = {stage: round(seconds, 3) for stage, seconds in self.timings.items()}
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+class RenderWorker:
+    """
+    One Blender process in worker mode.
+
+    Args:
+        command: Full command line starting the worker
+        startup_timeout: Seconds to wait for the worker's ready line
+    """
+
+    def __init__(self, command, startup_timeout=120):
+        self.command = command
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.results = None
+        self.log_tail = collections.deque(maxlen=20)
+        self.jobs_run = 0
+        self.starts = 0
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.results = queue.Queue()
+        self.log_tail.clear()
+        self.jobs_run = 0
+        self.starts += 1
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self._read_output, args=(self.process, self.results), daemon=True).start()
+        ready = self._next_result(self.startup_timeout)
+        if not ready.get("ready"):
+            self.stop()
+            raise RenderWorkerError(f"Unexpected first message from render worker: {ready}")
+
+    def _read_output(self, process, results):
+        """Forward result lines to the results queue; None marks the end of output"""
+        for line in process.stdout:
+            if line.startswith(RESULT_MARKER):
+                try:
+                    results.put(json.loads(line[len(RESULT_MARKER):]))
+                except ValueError:
+                    self.log_tail.append(line.rstrip())
+            else:
+                self.log_tail.append(line.rstrip())
+        results.put(None)
+
+    def _next_result(self, timeout):
+        # stop() may clear self.process from another thread while this waits
+        process = self.process
+        try:
+            result = self.results.get(timeout=timeout)
+        except queue.Empty:
+            self.stop()
+            raise RenderWorkerTimeout(f"Render worker did not answer within {timeout}s")
+        if result is None:
+            code = process.wait()
+            log = "\n".join(self.log_tail)
+            self.stop()
+            raise RenderWorkerError(f"Render worker exited with code {code}:\n{log}")
+        return result
+
+    def run(self, job, timeout):
+        """
+        Render one job in this process.
+
+        Returns:
+            The worker's result dict ({"ok": True, "timings", "items"} or {"ok": False, "error"})
+
+        Raises:
+            RenderWorkerError: If the process died or timed out; it is no longer usable
+        """
+        message = {
+            **job.options,
+            "id": job.id,
+            "image": job.image_path,
+            "renders": [{key: render[key] for key in ("glb", "output", "asset") if render.get(key)}
+                        for render in job.renders],
+        }
+        try:
+            self.process.stdin.write(json.dumps(message) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.stop()
+            raise RenderWorkerError(f"Could not send job to render worker: {e}")
+        result = self._next_result(timeout)
+        if result.get("id") != job.id:
+            self.stop()
+            raise RenderWorkerError(f"Render worker answered job {result.get('id')} instead of {job.id}")
+        self.jobs_run += 1
+        return result
+
+    def stop(self):
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+
+
+class RenderPool:
+    """
+    Bounded pool of render workers fed from one job queue.
+
+    Args:
+        executable: Blender executable; may include arguments (e.g. "python tools/fake_blender.py")
+        script_path: Blender script run in worker mode
+        workers: Number of Blender processes
+        job_timeout: Seconds a single render may take before its worker is killed
+        startup_timeout: Seconds a worker may take to start
+        max_pending: Jobs allowed to wait in the queue before submit() refuses more
+        max_jobs: Finished jobs remembered for status lookups
+        max_jobs_per_worker: Restart a worker after this many jobs (0 = never), bounding
+            whatever memory Blender does not give back between jobs
+        on_finish: Optional callback(job) run once a job's results are in but before it
+            is marked finished; if it raises, the job fails
+    """
+
+    def __init__(self, executable, script_path, workers=2, job_timeout=600, startup_timeout=120,
+                 max_pending=100, max_jobs=1000, max_jobs_per_worker=200, on_finish=None):
+        self.command = shlex.split(executable) + ["--background", "--python", script_path, "--", "--worker"]
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self.startup_timeout = startup_timeout
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.on_finish = on_finish
+
+        self.queue = queue.Queue()
+        self.jobs = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.processes = []
+        self.stopping = False
+        self.counters = {"submitted": 0, "done": 0, "failed": 0}
+
+    def start(self):
+        """Start the worker threads; each starts its Blender process straight away"""
+        self.stopping = False
+        for i in range(self.workers):
+            worker = RenderWorker(self.command, self.startup_timeout)
+            thread = threading.Thread(target=self._work, args=(worker,), name=f"render-worker-{i}", daemon=True)
+            self.processes.append(worker)
+            self.threads.append(thread)
+            thread.start()
+
+    def stop(self, timeout=10):
+        """
+        Stop taking jobs, fail the queued ones and shut the workers down.
+
+        Queued jobs fail straight away, through on_finish like any other job.
+        Workers finish the job they are running; one still busy after timeout
+        seconds is killed and its job fails.
+        """
+        with self.lock:
+            self.stopping = True
+        while True:
+            try:
+                job = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._cancel(job)
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+        for worker in self.processes:
+            worker.stop()
+        self.threads = []
+        self.processes = []
+
+    def submit(self, image_path, output_path, glb_path, job_id=None, options=None, timings=None):
+        """Queue a render of one model; see submit_batch()"""
+        return self.submit_batch(image_path, [{"glb": glb_path, "output": output_path}], job_id, options, timings)
+
+    def submit_batch(self, image_path, renders, job_id=None, options=None, timings=None, meta=None):
+        """
+        Queue renders of several models over one photo, run in order in one worker.
+
+        Args:
+            renders: List of dicts with "glb" and "output" paths (other keys are kept)
+            job_id: Id for the job (random if None). A queued or running job with the
+                same id is returned instead of queuing another; a finished one is replaced
+            options: Extra render settings sent to the worker with the job (e.g. resolution)
+            timings: Seconds already spent on the request by stage; the worker's stages are added
+            meta: Caller data kept on the job
+
+        Returns:
+            The RenderJob, whose status updates as it runs; check job.renders to
+            tell whether this call queued it or joined an earlier one
+
+        Raises:
+            RenderQueueFull: If max_pending jobs are already waiting or the pool is stopping
+        """
+        job = RenderJob(image_path, renders, job_id, options, timings, meta)
+        with self.lock:
+            if self.stopping:
+                raise RenderQueueFull("The render service is shutting down")
+            # Checked and inserted under one lock so identical requests arriving
+            # together share one render
+            existing = self.jobs.get(job.id)
+            if existing is not None and not existing.done.is_set():
+                return existing
+            if self.queue.qsize() >= self.max_pending:
+                raise RenderQueueFull(f"{self.max_pending} renders are already queued")
+            self.jobs.pop(job.id, None)
+            self.jobs[job.id] = job
+            self.counters["submitted"] += 1
+            self._forget_old_jobs()
+        self.queue.put(job)
+        return job
+
+    def get(self, job_id):
+        """The job with this id, or None if unknown or forgotten"""
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _forget_old_jobs(self):
+        # Drop the oldest finished jobs beyond max_jobs; queued and running jobs are kept
+        excess = len(self.jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done.is_set()][:excess]:
+            del self.jobs[job_id]
+
+    def _work(self, worker):
+        try:
+            worker.start()
+        except (OSError, RenderWorkerError) as e:
+            logger.warning("Render worker failed to start: %s", e)
+
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            if self.stopping:
+                self._cancel(job)
+                continue
+            job.status = RUNNING
+            job.started = time.time()
+            try:
+                result = self._run(worker, job)
+                if result.get("ok"):
+                    job.complete(result["items"], result.get("timings"))
+                else:
+                    job.fail(result.get("error", "Render failed"))
+            except (OSError, RenderWorkerError) as e:
+                job.fail(str(e))
+            except Exception as e:
+                # Keep the worker thread alive; a malformed result fails only this job
+                logger.exception("Render job %s failed", job.id)
+                job.fail(f"{type(e).__name__}: {e}")
+            self._finish(job)
+
+    def _run(self, worker, job):
+        """Run a job, restarting the worker first if needed and once more if it crashes"""
+        for attempt in range(2):
+            if self.stopping and not worker.alive():
+                # Killed by stop(); don't start Blender again
+                raise RenderWorkerError("The render service shut down during the render")
+            if not worker.alive() or (self.max_jobs_per_worker and worker.jobs_run >= self.max_jobs_per_worker):
+                worker.stop()
+                worker.start()
+            try:
+                return worker.run(job, self.job_timeout)
+            except RenderWorkerTimeout:
+                raise
+            except RenderWorkerError:
+                # The process may have died before this job reached it; retry on a fresh one
+                if attempt:
+                    raise
+
+    def _cancel(self, job):
+        job.fail("The render service shut down before the render started")
+        self._finish(job)
+
+    def _finish(self, job):
+        if self.on_finish is not None:
+            try:
+                self.on_finish(job)
+            except OSError as e:
+                job.fail(f"Could not store render: {e}")
+            except Exception as e:
+                logger.exception("Finishing render job %s failed", job.id)
+                job.fail(f"Could not store render: {type(e).__name__}: {e}")
+        job.finish()
+        with self.lock:
+            self.counters["done" if job.status == DONE else "failed"] += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.counters,
+                "workers": self.workers,
+                "workers_alive": sum(worker.alive() for worker in self.processes),
+                "worker_restarts": sum(max(worker.starts - 1, 0) for worker in self.processes),
+                "pending": self.queue.qsize(),
+                "tracked_jobs": len(self.jobs),
+            }
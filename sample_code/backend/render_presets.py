@@ -0,0 +1,69 @@
+"""
+Named render quality presets.
+
+A preset trades image quality for render time. resolution_scale is applied
+server-side, by downscaling the photo before Blender sees it (the render matches
+the photo's size), and everything else is sent to render_with_model.py with the
+job. lod picks the level of detail of the model's asset library (see
+asset_library.py). The settings are part of the render cache key, so each
+preset caches separately.
+"""
+import os
+
+DEFAULT_PRESET = "standard"
+
+RENDER_PRESETS = {
+    # Quick look while adjusting the photo: a quarter of the pixels, few samples
+    "preview": {
+        "resolution_scale": 0.5,
+        "samples": 16,
+        "adaptive_threshold": 0.1,
+        "denoise": True,
+        "tile_size": 512,
+        "persistent_data": True,
+        "lod": "preview",
+    },
+    # Default: full resolution, as before presets existed, with fewer samples than final
+    "standard": {
+        "resolution_scale": 1.0,
+        "samples": 128,
+        "adaptive_threshold": 0.03,
+        "denoise": True,
+        "tile_size": 1024,
+        "persistent_data": True,
+        "lod": "final",
+    },
+    # Full resolution for the image that goes into a proposal
+    "final": {
+        "resolution_scale": 1.0,
+        "samples": 1024,
+        "adaptive_threshold": 0.01,
+        "denoise": True,
+        "tile_size": 2048,
+        "persistent_data": True,
+        "lod": "final",
+    },
+}
+
+
+def default_threads(workers):
+    """CPU threads per Blender worker so that all workers together use each core once"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def preset_settings(name, threads, device="auto"):
+    """
+    Settings for a preset.
+
+    Args:
+        name: Key of RENDER_PRESETS
+        threads: Render threads per worker (0 lets Blender use every core)
+        device: 'CPU', 'GPU' or 'auto' (GPU if Cycles has a compute device configured)
+
+    Returns:
+        A new dict: the preset plus threads and device
+
+    Raises:
+        KeyError: If the preset does not exist
+    """
+    return {**RENDER_PRESETS[name], "threads": threads, "device": device}
@@ -0,0 +1,280 @@
+"""
+Content-addressed storage for uploaded photos and rendered outputs.
+
+Uploads are stored as <sha256 of the bytes><suffix>, so the same photo uploaded
+twice is kept once. A render is stored as <render key>.png, where the key hashes
+the photo, the GLB model, the render script and the render parameters; an
+identical request finds the finished file and skips Blender entirely. Both
+directories share one size budget, enforced by deleting the least recently
+used files (by modification time, which is refreshed on every hit).
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from PIL import Image, ImageOps
+
+CHUNK_SIZE = 1024 * 1024
+# EXIF tag holding how the camera was turned
+EXIF_ORIENTATION = 0x0112
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadWriter:
+    """
+    Streams an upload into a temporary file while hashing it.
+
+    commit() moves the file to <upload_dir>/<sha256><suffix>, or drops it if that
+    content is already stored, and pins the stored file; abort() deletes it.
+    """
+
+    def __init__(self, upload_dir, suffix, pin):
+        self.upload_dir = upload_dir
+        self.suffix = suffix
+        self.pin = pin
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.temp_path = os.path.join(upload_dir, f".{uuid.uuid4().hex}.tmp")
+        self.file = open(self.temp_path, "wb")
+
+    def write(self, chunk):
+        self.digest.update(chunk)
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        """Returns (content hash, stored path); the caller unpins the path when done with it"""
+        self.file.close()
+        content_hash = self.digest.hexdigest()
+        path = os.path.join(self.upload_dir, content_hash + self.suffix)
+        # Pinned before the file is looked up or moved in, so an evict() can't remove it under us
+        self.pin(path)
+        if os.path.exists(path):
+            os.utime(path)
+            os.remove(self.temp_path)
+        else:
+            os.replace(self.temp_path, path)
+        return content_hash, path
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class RenderStore:
+    """
+    Upload and render directories with hashing, lookup and size-based eviction.
+
+    Args:
+        upload_dir: Directory for content-addressed uploads
+        render_dir: Directory for rendered PNGs (served as static files)
+        max_bytes: Total size allowed across both directories
+    """
+
+    def __init__(self, upload_dir, render_dir, max_bytes):
+        self.upload_dir = upload_dir
+        self.render_dir = render_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.pinned = {}
+        self.file_hashes = {}
+        self.counters = {"hits": 0, "misses": 0, "evicted_files": 0, "evicted_bytes": 0}
+        for directory in (upload_dir, render_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def open_upload(self, suffix):
+        """Writer that hashes an upload while streaming it to disk; see UploadWriter"""
+        return UploadWriter(self.upload_dir, suffix, self.pin)
+
+    def save_upload(self, fileobj, suffix):
+        """
+        Store an uploaded file under the hash of its contents.
+
+        Returns:
+            (content hash, stored path), with the path pinned until unpin()
+        """
+        writer = self.open_upload(suffix)
+        try:
+            for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def prepared_image(self, image_hash, path, max_width, max_height):
+        """
+        Copy of an uploaded photo that fits within max_width x max_height.
+
+        Photos already small enough and upright are used as they are. Other
+        photos are turned upright per their EXIF orientation and downscaled;
+        the copies are stored next to the upload as <hash>-<width>x<height>.png
+        and reused.
+
+        Returns:
+            (path, (width, height)) of the image Blender should load, with the
+            path pinned until unpin()
+
+        Raises:
+            ValueError: If the upload is not a readable image
+        """
+        prepared_path = os.path.join(self.upload_dir, f"{image_hash}-{max_width}x{max_height}.png")
+        # Pin the copy before looking for it, so an evict() can't remove it in between
+        self.pin(prepared_path)
+        try:
+            image_path, size = self._prepare_image(path, prepared_path, max_width, max_height)
+        except BaseException:
+            self.unpin(prepared_path)
+            raise
+        if image_path != prepared_path:
+            self.pin(image_path)
+            self.unpin(prepared_path)
+        return image_path, size
+
+    def _prepare_image(self, path, prepared_path, max_width, max_height):
+        try:
+            with Image.open(prepared_path) as prepared:
+                os.utime(prepared_path)
+                return prepared_path, prepared.size
+        except FileNotFoundError:
+            pass
+
+        try:
+            with Image.open(path) as image:
+                orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+                # Orientations 5-8 store the photo turned by 90°: upright, width and height swap
+                rotated = orientation in (5, 6, 7, 8)
+                width, height = (image.height, image.width) if rotated else image.size
+                if width <= max_width and height <= max_height and orientation == 1:
+                    return path, image.size
+                # JPEG can decode straight at a reduced scale, which saves most of the
+                # memory; the draft size is in stored (not upright) orientation
+                image.draft("RGB", (max_height, max_width) if rotated else (max_width, max_height))
+                # Blender ignores EXIF orientation, so turn the pixels upright
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((max_width, max_height), Image.LANCZOS)
+                temp_path = os.path.join(self.upload_dir, f".{uuid.uuid4().hex}.tmp.png")
+                image.save(temp_path, format="PNG")
+                os.replace(temp_path, prepared_path)
+                return prepared_path, image.size
+        except (Image.DecompressionBombError, Image.UnidentifiedImageError, OSError) as e:
+            raise ValueError(f"Unreadable image: {e}")
+
+    def hash_file(self, path):
+        """sha256 of a file such as a GLB model, recomputed only when its size or mtime changes"""
+        stat = os.stat(path)
+        with self.lock:
+            cached = self.file_hashes.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        content_hash = file_sha256(path)
+        with self.lock:
+            self.file_hashes[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash
+
+    @staticmethod
+    def render_key(image_hash, glb_hash, params):
+        """Cache key of a render: hash of the photo, model and parameters"""
+        payload = json.dumps({"image": image_hash, "glb": glb_hash, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def render_path(self, key):
+        return os.path.join(self.render_dir, key + ".png")
+
+    def partial_render_path(self, key):
+        """Unique path for Blender to write to; moved into place by commit_render()"""
+        return os.path.join(self.render_dir, f".{key}.{uuid.uuid4().hex[:8]}.png")
+
+    def lookup(self, key):
+        """Path of a finished render, refreshing its age, or None"""
+        path = self.render_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.counters["misses"] += 1
+            return None
+        with self.lock:
+            self.counters["hits"] += 1
+        return path
+
+    def commit_render(self, partial_path, key):
+        """Atomically publish a finished render under its key"""
+        os.replace(partial_path, self.render_path(key))
+
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def pin(self, *paths):
+        """Protect files from eviction until unpin()"""
+        with self.lock:
+            for path in paths:
+                self.pinned[path] = self.pinned.get(path, 0) + 1
+
+    def unpin(self, *paths):
+        with self.lock:
+            for path in paths:
+                count = self.pinned.get(path, 0) - 1
+                if count > 0:
+                    self.pinned[path] = count
+                else:
+                    self.pinned.pop(path, None)
+
+    def _files(self):
+        files = []
+        for directory in (self.upload_dir, self.render_dir):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            files.append((stat.st_mtime, stat.st_size, entry.path))
+                    except FileNotFoundError:
+                        continue
+        return files
+
+    def evict(self):
+        """Delete least recently used files until the store fits in max_bytes"""
+        with self.lock:
+            files = self._files()
+            total = sum(size for _, size, _ in files)
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                # Skip files in use by queued or running jobs, and partial renders
+                if path in self.pinned or os.path.basename(path).startswith("."):
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.counters["evicted_files"] += 1
+                self.counters["evicted_bytes"] += size
+
+    def stats(self):
+        files = self._files()
+        with self.lock:
+            return {
+                **self.counters,
+                "files": len(files),
+                "bytes": sum(size for _, size, _ in files),
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the Blender executable, for running the render service without Blender.
+
+Accepts the same command line as Blender (`--background --python <script> -- <args>`)
+and speaks the render_with_model.py worker protocol, but "renders" by copying the
+background image to the output path. Run with build_asset_library.py it writes a
+placeholder library. Point BLENDER_EXECUTABLE at this file:
+
+    BLENDER_EXECUTABLE="python tools/fake_blender.py" uvicorn main:app
+
+Environment:
+    FAKE_BLENDER_STARTUP: Seconds to sleep before accepting jobs (default 0)
+    FAKE_BLENDER_DELAY: Seconds each render takes (default 0)
+    FAKE_BLENDER_SECONDS_PER_SAMPLE: Extra seconds per Cycles sample in the job's settings (default 0)
+    FAKE_BLENDER_FAIL: Fail jobs and asset builds whose GLB path contains this text
+"""
+import json
+import os
+import shutil
+import sys
+import time
+
+RESULT_MARKER = "@@RESULT "
+
+
+def render_batch(image_path, renders, settings=None):
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"Image not found: {image_path}")
+    items = []
+    for item in renders:
+        started = time.perf_counter()
+        try:
+            model_path = item.get("asset") or item["glb"]
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"Model file not found: {model_path}")
+            fail = os.environ.get("FAKE_BLENDER_FAIL")
+            if fail and fail in item["glb"]:
+                raise RuntimeError(f"Simulated render failure for {item['glb']}")
+            samples = (settings or {}).get("samples", 0)
+            time.sleep(float(os.environ.get("FAKE_BLENDER_DELAY", "0"))
+                       + samples * float(os.environ.get("FAKE_BLENDER_SECONDS_PER_SAMPLE", "0")))
+            shutil.copyfile(image_path, item["output"])
+            items.append({"ok": True, "timings": {"render": time.perf_counter() - started}})
+        except Exception as e:
+            items.append({"ok": False, "error": f"{type(e).__name__}: {e}", "timings": {}})
+    return {}, items
+
+
+def build_asset(glb_path, library_path):
+    fail = os.environ.get("FAKE_BLENDER_FAIL")
+    if fail and fail in glb_path:
+        raise RuntimeError(f"Simulated asset build failure for {glb_path}")
+    shutil.copyfile(glb_path, library_path)
+
+
+def report(result):
+    sys.stdout.write(RESULT_MARKER + json.dumps(result) + "\n")
+    sys.stdout.flush()
+
+
+def main(argv):
+    args = argv[argv.index("--") + 1:] if "--" in argv else []
+    # Mimic Blender's startup noise so the parent has to filter for result lines
+    print("Blender 0.0.0 (fake)", flush=True)
+    time.sleep(float(os.environ.get("FAKE_BLENDER_STARTUP", "0")))
+
+    script = argv[argv.index("--python") + 1] if "--python" in argv else ""
+    if os.path.basename(script) == "build_asset_library.py":
+        build_asset(args[0], args[1])
+        return 0
+
+    if args and args[0] == "--worker":
+        report({"ready": True})
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            job_id = None
+            try:
+                job = json.loads(line)
+                job_id = job.get("id")
+                timings, items = render_batch(job["image"], job["renders"], job.get("settings"))
+                report({"id": job_id, "ok": True, "timings": timings, "items": items})
+            except Exception as e:
+                report({"id": job_id, "ok": False, "error": f"{type(e).__name__}: {e}"})
+        return 0
+
+    _, (item,) = render_batch(args[0], [{"glb": args[2], "output": args[1]}])
+    if not item["ok"]:
+        print(item["error"], file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,168 @@
+"""
+Streaming multipart/form-data parsing straight into the render store.
+
+Starlette's form parsing spools each file into a temporary file that the handler
+then copies again. Here the request body is fed chunk by chunk to a multipart
+parser, and the bytes of the wanted file part go straight into a hashing upload
+writer. A large photo is written to disk once, never held in memory, and
+rejected as soon as it passes the size limit.
+"""
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Largest non-file field kept in memory
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """The request body or the uploaded file is over the size limit"""
+
+
+class UploadInvalid(Exception):
+    """The request is not a usable multipart/form-data upload"""
+
+
+class MultipartUpload:
+    """
+    Multipart body consumer: small fields into memory, one file field into the store.
+
+    Args:
+        store: RenderStore receiving the file
+        file_field: Name of the form field holding the file to keep
+        max_file_bytes: Size limit for that file; other file parts are discarded
+        suffixes: Allowed file suffixes, the first being the default
+    """
+
+    def __init__(self, store, file_field, max_file_bytes, suffixes=(".png", ".jpg", ".jpeg")):
+        self.store = store
+        self.file_field = file_field
+        self.max_file_bytes = max_file_bytes
+        self.suffixes = suffixes
+
+        self.fields = {}
+        self.upload = None  # (content hash, path) once the file part is complete
+
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._name = None
+        self._writer = None
+        self._value = None
+        self._size = 0
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field_data,
+            "on_header_value": self._header_value_data,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self):
+        self._headers = {}
+        self._name = None
+        self._value = None
+        self._size = 0
+
+    def _header_field_data(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _header_value_data(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _header_end(self):
+        self._headers[self._header_field.strip().lower()] = self._header_value.strip()
+        self._header_field = b""
+        self._header_value = b""
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        if filename is None:
+            self._value = bytearray()
+        elif self._name == self.file_field and self.upload is None:
+            suffix = "." + filename.decode("utf-8", "replace").rsplit(".", 1)[-1].lower() if b"." in filename else ""
+            self._writer = self.store.open_upload(suffix if suffix in self.suffixes else self.suffixes[0])
+
+    def _part_data(self, data, start, end):
+        self._size += end - start
+        if self._writer is not None:
+            if self._size > self.max_file_bytes:
+                raise UploadTooLarge(f"Upload is larger than {self.max_file_bytes} bytes")
+            self._writer.write(data[start:end])
+        elif self._value is not None:
+            if self._size > MAX_FIELD_BYTES:
+                raise UploadInvalid(f"Form field '{self._name}' is larger than {MAX_FIELD_BYTES} bytes")
+            self._value += data[start:end]
+        # Other file parts (e.g. the mask) are skipped without being stored
+
+    def _part_end(self):
+        if self._writer is not None:
+            self.upload = self._writer.commit()
+            self._writer = None
+        elif self._value is not None:
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+            self._value = None
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+        if self.upload is not None:
+            self.store.unpin(self.upload[1])
+            self.upload = None
+
+
+async def receive_upload(request, store, file_field, max_file_bytes):
+    """
+    Stream a multipart/form-data request body, storing one file field in the store.
+
+    Args:
+        request: Starlette/FastAPI request
+        store: RenderStore receiving the file
+        file_field: Form field holding the file
+        max_file_bytes: Size limit for the file
+
+    Returns:
+        (fields, (content hash, stored path)), with the stored path pinned in
+        the store until the caller unpins it
+
+    Raises:
+        UploadTooLarge: If the file is over max_file_bytes
+        UploadInvalid: If the body is not multipart or lacks the file
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UploadInvalid("Expected a multipart/form-data body")
+
+    # Reject bodies that announce they are too big before reading any of them
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_file_bytes + MAX_FIELD_BYTES:
+        raise UploadTooLarge(f"Upload is larger than {max_file_bytes} bytes")
+
+    upload = MultipartUpload(store, file_field, max_file_bytes)
+    parser = MultipartParser(options[b"boundary"], upload.callbacks())
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                # Hashing and disk writes happen off the event loop
+                await run_in_threadpool(parser.write, chunk)
+        parser.finalize()
+    except (UploadTooLarge, UploadInvalid):
+        upload.abort()
+        raise
+    except Exception as e:
+        upload.abort()
+        raise UploadInvalid(f"Malformed multipart body: {e}")
+
+    if upload.upload is None:
+        raise UploadInvalid(f"Missing file field '{file_field}'")
+    return upload.fields, upload.upload
@@ -30,8 +30,23 @@ function App() {
         return;
       }
 
-      const data = await response.json();
-      setRenderedImageUrl(data.output_image_url); // Save URL from backend
+      // The backend queues the render; wait on its status URL until it finishes
+      let job = await response.json();
+      while (job.status === 'queued' || job.status === 'running') {
+        const statusResponse = await fetch(`${job.status_url}?wait=10`);
+        if (!statusResponse.ok) {
+          alert('Failed to render image');
+          return;
+        }
+        job = await statusResponse.json();
+      }
+
+      if (job.status !== 'done') {
+        console.error('Render failed:', job.error);
+        alert('Failed to render image');
+        return;
+      }
+      setRenderedImageUrl(job.output_image_url); // Save URL from backend
 
     } catch (error) {
       console.error('Error submitting images:', error);
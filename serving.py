@@ -0,0 +1,183 @@
+"""
+Bounded thread-pool WSGI server for the weather API.
+
+Flask's development server handles one request at a time (or spawns an
+unbounded thread per connection with threaded=True). PooledWSGIServer runs
+each connection on a fixed-size thread pool instead, so a few slow geocode or
+Earth Engine lookups cannot stall other clients and a traffic spike cannot
+spawn thousands of threads. Only a bounded number of connections may wait for
+a free worker; beyond that the server answers 503 straight away rather than
+holding sockets open.
+
+Blocking calls made while handling a request should go through
+wait_or_cancel(), which returns early with ClientDisconnected if the client
+has gone away, so abandoned requests stop holding a worker.
+"""
+import logging
+import select
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# How often a waiting request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.25
+
+# Sent to connections refused because every worker is busy and the queue is full
+OVERLOADED_BODY = b'{"error": "Server is overloaded"}\n'
+OVERLOADED_RESPONSE = (b'HTTP/1.0 503 Service Unavailable\r\n'
+                       b'Content-Type: application/json\r\n'
+                       b'Retry-After: 1\r\n'
+                       b'Connection: close\r\n'
+                       b'Content-Length: %d\r\n'
+                       b'\r\n' % len(OVERLOADED_BODY)) + OVERLOADED_BODY
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client closed the connection while its request was being processed"""
+
+
+class OneShotRequestHandler(WSGIRequestHandler):
+    # HTTP/1.0 closes the connection after each response, so idle keep-alive
+    # connections cannot pin pool workers
+    protocol_version = 'HTTP/1.0'
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    WSGI server that serves connections on a bounded ThreadPoolExecutor.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        app: WSGI application
+        workers: Maximum number of requests processed concurrently
+        max_pending: Connections allowed to wait for a free worker; further
+            connections are answered with 503 and closed
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, workers=32, max_pending=64):
+        super().__init__(host, port, app, handler=OneShotRequestHandler)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='wsgi')
+        # One slot per connection being served or waiting in the executor's queue
+        self.slots = threading.BoundedSemaphore(workers + max_pending)
+        self.rejected = 0
+
+    def process_request(self, request, client_address):
+        if not self.slots.acquire(blocking=False):
+            self._reject(request)
+            return
+        try:
+            self.executor.submit(self._process_request_worker, request, client_address)
+        except RuntimeError:
+            # The executor has been shut down
+            self.slots.release()
+            self.shutdown_request(request)
+
+    def _reject(self, request):
+        """Answer 503 without reading the request, on the accepting thread"""
+        self.rejected += 1
+        if self.rejected == 1 or self.rejected % 1000 == 0:
+            logger.warning("Server overloaded: %d connection(s) refused so far", self.rejected)
+        try:
+            # Drop whatever part of the request has arrived, so closing the
+            # socket doesn't reset the connection before the client reads the 503
+            request.setblocking(False)
+            try:
+                while request.recv(65536):
+                    pass
+            except (BlockingIOError, InterruptedError):
+                pass
+            request.setblocking(True)
+            request.settimeout(1)
+            request.sendall(OVERLOADED_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pooled(app, host='0.0.0.0', port=5000, workers=32, max_pending=64):
+    """Serve a WSGI app on a PooledWSGIServer until interrupted"""
+    server = PooledWSGIServer(host, port, app, workers=workers, max_pending=max_pending)
+    logger.info("Serving on http://%s:%s with %d worker threads and up to %d queued connections",
+                host, port, workers, max_pending)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def client_disconnected(environ):
+    """
+    Check whether the client behind a WSGI request has closed its connection.
+
+    Only works on servers that expose the socket as 'werkzeug.socket'; anywhere
+    else the client is assumed to be connected.
+    """
+    connection = environ.get('werkzeug.socket') if environ else None
+    if connection is None:
+        return False
+    try:
+        readable, _, _ = select.select([connection], [], [], 0)
+        if not readable:
+            return False
+        # Readable with no data means the peer sent FIN
+        return connection.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
+def wait_or_cancel(future, environ=None, timeout=None):
+    """
+    Wait for a future while watching the client connection.
+
+    Args:
+        future: concurrent.futures.Future to wait for
+        environ: WSGI environ of the request doing the waiting, or None
+        timeout: Maximum seconds to wait, or None to wait indefinitely
+
+    Returns:
+        The future's result
+
+    Raises:
+        ClientDisconnected: If the client went away first; the future is
+            cancelled if it has not started running yet
+        TimeoutError: If the timeout expired
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        poll = DISCONNECT_POLL_SECONDS
+        if deadline is not None:
+            poll = min(poll, max(deadline - time.monotonic(), 0))
+        try:
+            return future.result(timeout=poll)
+        except FutureTimeoutError:
+            if client_disconnected(environ):
+                future.cancel()
+                raise ClientDisconnected()
+            if deadline is not None and time.monotonic() >= deadline:
+                future.cancel()
+                raise TimeoutError('Timed out waiting for result')
@@ -1,120 +1,201 @@
-import gradio as gr
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
+import functools
+import itertools
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
-# Set style for plots
-plt.style.use('seaborn-v0_8')
-sns.set_palette("husl")
+# Importing this module loads only the standard library and charts.py. gradio
+# (which itself imports NumPy, pandas and matplotlib) loads in build_demo(),
+# pandas and NumPy with the catalogue index and matplotlib with the first chart.
+# Serving the UI still pays for the gradio import; see benchmarks/startup_time.py.
+from charts import ChartCache, agg_figure_classes
 
-# Create some dummy louver data
-louver_data = pd.DataFrame({
+logger = logging.getLogger(__name__)
+
+# Comparison charts are drawn on a small thread pool and cached as PNGs per
+# recommendation set; matplotlib loads with the first chart
+CHART_CACHE_DIR = os.environ.get('CHART_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'louver-charts'))
+chart_cache = ChartCache(CHART_CACHE_DIR, workers=int(os.environ.get('CHART_WORKERS', '2')))
+
+# Dropdown choices; together they define every possible recommendation query
+BUILDING_TYPES = ['Commercial', 'Industrial', 'Residential', 'Warehouse']
+PRIMARY_PURPOSES = ['Fresh air intake', 'Exhaust air outlet', 'Equipment screening',
+                    'Weather protection', 'Natural ventilation', 'Architectural feature']
+PERFORMANCE_PRIORITIES = ['Maximum airflow', 'High weather protection',
+                          'Balanced cost/performance', 'Cost-effective', 'Best trade-offs']
+BUILDING_HEIGHTS = ['Low-rise', 'Mid-rise', 'High-rise']
+ENVIRONMENTAL_EXPOSURES = ['City center', 'Suburban', 'Near coast/water', 'Open/rural']
+# Choices of each input, in order; their product is every valid query
+INPUT_CHOICES = (BUILDING_TYPES, PRIMARY_PURPOSES, PERFORMANCE_PRIORITIES, BUILDING_HEIGHTS, ENVIRONMENTAL_EXPOSURES)
+# Initial dropdown values, in the order of the inputs above
+DEFAULT_INPUTS = ('Commercial', 'Fresh air intake', 'Balanced cost/performance', 'Mid-rise', 'City center')
+
+# What to prepare when the app starts: 'background' builds the catalogue
+# index, fills the recommendation cache and draws the default chart in a thread
+# once the UI is being served; 'eager' does the same before launching; 'off'
+# leaves everything to the first click
+WARM_START = os.environ.get('WARM_START', 'background')
+
+# Dummy louver catalogue, as columns; see catalogue_index() for the DataFrame
+LOUVER_CATALOGUE = {
     'model': ['PL-1075', 'PL-2075', 'PL-2170', 'PL-2250', 'PL-2250V', 'PL-3075', 'PL-2150V', 'AC-150', 'AC-300'],
     'airflow_rating': [85, 70, 65, 60, 75, 55, 70, 90, 80],
     'water_resistance': [65, 75, 80, 85, 80, 90, 75, 60, 70],
     'cost_factor': [1.0, 1.2, 1.3, 1.5, 1.8, 2.0, 1.7, 0.9, 1.1],
     'profile_depth': [75, 75, 70, 50, 50, 75, 50, 50, 75],
     'rain_defense_class': ['C', 'B', 'B', 'A', 'A', 'A', 'B', 'D', 'C']
-})
+}
 
 def determine_rain_class(rainfall, wind_speed, exposure_type='medium'):
-    """Simple function to determine rain class based on rainfall and wind speed"""
+    """Determine rain class from rainfall and wind speed, assuming the facade faces the wind"""
     # Convert wind speed from km/h to m/s if needed
     wind_speed_ms = wind_speed / 3.6 if wind_speed > 10 else wind_speed
     
-    # Exposure coefficients
-    exposure_map = {
-        'high': 0.35,    # Coastal areas, open terrain
-        'medium': 0.25,  # Suburban, forest
-        'low': 0.2,      # City centers, dense urban areas
-    }
-    
-    # Get exposure coefficient
-    a = exposure_map.get(exposure_type, 0.25)
-    
-    # Calculate wind-driven rain coefficient
-    c_wdr = min(1, a * wind_speed_ms)
-    
-    # Calculate effective rainfall (mm/day)
-    effective_rainfall = rainfall * c_wdr
-    
-    # Determine rain class based on effective rainfall
-    if effective_rainfall < 60:
-        return 'D'
-    elif effective_rainfall < 100:
-        return 'C'
-    elif effective_rainfall < 150:
-        return 'B'
-    else:
-        return 'A'
+    # Same BS EN 13030 calculation as the weather API, for the worst-case facade
+    from rain_class import get_rain_class
+    return get_rain_class(rainfall, wind_speed_ms, 0, exposure_type, exposure_dir=0)
+
+# Ranking column for each performance priority; anything else uses the balanced score
+PRIORITY_RANKING = {
+    'Maximum airflow': 'airflow_rating',
+    'High weather protection': 'water_resistance',
+    'Cost-effective': 'cost_factor',
+}
+
+# Priority answered from the Pareto front of airflow, water resistance and cost
+PARETO_PRIORITY = 'Best trade-offs'
+# Exposures where water resistance counts for more when picking from the front
+EXPOSED_ENVIRONMENTS = {'Near coast/water', 'Open/rural'}
+
+# Catalogue DataFrame and its index, built by catalogue_index() on first use.
+# Queries binary-search presorted columns instead of copying the catalogue.
+louver_data = None
+louver_index = None
+catalogue_lock = threading.Lock()
+# Bumped by reload_catalogue(); part of the recommendation cache key
+catalogue_version = 0
+
+def catalogue_index():
+    """The LouverIndex over the catalogue, importing pandas and NumPy to build it on first use"""
+    global louver_data, louver_index
+    with catalogue_lock:
+        if louver_index is None:
+            import pandas as pd
+            from louver_index import LouverIndex
+            louver_data = pd.DataFrame(LOUVER_CATALOGUE)
+            louver_index = LouverIndex(louver_data)
+        return louver_index
 
 def get_louver_recommendations(building_type, primary_purpose, performance_priority, 
                               building_height, environmental_exposure):
     """Generate louver recommendations based on inputs"""
     
-    # Start with all louvers
-    filtered_louvers = louver_data.copy()
+    # Collect thresholds based on inputs
+    minimum = {}
+    maximum = {}
     
-    # Apply filters based on inputs
     if primary_purpose == 'Fresh air intake' or primary_purpose == 'Natural ventilation':
         # Prioritize airflow
-        filtered_louvers = filtered_louvers[filtered_louvers['airflow_rating'] >= 70]
+        minimum['airflow_rating'] = 70
     
     if primary_purpose == 'Weather protection' or environmental_exposure == 'Near coast/water':
         # Prioritize water resistance
-        filtered_louvers = filtered_louvers[filtered_louvers['water_resistance'] >= 75]
+        minimum['water_resistance'] = 75
     
     if performance_priority == 'Cost-effective':
         # Prioritize cost
-        filtered_louvers = filtered_louvers[filtered_louvers['cost_factor'] <= 1.3]
+        maximum['cost_factor'] = 1.3
     
     if performance_priority == 'High weather protection':
         # Prioritize water resistance
-        filtered_louvers = filtered_louvers[filtered_louvers['water_resistance'] >= 80]
+        minimum['water_resistance'] = max(minimum.get('water_resistance', 0), 80)
+    
+    index = catalogue_index()
+    if performance_priority == PARETO_PRIORITY:
+        # Only louvers no other louver beats on all three objectives
+        weights = None
+        if environmental_exposure in EXPOSED_ENVIRONMENTS:
+            weights = {'airflow_rating': 0.3, 'water_resistance': 0.5, 'cost_factor': 0.2}
+        find = lambda **bounds: index.pareto(k=3, weights=weights, **bounds)
+    else:
+        rank_by = PRIORITY_RANKING.get(performance_priority, 'balanced_score')
+        find = lambda **bounds: index.query(rank_by, k=3, **bounds)
+    
+    # Return top 3 recommendations
+    positions = find(minimum=minimum, maximum=maximum)
     
     # If no louvers match all criteria, return top 3 from original data
-    if len(filtered_louvers) == 0:
+    if len(positions) == 0:
         print("No exact matches, returning best overall options")
-        if performance_priority == 'Maximum airflow':
-            return louver_data.sort_values('airflow_rating', ascending=False).head(3)
-        elif performance_priority == 'High weather protection':
-            return louver_data.sort_values('water_resistance', ascending=False).head(3)
-        elif performance_priority == 'Cost-effective':
-            return louver_data.sort_values('cost_factor').head(3)
-        else:
-            # Balanced approach - create a score
-            louver_data['balanced_score'] = (
-                louver_data['airflow_rating'] * 0.4 + 
-                louver_data['water_resistance'] * 0.4 + 
-                (100 - louver_data['cost_factor'] * 50) * 0.2
-            )
-            return louver_data.sort_values('balanced_score', ascending=False).head(3)
+        positions = find()
     
-    # Return top 3 recommendations
-    if performance_priority == 'Maximum airflow':
-        return filtered_louvers.sort_values('airflow_rating', ascending=False).head(3)
-    elif performance_priority == 'High weather protection':
-        return filtered_louvers.sort_values('water_resistance', ascending=False).head(3)
-    elif performance_priority == 'Cost-effective':
-        return filtered_louvers.sort_values('cost_factor').head(3)
-    else:
-        # Balanced approach
-        filtered_louvers['balanced_score'] = (
-            filtered_louvers['airflow_rating'] * 0.4 + 
-            filtered_louvers['water_resistance'] * 0.4 + 
-            (100 - filtered_louvers['cost_factor'] * 50) * 0.2
-        )
-        return filtered_louvers.sort_values('balanced_score', ascending=False).head(3)
+    return index.rows(positions)
+
+# Sized for every dropdown combination; cached_recommendations() rejects values
+# that aren't a dropdown choice, so clients can't grow it
+@functools.lru_cache(maxsize=math.prod(len(choices) for choices in INPUT_CHOICES))
+def versioned_recommendations(version, *inputs):
+    """get_louver_recommendations, memoized per catalogue version"""
+    return get_louver_recommendations(*inputs)
+
+def cached_recommendations(building_type, primary_purpose, performance_priority,
+                           building_height, environmental_exposure):
+    """
+    Memoized get_louver_recommendations, shared by the text and chart outputs.
+    
+    The returned DataFrame is shared between callers and must not be modified.
+    Results are keyed on the catalogue version read before the lookup, so a
+    lookup still running when reload_catalogue() swaps the catalogue can only
+    cache its result under the old version, which is never asked for again.
+    """
+    inputs = (building_type, primary_purpose, performance_priority, building_height, environmental_exposure)
+    for value, choices in zip(inputs, INPUT_CHOICES):
+        if value not in choices:
+            import gradio as gr
+            raise gr.Error(f"Unknown option: {value}")
+    return versioned_recommendations(catalogue_version, *inputs)
+
+def warm_recommendation_cache():
+    """Compute recommendations for every dropdown combination"""
+    for inputs in itertools.product(*INPUT_CHOICES):
+        cached_recommendations(*inputs)
+
+def recommendation_cache_stats():
+    """Hit/miss counters of the recommendation cache"""
+    info = versioned_recommendations.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'entries': info.currsize}
+
+def warm_start():
+    """Load the data and plotting libraries and fill the caches before the first click"""
+    started = time.perf_counter()
+    warm_recommendation_cache()
+    agg_figure_classes()
+    create_comparison_chart(*DEFAULT_INPUTS)
+    logger.info("Warm start done in %.2fs: %d recommendation combinations cached",
+                time.perf_counter() - started, recommendation_cache_stats()['entries'])
+
+def reload_catalogue(new_louver_data):
+    """Replace the louver catalogue, rebuild the index and drop cached recommendations"""
+    global louver_data, louver_index, catalogue_version
+    from louver_index import LouverIndex
+    new_index = LouverIndex(new_louver_data)
+    with catalogue_lock:
+        louver_data = new_louver_data
+        louver_index = new_index
+        catalogue_version += 1
+        versioned_recommendations.cache_clear()
 
 def predict_louvers(building_type, primary_purpose, performance_priority, 
                    building_height, environmental_exposure):
     """Main prediction function for Gradio interface"""
     
     # Get recommendations
-    recommendations = get_louver_recommendations(
+    recommendations = cached_recommendations(
         building_type, primary_purpose, performance_priority,
         building_height, environmental_exposure
     )
@@ -152,10 +233,10 @@ def predict_louvers(building_type, primary_purpose, performance_priority,
 
 def create_comparison_chart(building_type, primary_purpose, performance_priority, 
                            building_height, environmental_exposure):
-    """Create a comparison chart of recommended louvers"""
+    """Path of a PNG comparison chart of the recommended louvers, or None if there are none"""
     
     # Get recommendations
-    recommendations = get_louver_recommendations(
+    recommendations = cached_recommendations(
         building_type, primary_purpose, performance_priority,
         building_height, environmental_exposure
     )
@@ -163,128 +244,121 @@ def create_comparison_chart(building_type, primary_purpose, performance_priority
     if len(recommendations) == 0:
         return None
     
-    # Create comparison chart
-    plt.figure(figsize=(10, 6))
-    
-    # Extract data for plotting
-    models = recommendations['model'].tolist()
-    airflow = recommendations['airflow_rating'].tolist()
-    water = recommendations['water_resistance'].tolist()
-    cost = [c * 50 for c in recommendations['cost_factor'].tolist()]  # Scale cost for visualization
-    
-    # Set up bar positions
-    x = np.arange(len(models))
-    width = 0.25
-    
-    # Create bars
-    plt.bar(x - width, airflow, width, label='Airflow Rating', color='skyblue')
-    plt.bar(x, water, width, label='Water Resistance', color='navy')
-    plt.bar(x + width, cost, width, label='Cost (scaled)', color='darkred')
-    
-    # Customize chart
-    plt.xlabel('Louver Models')
-    plt.ylabel('Rating')
-    plt.title('Louver Comparison')
-    plt.xticks(x, models)
-    plt.ylim(0, 100)
-    plt.legend()
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    
-    return plt
+    return chart_cache.comparison_chart(
+        recommendations['model'].tolist(),
+        recommendations['airflow_rating'].tolist(),
+        recommendations['water_resistance'].tolist(),
+        recommendations['cost_factor'].tolist()
+    )
 
-# Create Gradio interface
-with gr.Blocks(title="Louver Selector Tool", theme=gr.themes.Soft()) as demo:
-    gr.Markdown("""
-    # 🏢 Louver Selector Tool
-    
-    **Find the perfect louver solution for your architectural project**
-    
-    This tool helps architects and engineers select the optimal louver system based on:
-    - Building characteristics
-    - Performance requirements
-    - Local weather conditions
-    """)
-    
-    with gr.Row():
-        with gr.Column():
-            gr.Markdown("### 🏗️ Project Parameters")
-            building_type = gr.Dropdown(
-                choices=['Commercial', 'Industrial', 'Residential', 'Warehouse'],
-                label="Building Type",
-                value="Commercial"
-            )
+def predict_and_compare(building_type, primary_purpose, performance_priority,
+                        building_height, environmental_exposure):
+    """Recommendation text and comparison chart for one button click"""
+    inputs = (building_type, primary_purpose, performance_priority,
+              building_height, environmental_exposure)
+    return predict_louvers(*inputs), create_comparison_chart(*inputs)
+
+def build_demo():
+    """The Gradio Blocks UI; gradio is imported here, not when this module is"""
+    import gradio as gr
+
+    with gr.Blocks(title="Louver Selector Tool", theme=gr.themes.Soft()) as demo:
+        gr.Markdown("""
+        # 🏢 Louver Selector Tool
+    
+        **Find the perfect louver solution for your architectural project**
+    
+        This tool helps architects and engineers select the optimal louver system based on:
+        - Building characteristics
+        - Performance requirements
+        - Local weather conditions
+        """)
+    
+        with gr.Row():
+            with gr.Column():
+                gr.Markdown("### 🏗️ Project Parameters")
+                building_type = gr.Dropdown(
+                    choices=BUILDING_TYPES,
+                    label="Building Type",
+                    value=DEFAULT_INPUTS[0]
+                )
             
-            primary_purpose = gr.Dropdown(
-                choices=['Fresh air intake', 'Exhaust air outlet', 'Equipment screening', 
-                        'Weather protection', 'Natural ventilation', 'Architectural feature'],
-                label="Primary Purpose", 
-                value="Fresh air intake"
-            )
+                primary_purpose = gr.Dropdown(
+                    choices=PRIMARY_PURPOSES,
+                    label="Primary Purpose", 
+                    value=DEFAULT_INPUTS[1]
+                )
             
-            performance_priority = gr.Dropdown(
-                choices=['Maximum airflow', 'High weather protection', 
-                       'Balanced cost/performance', 'Cost-effective'],
-                label="Performance Priority",
-                value="Balanced cost/performance"
-            )
+                performance_priority = gr.Dropdown(
+                    choices=PERFORMANCE_PRIORITIES,
+                    label="Performance Priority",
+                    value=DEFAULT_INPUTS[2]
+                )
         
-        with gr.Column():
-            gr.Markdown("### 🌍 Environmental Conditions")
-            building_height = gr.Dropdown(
-                choices=['Low-rise', 'Mid-rise', 'High-rise'],
-                label="Building Height",
-                value="Mid-rise"
-            )
+            with gr.Column():
+                gr.Markdown("### 🌍 Environmental Conditions")
+                building_height = gr.Dropdown(
+                    choices=BUILDING_HEIGHTS,
+                    label="Building Height",
+                    value=DEFAULT_INPUTS[3]
+                )
             
-            environmental_exposure = gr.Dropdown(
-                choices=['City center', 'Suburban', 'Near coast/water', 'Open/rural'],
-                label="Environmental Exposure",
-                value="City center"
-            )
-    
-    with gr.Row():
-        predict_btn = gr.Button("🔍 Get Louver Recommendations", variant="primary", size="lg")
-    
-    with gr.Row():
-        with gr.Column():
-            recommendation_output = gr.Markdown()
-        with gr.Column():
-            comparison_chart = gr.Plot(label="Comparison Chart")
-    
-    predict_btn.click(
-        fn=predict_louvers,
-        inputs=[building_type, primary_purpose, performance_priority, building_height,
-               environmental_exposure],
-        outputs=recommendation_output
-    )
-    
-    predict_btn.click(
-        fn=create_comparison_chart,
-        inputs=[building_type, primary_purpose, performance_priority, building_height,
-               environmental_exposure],
-        outputs=comparison_chart
-    )
+                environmental_exposure = gr.Dropdown(
+                    choices=ENVIRONMENTAL_EXPOSURES,
+                    label="Environmental Exposure",
+                    value=DEFAULT_INPUTS[4]
+                )
+    
+        with gr.Row():
+            predict_btn = gr.Button("🔍 Get Louver Recommendations", variant="primary", size="lg")
+    
+        with gr.Row():
+            with gr.Column():
+                recommendation_output = gr.Markdown()
+            with gr.Column():
+                comparison_chart = gr.Image(label="Comparison Chart", type="filepath")
+    
+        # One handler for both outputs, so a click computes the recommendations once
+        predict_btn.click(
+            fn=predict_and_compare,
+            inputs=[building_type, primary_purpose, performance_priority, building_height,
+                   environmental_exposure],
+            outputs=[recommendation_output, comparison_chart]
+        )
     
-    gr.Markdown("""
-    ---
-    ### 📊 How It Works
+        gr.Markdown("""
+        ---
+        ### 📊 How It Works
     
-    This tool combines:
-    1. **Project requirements analysis**
-    2. **Performance matching algorithm**
-    3. **Visual comparison of options**
+        This tool combines:
+        1. **Project requirements analysis**
+        2. **Performance matching algorithm**
+        3. **Visual comparison of options**
     
-    For detailed specifications, please contact our engineering team.
-    """)
+        For detailed specifications, please contact our engineering team.
+        """)
+    return demo
+
+def __getattr__(name):
+    # simple_gradio_app.demo (used by `gradio simple_gradio_app.py`) is built on first access
+    if name == 'demo':
+        globals()['demo'] = build_demo()
+        return globals()['demo']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
-    print("Starting Simple Gradio Louver Selector Tool...")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    logger.info("Starting Simple Gradio Louver Selector Tool...")
+    if WARM_START == 'eager':
+        warm_start()
     try:
         # Launch the Gradio app
-        print("Launching Gradio interface...")
-        demo.launch(server_name="localhost", server_port=7860)
-        print("Gradio server started successfully!")
-    except Exception as e:
-        print(f"Error starting Gradio server: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.info("Launching Gradio interface...")
+        demo = build_demo()
+        demo.launch(server_name="localhost", server_port=7860, prevent_thread_lock=True)
+        logger.info("Gradio server started successfully!")
+        if WARM_START == 'background':
+            threading.Thread(target=warm_start, name='warm-start', daemon=True).start()
+        demo.block_thread()
+    except Exception:
+        logger.exception("Error starting Gradio server")
@@ -0,0 +1,297 @@
+"""
+Spatial index of sites already resolved through Earth Engine.
+
+A new location close to a known site can reuse that site's climate instead of
+another reduction. SiteIndex keeps the coordinates in memory, sorted by grid
+cell for radius queries, and the climate results in SQLite.
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+class SiteIndex:
+    """
+    Spatial index of resolved sites and their climate results.
+
+    Sites are bucketed into a latitude/longitude grid whose cells are as tall
+    as the search radius, so a radius query only looks at the few cells around
+    the point (more columns towards the poles, where meridians converge) and
+    checks the great-circle distance of their sites. Coordinates are kept in
+    memory as arrays sorted by cell, which load from the database in one pass;
+    new sites collect in a small per-cell buffer that is merged into the arrays
+    once it grows. The climate results stay in SQLite and are read back only
+    for the site that answers a query.
+
+    Args:
+        path: SQLite database file (':memory:' for a throwaway index)
+        namespace: Identifies the climate window/settings the results belong to.
+            Sites from another namespace are never returned.
+        radius_km: Default search radius; also sets the grid cell size
+        ttl_seconds: Maximum age of a site, or None to keep sites forever.
+            Expired sites are never returned; they are deleted when the index
+            loads and by prune(), which adding sites runs at most every
+            PRUNE_INTERVAL seconds.
+    """
+
+    # Buffered sites are merged into the sorted arrays past this count (or a
+    # sixteenth of the index, whichever is larger), keeping inserts amortized O(1)
+    MIN_MERGE = 4096
+    # Seconds between the prune() runs triggered by add_many() when sites expire
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, path, namespace='default', radius_km=5.0, ttl_seconds=None):
+        if radius_km <= 0:
+            raise ValueError('radius_km must be positive')
+        self.path = path
+        self.namespace = namespace
+        self.radius_km = radius_km
+        self.ttl_seconds = ttl_seconds
+
+        # Whole number of columns around the globe so longitude wraps cleanly
+        self.columns = max(1, int(360.0 // (radius_km / KM_PER_DEGREE)))
+        self.cell_deg = 360.0 / self.columns
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sites (
+                id INTEGER PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                address TEXT,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS sites_namespace ON sites (namespace)')
+        self._conn.commit()
+
+        self._conn.execute('CREATE INDEX IF NOT EXISTS sites_created ON sites (namespace, created_at)')
+        self._conn.commit()
+
+        started = time.perf_counter()
+        self._last_prune = time.time()
+        self._delete_expired()
+        rows = self._conn.execute(
+            'SELECT id, latitude, longitude, created_at FROM sites WHERE namespace = ?', (namespace,)
+        ).fetchall()
+        table = np.array(rows, dtype=np.float64).reshape(-1, 4)
+        self._pending = {}
+        self._pending_count = 0
+        self._set_arrays(table[:, 0].astype(np.int64), table[:, 1], table[:, 2], table[:, 3])
+        self.load_seconds = time.perf_counter() - started
+
+    def __len__(self):
+        return len(self._ids) + self._pending_count
+
+    def cell_key(self, latitude, longitude):
+        """Integer key of the grid cell containing a coordinate (works on arrays too)"""
+        row = np.floor(np.asarray(latitude) / self.cell_deg).astype(np.int64) + self.columns
+        column = np.floor((np.asarray(longitude) + 180.0) / self.cell_deg).astype(np.int64) % self.columns
+        return row * self.columns + column
+
+    def _key(self, latitude, longitude):
+        """cell_key() for one coordinate, without the NumPy overhead"""
+        row = int(math.floor(latitude / self.cell_deg)) + self.columns
+        return row * self.columns + int(math.floor((longitude + 180.0) / self.cell_deg)) % self.columns
+
+    def _set_arrays(self, ids, latitudes, longitudes, created):
+        keys = self.cell_key(latitudes, longitudes)
+        order = np.argsort(keys, kind='stable')
+        self._keys = keys[order]
+        self._ids = ids[order]
+        self._lats = latitudes[order]
+        self._lons = longitudes[order]
+        self._created = created[order]
+
+    def _cutoff(self):
+        """Creation time before which sites have expired, or None without a TTL"""
+        return None if self.ttl_seconds is None else time.time() - self.ttl_seconds
+
+    def _delete_expired(self):
+        """Delete expired rows from the database; returns how many there were"""
+        cutoff = self._cutoff()
+        if cutoff is None:
+            return 0
+        cursor = self._conn.execute('DELETE FROM sites WHERE namespace = ? AND created_at < ?',
+                                    (self.namespace, cutoff))
+        self._conn.commit()
+        self.evictions += cursor.rowcount
+        return cursor.rowcount
+
+    def _merge(self):
+        """Fold the buffered sites into the sorted arrays, dropping expired ones"""
+        ids, latitudes, longitudes, created = self._ids, self._lats, self._lons, self._created
+        pending = [site for sites in self._pending.values() for site in sites]
+        self._pending = {}
+        self._pending_count = 0
+        if pending:
+            extra_ids, extra_lats, extra_lons, extra_created = (np.array(column) for column in zip(*pending))
+            ids = np.concatenate((ids, extra_ids.astype(np.int64)))
+            latitudes = np.concatenate((latitudes, extra_lats))
+            longitudes = np.concatenate((longitudes, extra_lons))
+            created = np.concatenate((created, extra_created))
+        self._last_prune = time.time()
+        if self._delete_expired():
+            keep = created >= self._cutoff()
+            ids, latitudes, longitudes, created = ids[keep], latitudes[keep], longitudes[keep], created[keep]
+        self._set_arrays(ids, latitudes, longitudes, created)
+
+    def prune(self):
+        """Delete expired sites from the database and the in-memory index"""
+        with self._lock:
+            self._merge()
+
+    def add(self, latitude, longitude, value, address=None):
+        """Store a JSON-serializable result for a site and make it searchable"""
+        self.add_many([(latitude, longitude, value, address)])
+
+    def add_many(self, sites):
+        """
+        Store many sites in one transaction.
+
+        Args:
+            sites: Iterable of (latitude, longitude, value, address) tuples
+        """
+        now = time.time()
+        with self._lock:
+            for latitude, longitude, value, address in sites:
+                if not -180.0 <= longitude < 180.0:
+                    longitude = ((longitude + 180.0) % 360.0) - 180.0
+                cursor = self._conn.execute(
+                    'INSERT INTO sites (namespace, latitude, longitude, address, data, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (self.namespace, latitude, longitude, address, json.dumps(value), now)
+                )
+                key = self._key(latitude, longitude)
+                self._pending.setdefault(key, []).append((cursor.lastrowid, latitude, longitude, now))
+                self._pending_count += 1
+            self._conn.commit()
+            due = self.ttl_seconds is not None and now - self._last_prune > self.PRUNE_INTERVAL
+            if due or self._pending_count > max(self.MIN_MERGE, len(self._ids) // 16):
+                self._merge()
+
+    def _candidate_keys(self, latitude, longitude, radius_km):
+        """Keys of every cell that may hold a site within radius_km of the point"""
+        key = self._key(latitude, longitude)
+        row, column = divmod(key, self.columns)
+        rows = int(math.ceil(radius_km / KM_PER_DEGREE / self.cell_deg))
+        # A degree of longitude shrinks with latitude, so size the search by the
+        # cell edge nearest the pole; a search reaching the pole covers every column
+        edge = abs(latitude) + (rows + 1) * self.cell_deg
+        if edge >= 90.0:
+            columns = self.columns // 2
+        else:
+            lon_km = KM_PER_DEGREE * self.cell_deg * math.cos(math.radians(edge))
+            columns = min(self.columns // 2, int(math.ceil(radius_km / lon_km)))
+        offsets = {c % self.columns for c in range(column - columns, column + columns + 1)}
+        return np.array([r * self.columns + c
+                         for r in range(row - rows, row + rows + 1) for c in sorted(offsets)], dtype=np.int64)
+
+    def nearest(self, latitude, longitude, radius_km=None):
+        """
+        Closest stored site within a radius of a coordinate.
+
+        Args:
+            latitude: Latitude in degrees
+            longitude: Longitude in degrees
+            radius_km: Search radius, defaults to the index's radius
+
+        Returns:
+            dict with 'latitude', 'longitude', 'address', 'distance_km' and the
+            stored 'data', or None if no site is close enough
+        """
+        radius_km = self.radius_km if radius_km is None else radius_km
+        if not -180.0 <= longitude < 180.0:
+            longitude = ((longitude + 180.0) % 360.0) - 180.0
+        with self._lock:
+            keys = self._candidate_keys(latitude, longitude, radius_km)
+            starts = np.searchsorted(self._keys, keys, 'left')
+            ends = np.searchsorted(self._keys, keys, 'right')
+            positions = [np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist()) if end > start]
+            positions = np.concatenate(positions) if positions else np.empty(0, dtype=np.int64)
+            buffered = [site for key in keys.tolist() for site in self._pending.get(key, ())]
+
+            ids = self._ids[positions]
+            lats = self._lats[positions]
+            lons = self._lons[positions]
+            created = self._created[positions]
+            if buffered:
+                extra_ids, extra_lats, extra_lons, extra_created = (np.array(column) for column in zip(*buffered))
+                ids = np.concatenate((ids, extra_ids.astype(np.int64)))
+                lats = np.concatenate((lats, extra_lats))
+                lons = np.concatenate((lons, extra_lons))
+                created = np.concatenate((created, extra_created))
+            cutoff = self._cutoff()
+            if cutoff is not None:
+                # Expired sites stay in the arrays until the next merge but never answer
+                fresh = created >= cutoff
+                ids, lats, lons = ids[fresh], lats[fresh], lons[fresh]
+
+            best_id = None
+            if len(ids):
+                # Haversine distance to every candidate
+                lat1 = math.radians(latitude)
+                lat2 = np.radians(lats)
+                dlon = np.radians(lons - longitude)
+                a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+                distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+                i = int(np.argmin(distances))
+                if distances[i] <= radius_km:
+                    best_id = int(ids[i])
+                    best_distance = float(distances[i])
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            row = self._conn.execute(
+                'SELECT latitude, longitude, address, data FROM sites WHERE id = ?', (best_id,)
+            ).fetchone()
+            self.hits += 1
+
+        return {
+            'latitude': row[0],
+            'longitude': row[1],
+            'address': row[2],
+            'distance_km': best_distance,
+            'data': json.loads(row[3]),
+        }
+
+    def clear(self):
+        """Remove every site in this index's namespace"""
+        with self._lock:
+            self._conn.execute('DELETE FROM sites WHERE namespace = ?', (self.namespace,))
+            self._conn.commit()
+            self._pending = {}
+            self._pending_count = 0
+            empty = np.empty(0)
+            self._set_arrays(empty.astype(np.int64), empty, empty, empty)
+
+    def stats(self):
+        """Hit/miss counters for this process plus the index size"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+            'evictions': self.evictions,
+            'sites': len(self),
+            'radius_km': self.radius_km,
+            'ttl_seconds': self.ttl_seconds,
+            'load_seconds': round(self.load_seconds, 3),
+        }
@@ -1,13 +1,34 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, jsonify, make_response, has_request_context, g
 # Remove flask_cors import completely - we'll handle CORS manually
 import ee
-from geopy.geocoders import Nominatim
+import logging
 import random
-import traceback
 import os
 import sys
+import atexit
 import json
 import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from climate_cache import ERA5_CELL_DEG, ClimateCache
+from climate_grid import ClimateGrid
+from ee_monitor import EarthEngineMonitor
+from metrics import Histogram, Histograms, prometheus_histogram, prometheus_metric
+from site_index import SiteIndex
+from rain_class import get_rain_class
+from louver_catalogue import CATALOGUE_CSV_PATH, is_stale, load_catalogue
+from louver_matching import VelocityMatcher
+from geocoding import GeocodeCache, Geocoder, TokenBucket, create_backend
+from serving import DISCONNECT_POLL_SECONDS, ClientDisconnected, client_disconnected, run_pooled, wait_or_cancel
+
+# LOG_LEVEL=DEBUG logs each request's progress; at the default INFO the
+# request path only logs warnings and errors
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger('weather_api')
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -45,75 +66,245 @@ def handle_preflight():
         return response
 
 # Initialize once when server starts
-# Increase timeout for geocoding requests
-geolocator = Nominatim(user_agent="louvre_selector", timeout=10)
-
-# Try to initialize Earth Engine, but provide fallback if it fails
-EE_INITIALIZED = False
-try:
-    # Use the team project ID
-    print("Attempting to initialize Earth Engine with project ID: ivory-alcove-426308-d9")
-    ee.Initialize(project='ivory-alcove-426308-d9')
-    
-    # Test if Earth Engine is actually working by making a simple request
-    print("Testing Earth Engine initialization with a simple request...")
+# Geocoding goes through a shared normalized-address cache (saved to disk) and a
+# token bucket, since Nominatim allows about one request per second.
+# GEOCODER_BACKEND=stub with GEOCODER_STUB_PATH serves lookups from a local JSON file.
+GEOCODER_BACKEND = os.environ.get('GEOCODER_BACKEND', 'nominatim')
+GEOCODE_CACHE_PATH = os.environ.get('GEOCODE_CACHE_PATH', 'geocode_cache.json')
+GEOCODER_RATE_PER_SECOND = float(os.environ.get('GEOCODER_RATE_PER_SECOND', '1'))
+geocode_cache = GeocodeCache(GEOCODE_CACHE_PATH, max_entries=int(os.environ.get('GEOCODE_CACHE_MAX_ENTRIES', '10000')))
+atexit.register(geocode_cache.save)
+geocoder = Geocoder(
+    # Increase timeout for geocoding requests
+    create_backend(GEOCODER_BACKEND, stub_path=os.environ.get('GEOCODER_STUB_PATH'), timeout=10),
+    cache=geocode_cache,
+    rate_limiter=TokenBucket(GEOCODER_RATE_PER_SECOND) if GEOCODER_RATE_PER_SECOND > 0 else None
+)
+
+# Persistent cache of climate results per ERA5 grid cell. The climate window is
+# fixed, so a cell's answer never changes; bump the namespace if the period,
+# bands or default exposure used by fetch_climate() change.
+CLIMATE_CACHE_PATH = os.environ.get('CLIMATE_CACHE_PATH', 'climate_cache.sqlite3')
+CLIMATE_CACHE_MAX_ENTRIES = int(os.environ.get('CLIMATE_CACHE_MAX_ENTRIES', '20000'))
+CLIMATE_CACHE_TTL_DAYS = float(os.environ.get('CLIMATE_CACHE_TTL_DAYS', '90'))
+CLIMATE_NAMESPACE = 'era5-daily-2015-07-09-2020-07-09-medium-native-pixel'
+climate_cache = ClimateCache(
+    CLIMATE_CACHE_PATH,
+    namespace=CLIMATE_NAMESPACE,
+    max_entries=CLIMATE_CACHE_MAX_ENTRIES,
+    ttl_seconds=CLIMATE_CACHE_TTL_DAYS * 86400 if CLIMATE_CACHE_TTL_DAYS > 0 else None
+)
+
+# Statistics-mode results are cached per cell alongside the plain means
+statistics_cache = ClimateCache(
+    CLIMATE_CACHE_PATH,
+    namespace=f'{CLIMATE_NAMESPACE}-statistics',
+    max_entries=CLIMATE_CACHE_MAX_ENTRIES,
+    ttl_seconds=CLIMATE_CACHE_TTL_DAYS * 86400 if CLIMATE_CACHE_TTL_DAYS > 0 else None
+)
+
+# Every site resolved through Earth Engine, indexed by position. A cache miss
+# within SITE_MATCH_RADIUS_KM of a known site is answered with that site's
+# climate (labelled 'nearest_site') instead of another reduceRegion call. The
+# radius has to stay well inside an ERA5 pixel (~28 km) for the answer to be
+# representative; 0 disables the lookup. Sites expire with CLIMATE_CACHE_TTL_DAYS
+# like the climate cache.
+SITE_INDEX_PATH = os.environ.get('SITE_INDEX_PATH', 'site_index.sqlite3')
+SITE_MATCH_RADIUS_KM = float(os.environ.get('SITE_MATCH_RADIUS_KM', '5'))
+MAX_SITE_MATCH_RADIUS_KM = 15
+if SITE_MATCH_RADIUS_KM > MAX_SITE_MATCH_RADIUS_KM:
+    raise ValueError(f"SITE_MATCH_RADIUS_KM must be at most {MAX_SITE_MATCH_RADIUS_KM} km "
+                     f"(about half an ERA5 pixel)")
+site_index = SiteIndex(SITE_INDEX_PATH, namespace=CLIMATE_NAMESPACE,
+                       radius_km=SITE_MATCH_RADIUS_KM if SITE_MATCH_RADIUS_KM > 0 else 5,
+                       ttl_seconds=CLIMATE_CACHE_TTL_DAYS * 86400 if CLIMATE_CACHE_TTL_DAYS > 0 else None)
+logger.info("Loaded %d known sites in %.2fs", len(site_index), site_index.load_seconds)
+
+# Earth Engine calls run on their own bounded pool so request threads can keep
+# watching for client disconnects; the semaphore caps requests in flight
+# (including ones whose client has already gone) across the whole process.
+EE_MAX_IN_FLIGHT = int(os.environ.get('EE_MAX_IN_FLIGHT', '8'))
+EE_QUEUE_TIMEOUT = float(os.environ.get('EE_QUEUE_TIMEOUT', '30'))
+ee_slots = threading.BoundedSemaphore(EE_MAX_IN_FLIGHT)
+ee_executor = ThreadPoolExecutor(max_workers=EE_MAX_IN_FLIGHT, thread_name_prefix='earthengine')
+
+# Climate engine: 'earthengine' queries Earth Engine live, 'grid' answers from an
+# offline ERA5 grid built with `python climate_grid.py build` (no network needed)
+WEATHER_ENGINE = os.environ.get('WEATHER_ENGINE', 'earthengine')
+CLIMATE_GRID_PATH = os.environ.get('CLIMATE_GRID_PATH', 'grids/era5_2015_2020')
+climate_grid = None
+if WEATHER_ENGINE == 'grid':
+    climate_grid = ClimateGrid.load(CLIMATE_GRID_PATH)
+    logger.info("Serving climate data from offline grid %s (%s..%s, %s..%s)", CLIMATE_GRID_PATH,
+                climate_grid.south, climate_grid.north, climate_grid.west, climate_grid.east)
+elif WEATHER_ENGINE == 'earthengine':
+    # An offline grid, if one has been built, answers cache misses until Earth Engine is ready
     try:
-        # Try to get a simple image to verify Earth Engine is working
-        image = ee.Image('USGS/SRTMGL1_003')
-        info = image.getInfo()
-        print("Earth Engine test successful! Got image info.")
-        EE_INITIALIZED = True
-        print("Google Earth Engine initialized successfully!")
-    except Exception as test_error:
-        print(f"Earth Engine initialization test failed: {test_error}")
-        print("Earth Engine appears to be initialized but may not be fully functional.")
-        EE_INITIALIZED = False
-except Exception as e:
-    print(f"Warning: Could not initialize Google Earth Engine: {e}")
-
-def get_rain_class(mean_rain_fall, mean_wind_speed, mean_wind_dir, exposure_type, exposure_dir=0):
-    """
-    Calculate rain class based on BS EN 13030:2001 standard.
-    
-    Args:
-        mean_rain_fall: Average rainfall in mm/day
-        mean_wind_speed: Wind speed in m/s
-        mean_wind_dir: Wind direction in radians
-        exposure_type: Level of exposure ('high', 'medium', 'low')
-        exposure_dir: Direction of exposure in radians (defaults to 0)
-        
-    Returns:
-        A string representing the rain class ('A', 'B', 'C', or 'D')
+        climate_grid = ClimateGrid.load(CLIMATE_GRID_PATH)
+        logger.info("Offline grid %s will be used while Earth Engine is unavailable", CLIMATE_GRID_PATH)
+    except FileNotFoundError:
+        pass
+else:
+    raise ValueError(f"Unknown WEATHER_ENGINE '{WEATHER_ENGINE}', expected 'earthengine' or 'grid'")
+
+# Louver catalogue, parsed once from the CSV (via its binary sidecar) and reloaded
+# when the CSV changes. Serialized /catalogue responses are kept per format.
+LOUVER_CATALOGUE_PATH = os.environ.get('LOUVER_CATALOGUE_PATH', CATALOGUE_CSV_PATH)
+louver_catalogue = None
+catalogue_responses = {}
+catalogue_lock = threading.Lock()
+velocity_matcher = None
+
+# Upper bound on openings per /louvers/match request
+MAX_MATCH_OPENINGS = 5000
+
+def current_catalogue():
+    """The loaded louver catalogue, reloading it if the CSV has changed"""
+    global louver_catalogue, velocity_matcher
+    with catalogue_lock:
+        if louver_catalogue is None or is_stale(louver_catalogue, LOUVER_CATALOGUE_PATH):
+            louver_catalogue = load_catalogue(LOUVER_CATALOGUE_PATH)
+            catalogue_responses.clear()
+            velocity_matcher = None
+            logger.info("Loaded louver catalogue version %s (%d models)", louver_catalogue.version, len(louver_catalogue))
+        return louver_catalogue
+
+def current_matcher():
+    """Velocity matcher for the current catalogue, rebuilt when the catalogue reloads"""
+    global velocity_matcher
+    catalogue = current_catalogue()
+    with catalogue_lock:
+        if velocity_matcher is None or velocity_matcher.version != catalogue.version:
+            velocity_matcher = VelocityMatcher(catalogue)
+        return velocity_matcher
+
+# Earth Engine is initialized on a background thread, retried with exponential
+# backoff and then probed every EE_PROBE_INTERVAL seconds, so the server starts
+# at once and serves cached (or offline grid) data until Earth Engine is ready.
+EE_PROJECT = os.environ.get('EE_PROJECT', 'ivory-alcove-426308-d9')
+EE_PROBE_INTERVAL = float(os.environ.get('EE_PROBE_INTERVAL', '60'))
+EE_MAX_BACKOFF = float(os.environ.get('EE_MAX_BACKOFF', '300'))
+
+def initialize_earth_engine():
+    logger.info("Attempting to initialize Earth Engine with project ID: %s", EE_PROJECT)
+    ee.Initialize(project=EE_PROJECT)
+
+def probe_earth_engine():
+    """Smallest useful round trip: evaluate a constant server-side"""
+    ee.Number(1).getInfo()
+
+earth_engine = EarthEngineMonitor(initialize_earth_engine, probe_earth_engine,
+                                  probe_interval=EE_PROBE_INTERVAL, max_backoff=EE_MAX_BACKOFF)
+# The offline grid engine never touches Earth Engine
+if WEATHER_ENGINE == 'earthengine':
+    earth_engine.start()
+
+# Request latency per route, of every Earth Engine getInfo() call, and of each
+# stage of a request (geocode, cache_lookup, dataset_build, ee_getinfo,
+# rain_class, serialize)
+request_latency = Histograms()
+ee_latency = Histogram()
+stage_latency = Histograms()
+
+# Requests slower than SLOW_REQUEST_SECONDS are written, with their stage
+# timings, as JSON lines to the weather_api.trace logger (TRACE_LOG_PATH sends
+# them to their own file). TRACE_SAMPLE_RATE keeps only a share of them; a
+# threshold of 0 turns tracing off.
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '2'))
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '1'))
+trace_logger = logging.getLogger('weather_api.trace')
+if os.environ.get('TRACE_LOG_PATH'):
+    trace_handler = logging.FileHandler(os.environ['TRACE_LOG_PATH'])
+    trace_handler.setFormatter(logging.Formatter('%(message)s'))
+    trace_logger.addHandler(trace_handler)
+    trace_logger.propagate = False
+
+def record_stage(stage, seconds):
+    """Add a stage duration to its histogram and to the current request's trace"""
+    stage_latency.observe(stage, seconds)
+    if has_request_context():
+        g.setdefault('stages', []).append((stage, seconds))
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block as one stage of the request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+def json_response(payload):
+    """jsonify, timed as the serialize stage"""
+    with timed('serialize'):
+        return jsonify(payload)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request_latency(response):
+    started = g.get('request_started')
+    if started is not None and request.method != 'OPTIONS':
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        elapsed = time.perf_counter() - started
+        request_latency.observe(route, elapsed)
+        if 0 < SLOW_REQUEST_SECONDS <= elapsed and random.random() < TRACE_SAMPLE_RATE:
+            trace_logger.warning(json.dumps({
+                'time': time.time(),
+                'method': request.method,
+                'route': route,
+                'path': request.full_path,
+                'status': response.status_code,
+                'seconds': round(elapsed, 4),
+                'stages': [[stage, round(seconds, 4)] for stage, seconds in g.get('stages', [])]
+            }))
+    return response
+
+def request_environ():
+    """WSGI environ of the current request, or None outside a request"""
+    return request.environ if has_request_context() else None
+
+def ee_get_info(obj):
     """
-    # These exposure coefficients are directly from the standard
-    exposure_map = {
-        'high': 0.35,    # Coastal areas, open terrain
-        'medium': 0.25,  # Suburban, forest
-        'low': 0.2,      # City centers, dense urban areas
-    }
-    
-    # Get exposure coefficient
-    a = exposure_map.get(exposure_type, 0.25)  # Default to medium if not specified
-    
-    # Calculate wind-driven rain coefficient (C_wdr) as per BS EN 13030:2001
-    wind_angle_factor = abs(math.cos(mean_wind_dir - exposure_dir))
-    C_wdr = min(1, a * mean_wind_speed * wind_angle_factor)
+    Evaluate an Earth Engine object with getInfo() off the request thread.
     
-    # Calculate wind-driven rain rate (l/h per m²)
-    q_wdr = (mean_rain_fall/24 * C_wdr)/3600
+    Waits for one of EE_MAX_IN_FLIGHT slots first. If the client disconnects
+    while waiting, the call is abandoned (and cancelled if it has not started).
     
-    # Calculate relative exposure
-    relative_exposure = q_wdr/20.83
-    
-    # Determine rain class based on effectiveness rating thresholds
-    if relative_exposure >= 0.8:
-        return 'A'  # High rain protection required
-    elif relative_exposure >= 0.4:
-        return 'B'  # Significant rain protection required
-    elif relative_exposure >= 0.2:
-        return 'C'  # Moderate rain protection required
-    else:
-        return 'D'  # Minimal rain protection required
+    Raises:
+        WeatherError: If no slot became free within EE_QUEUE_TIMEOUT seconds
+        ClientDisconnected: If the client went away
+    """
+    with timed('ee_getinfo'):
+        environ = request_environ()
+        deadline = time.monotonic() + EE_QUEUE_TIMEOUT
+        while not ee_slots.acquire(timeout=DISCONNECT_POLL_SECONDS):
+            if client_disconnected(environ):
+                raise ClientDisconnected()
+            if time.monotonic() >= deadline:
+                raise WeatherError('Earth Engine is busy, try again shortly', 503)
+        
+        try:
+            future = ee_executor.submit(obj.getInfo)
+        except BaseException:
+            ee_slots.release()
+            raise
+        # Free the slot when the call actually finishes, not when we stop waiting for it
+        started = time.perf_counter()
+        
+        def finished(_):
+            ee_slots.release()
+            ee_latency.observe(time.perf_counter() - started)
+        
+        future.add_done_callback(finished)
+        return wait_or_cancel(future, environ)
+
+def geocode_location(query):
+    """Geocode through the shared cached geocoder, abandoning the wait if the client disconnects"""
+    with timed('geocode'):
+        return wait_or_cancel(geocoder.submit(query), request_environ())
 
 @app.route('/validate-location', methods=['POST', 'OPTIONS'])
 def validate_location():
@@ -128,26 +319,531 @@ def validate_location():
         
         # Geocode the location
         try:
-            location = geolocator.geocode(location_str)
+            location = geocode_location(location_str)
             if not location:
                 return jsonify({'error': f'Could not geocode location: {location_str}'}), 400
                 
             # Return only the location information without weather data
-            return jsonify({
+            return json_response({
                 'location': location.address,
                 'coordinates': [location.latitude, location.longitude]
             })
+        except ClientDisconnected:
+            raise
         except Exception as e:
             return jsonify({'error': f'Geocoding error: {str(e)}'}), 500
             
+    except ClientDisconnected:
+        raise
     except Exception as e:
-        print(f"Error in validate_location: {e}")
-        traceback.print_exc()
+        logger.exception("Error in validate_location")
         return jsonify({'error': str(e)}), 500
 
+# ERA5 bands used for the climate summary and the default climate window
+ERA5_BANDS = ['mean_2m_air_temperature', 'total_precipitation', 'u_component_of_wind_10m', 'v_component_of_wind_10m']
+# ERA5's native 0.25° grid, pixel centres on multiples of 0.25°. Reductions run
+# in it (instead of at a metre scale in the composite's default projection) so a
+# point reads the ERA5 pixel it falls in, the cell ClimateCache keys it on.
+ERA5_CRS = 'EPSG:4326'
+ERA5_CRS_TRANSFORM = [ERA5_CELL_DEG, 0, -180 - ERA5_CELL_DEG / 2, 0, -ERA5_CELL_DEG, 90 + ERA5_CELL_DEG / 2]
+CLIMATE_START_DATE = '2015-07-09'  # 5 years before the end date
+CLIMATE_END_DATE = '2020-07-09'  # Latest date in the dataset
+# Earlier 3-year period used when the default window has no images for a point
+FALLBACK_START_DATE = '1997-01-01'
+FALLBACK_END_DATE = '2000-01-01'
+
+# Statistics mode: percentiles of daily values and a wind rose of this many sectors
+STATISTICS_PERCENTILES = [50, 95, 99]
+WIND_ROSE_SECTORS = 8
+# Daily rainfall percentile used as the design value for the extreme rain class
+DESIGN_RAIN_PERCENTILE = 95
+
+# Upper bound on sites per /weather/batch request (Earth Engine caps getInfo results at 5000 elements)
+MAX_BATCH_SITES = 1000
+
+class LocationObj:
+    """Location-like object for raw coordinates, mirroring the geopy Location attributes we use"""
+
+    def __init__(self, lat, lon):
+        self.latitude = float(lat)
+        self.longitude = float(lon)
+        self.address = f"Coordinates: {lat}, {lon}"
+
+class WeatherError(Exception):
+    """Error raised while computing climate data, carrying the HTTP status to return"""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+def build_era5_dataset(point, start_date, end_date):
+    """Daily ERA5 collection over a period, limited to the bands we use and the given point"""
+    return ee.ImageCollection('ECMWF/ERA5/DAILY') \
+             .select(ERA5_BANDS) \
+             .filterDate(start_date, end_date) \
+             .filterBounds(point)
+
+def fetch_climate(latitude, longitude):
+    """
+    Fetch the climate summary for a point from Earth Engine.
+    
+    The dataset size, the band check and the mean reduction are combined into a
+    single ee.Dictionary so the whole request is one getInfo() round trip. The
+    choice between the default period and the 1997-2000 fallback period is made
+    server-side inside that same expression.
+    
+    Args:
+        latitude: Latitude in degrees
+        longitude: Longitude in degrees
+        
+    Returns:
+        A dict with the averaged climate values, the recommended rain class,
+        the period used and the data source
+        
+    Raises:
+        WeatherError: If Earth Engine has no usable data for the point
+    """
+    # Create Earth Engine point
+    started = time.perf_counter()
+    logger.debug("Creating Earth Engine point for coordinates: %s, %s", longitude, latitude)
+    point = ee.Geometry.Point([longitude, latitude])
+    
+    # Use the 5-year range, falling back to an earlier 3-year range if it is empty
+    primary = build_era5_dataset(point, CLIMATE_START_DATE, CLIMATE_END_DATE)
+    fallback = build_era5_dataset(point, FALLBACK_START_DATE, FALLBACK_END_DATE)
+    use_primary = primary.size().gt(0)
+    dataset = ee.ImageCollection(ee.Algorithms.If(use_primary, primary, fallback))
+    dataset_size = dataset.size()
+    has_images = dataset_size.gt(0)
+    
+    expression = ee.Dictionary({
+        'use_primary': use_primary,
+        'size': dataset_size,
+        'bands': ee.Algorithms.If(has_images, dataset.first().bandNames(), ee.List([])),
+        # Use a single reduceRegion call to get all values at once (much faster)
+        'means': ee.Algorithms.If(
+            has_images,
+            dataset.mean().reduceRegion(
+                reducer=ee.Reducer.mean(),
+                geometry=point,
+                crs=ERA5_CRS,
+                crsTransform=ERA5_CRS_TRANSFORM,
+                maxPixels=1e9
+            ),
+            ee.Dictionary({})
+        )
+    })
+    record_stage('dataset_build', time.perf_counter() - started)
+    summary = ee_get_info(expression)
+    
+    if summary['use_primary']:
+        start_date, end_date = CLIMATE_START_DATE, CLIMATE_END_DATE
+    else:
+        start_date, end_date = FALLBACK_START_DATE, FALLBACK_END_DATE
+    logger.debug("Using climate data range: %s to %s (%s images)", start_date, end_date, summary['size'])
+    
+    if summary['size'] == 0:
+        raise WeatherError('No Earth Engine data available for this location', 404)
+    
+    missing_bands = [band for band in ERA5_BANDS if band not in summary['bands']]
+    if missing_bands:
+        logger.error("Dataset is missing bands %s", missing_bands)
+        raise WeatherError('Earth Engine dataset is empty or invalid', 500)
+    
+    try:
+        return climate_from_means(summary['means'], start_date, end_date)
+    except WeatherError:
+        raise
+    except Exception as wind_error:
+        logger.exception("Error calculating wind data")
+        raise WeatherError(f'Wind data calculation error: {str(wind_error)}', 500)
+
+def fetch_climate_statistics(latitude, longitude):
+    """
+    Fetch the climate summary plus daily statistics for a point from Earth Engine.
+    
+    The daily ERA5 series is turned into derived bands (rainfall in mm, wind
+    speed, wind rose sector) and reduced over time into one multi-band image:
+    the band means, the mean and percentiles of the derived bands (one
+    combined ee.Reducer), twelve monthly means and, per wind rose sector, the
+    number of days and mean wind speed. A single reduceRegion over that image
+    at the point is the only getInfo() round trip, and the answer is a few
+    dozen numbers rather than the daily series.
+    
+    Args:
+        latitude: Latitude in degrees
+        longitude: Longitude in degrees
+        
+    Returns:
+        The climate_from_means() summary with a 'statistics' entry (see
+        statistics_from_values)
+        
+    Raises:
+        WeatherError: If Earth Engine has no usable data for the point
+    """
+    started = time.perf_counter()
+    point = ee.Geometry.Point([longitude, latitude])
+    dataset = build_era5_dataset(point, CLIMATE_START_DATE, CLIMATE_END_DATE)
+    sector_width = 360.0 / WIND_ROSE_SECTORS
+    
+    def derive(image):
+        u = image.select('u_component_of_wind_10m')
+        v = image.select('v_component_of_wind_10m')
+        # Same direction convention as climate_from_means(), binned so each sector is centred on its bearing
+        direction = v.atan2(u).multiply(180 / math.pi).add(180 + sector_width / 2).mod(360)
+        return ee.Image(ee.Image.cat([
+            image.select('mean_2m_air_temperature').subtract(273.15).rename('temperature'),
+            image.select('total_precipitation').multiply(1000).rename('rainfall'),
+            u.hypot(v).rename('wind_speed'),
+            direction.divide(sector_width).floor().rename('sector')
+        ]).copyProperties(image, ['system:time_start']))
+    
+    daily = dataset.map(derive)
+    values = daily.select(['temperature', 'rainfall', 'wind_speed'])
+    
+    bands = [
+        dataset.mean(),
+        values.reduce(ee.Reducer.mean().combine(ee.Reducer.percentile(STATISTICS_PERCENTILES), sharedInputs=True))
+    ]
+    for month in range(1, 13):
+        bands.append(values.filter(ee.Filter.calendarRange(month, month, 'month')).mean()
+                     .rename([f'm{month}_temperature', f'm{month}_rainfall', f'm{month}_wind_speed']))
+    for sector in range(WIND_ROSE_SECTORS):
+        in_sector = daily.map(lambda image, sector=sector:
+                              image.select('wind_speed').updateMask(image.select('sector').eq(sector)))
+        bands.append(in_sector.reduce(ee.Reducer.mean().combine(ee.Reducer.count(), sharedInputs=True))
+                     .rename([f'rose{sector}_speed', f'rose{sector}_days']))
+    
+    expression = ee.Dictionary({
+        'size': dataset.size(),
+        'values': ee.Algorithms.If(
+            dataset.size().gt(0),
+            ee.Image.cat(bands).reduceRegion(
+                reducer=ee.Reducer.mean(),
+                geometry=point,
+                crs=ERA5_CRS,  # Same pixel as fetch_climate()
+                crsTransform=ERA5_CRS_TRANSFORM,
+                maxPixels=1e9
+            ),
+            ee.Dictionary({})
+        )
+    })
+    record_stage('dataset_build', time.perf_counter() - started)
+    summary = ee_get_info(expression)
+    
+    if summary['size'] == 0 or any(summary['values'].get(band) is None for band in ERA5_BANDS):
+        raise WeatherError('No Earth Engine data available for this location', 404)
+    
+    climate = climate_from_means(summary['values'], CLIMATE_START_DATE, CLIMATE_END_DATE)
+    climate['statistics'] = statistics_from_values(summary['values'], summary['size'])
+    return climate
+
+def statistics_from_values(values, days):
+    """
+    Turn the reduced statistics bands into compact arrays.
+    
+    Args:
+        values: Dict of band name to value from fetch_climate_statistics()
+        days: Number of daily images reduced
+        
+    Returns:
+        A dict of monthly means (12 values, January first), daily percentiles,
+        the wind rose (sector bearings, share of days and mean wind speed per
+        sector) and the rain class for the design rainfall percentile
+        combined with each sector's wind, taking the most demanding
+    """
+    def rounded(value, digits=2):
+        return None if value is None else round(value, digits)
+    
+    fields = ['temperature', 'rainfall', 'wind_speed']
+    sector_width = 360.0 / WIND_ROSE_SECTORS
+    sector_days = [values.get(f'rose{sector}_days') or 0 for sector in range(WIND_ROSE_SECTORS)]
+    total_days = sum(sector_days)
+    sector_speeds = [values.get(f'rose{sector}_speed') for sector in range(WIND_ROSE_SECTORS)]
+    bearings = [sector * sector_width for sector in range(WIND_ROSE_SECTORS)]
+    
+    # Worst case of design rainfall driven by each sector's wind, over sectors with any days
+    design_rain = values.get(f'rainfall_p{DESIGN_RAIN_PERCENTILE}')
+    windy = [(speed, math.radians(bearing - 180)) for speed, bearing, count
+             in zip(sector_speeds, bearings, sector_days) if count and speed is not None]
+    design_class = None
+    if design_rain is not None and windy:
+        speeds, directions = zip(*windy)
+        with timed('rain_class'):
+            design_class = get_rain_class(design_rain, list(speeds), list(directions), 'medium')
+    
+    return {
+        'days': days,
+        'monthly': {field: [rounded(values.get(f'm{month}_{field}')) for month in range(1, 13)] for field in fields},
+        'percentiles': {
+            'levels': STATISTICS_PERCENTILES,
+            **{field: [rounded(values.get(f'{field}_p{level}')) for level in STATISTICS_PERCENTILES]
+               for field in fields}
+        },
+        'wind_rose': {
+            'bearings': bearings,
+            'frequency': [round(count / total_days, 3) if total_days else 0 for count in sector_days],
+            'mean_speed': [rounded(speed) for speed in sector_speeds]
+        },
+        'design_rainfall': rounded(design_rain),
+        'design_rain_class': design_class
+    }
+
+def fetch_climate_many(points):
+    """
+    Fetch climate summaries for many points with a single Earth Engine reduction.
+    
+    All points are sent as one FeatureCollection and reduced with reduceRegions
+    over the averaged ERA5 image, so the whole list costs one getInfo() call.
+    Unlike fetch_climate() there is no fallback period; points without data
+    get a WeatherError in their slot.
+    
+    Args:
+        points: List of (latitude, longitude) tuples
+        
+    Returns:
+        A list in input order holding either a climate dict (see
+        climate_from_means) or a WeatherError for that point
+    """
+    started = time.perf_counter()
+    features = [
+        ee.Feature(ee.Geometry.Point([longitude, latitude]), {'site_index': i})
+        for i, (latitude, longitude) in enumerate(points)
+    ]
+    logger.debug("Reducing %d points in one Earth Engine request", len(features))
+    
+    mean_image = ee.ImageCollection('ECMWF/ERA5/DAILY') \
+                   .select(ERA5_BANDS) \
+                   .filterDate(CLIMATE_START_DATE, CLIMATE_END_DATE) \
+                   .mean()
+    
+    expression = mean_image.reduceRegions(
+        collection=ee.FeatureCollection(features),
+        reducer=ee.Reducer.mean(),
+        crs=ERA5_CRS,  # Same pixel as fetch_climate()
+        crsTransform=ERA5_CRS_TRANSFORM
+    )
+    record_stage('dataset_build', time.perf_counter() - started)
+    reduced = ee_get_info(expression)
+    
+    results = [WeatherError('No Earth Engine data available for this location', 404)] * len(points)
+    for feature in reduced.get('features', []):
+        properties = feature.get('properties', {})
+        index = properties.get('site_index')
+        if index is None or any(properties.get(band) is None for band in ERA5_BANDS):
+            continue
+        try:
+            results[int(index)] = climate_from_means(properties, CLIMATE_START_DATE, CLIMATE_END_DATE)
+        except WeatherError as e:
+            results[int(index)] = e
+    return results
+
+def fetch_grid_climate_many(points):
+    """
+    Look up climate summaries for many points in the offline ERA5 grid.
+    
+    The grid lookup is vectorized, so all points are interpolated in one call.
+    
+    Args:
+        points: List of (latitude, longitude) tuples
+        
+    Returns:
+        A list in input order holding either a climate dict (see
+        climate_from_means) or a WeatherError for points outside the grid
+    """
+    latitudes = [latitude for latitude, _ in points]
+    longitudes = [longitude for _, longitude in points]
+    values = climate_grid.lookup(latitudes, longitudes)
+    start_date = climate_grid.metadata['start_date']
+    end_date = climate_grid.metadata['end_date']
+    data_source = f"ERA5 offline grid ({climate_grid.metadata.get('source', 'unknown')})"
+    
+    results = []
+    for i in range(len(points)):
+        means = {band: float(values[band][i]) for band in climate_grid.bands}
+        if any(math.isnan(value) for value in means.values()):
+            results.append(WeatherError('Location is outside the offline climate grid', 404))
+            continue
+        try:
+            results.append(climate_from_means(means, start_date, end_date, data_source))
+        except WeatherError as e:
+            results.append(e)
+    return results
+
+def fetch_grid_climate(latitude, longitude):
+    """Look up one point in the offline ERA5 grid, raising WeatherError if it is outside the grid"""
+    climate = fetch_grid_climate_many([(latitude, longitude)])[0]
+    if isinstance(climate, WeatherError):
+        raise climate
+    return climate
+
+def nearby_climate(latitude, longitude):
+    """
+    Climate of the closest known site within SITE_MATCH_RADIUS_KM, or None.
+    
+    The result carries a 'nearest_site' entry saying whose data it is and how
+    far away that site is.
+    """
+    if SITE_MATCH_RADIUS_KM <= 0:
+        return None
+    site = site_index.nearest(latitude, longitude)
+    if site is None:
+        return None
+    return {
+        **site['data'],
+        'nearest_site': {
+            'location': site['address'],
+            'coordinates': [site['latitude'], site['longitude']],
+            'distance_km': round(site['distance_km'], 2)
+        }
+    }
+
+def site_address(site):
+    """Address string of a /weather/batch site, or None if it is given as coordinates"""
+    if isinstance(site, dict) and 'lat' in site and 'lon' in site:
+        return None
+    location_str = site.get('location') if isinstance(site, dict) else site
+    if isinstance(location_str, str) and location_str.strip():
+        return location_str
+    return None
+
+def resolve_site(site, geocoded=None):
+    """
+    Turn one /weather/batch site into a location object.
+    
+    Args:
+        site: An address string, {"location": "..."} or {"lat": ..., "lon": ...}
+        geocoded: Optional dict of address to the result of Geocoder.geocode_many
+        
+    Returns:
+        A geopy Location or LocationObj
+        
+    Raises:
+        WeatherError: If the site is malformed or cannot be geocoded
+    """
+    if isinstance(site, dict) and 'lat' in site and 'lon' in site:
+        try:
+            return LocationObj(site['lat'], site['lon'])
+        except (TypeError, ValueError):
+            raise WeatherError('lat and lon must be numbers', 400)
+    
+    location_str = site_address(site)
+    if location_str is None:
+        raise WeatherError('Each site needs a location string or lat and lon', 400)
+    
+    try:
+        if geocoded is not None and location_str in geocoded:
+            location = geocoded[location_str]
+        else:
+            location = geocode_location(location_str)
+        if isinstance(location, Exception):
+            raise location
+    except ClientDisconnected:
+        raise
+    except Exception as e:
+        raise WeatherError(f'Geocoding error: {str(e)}', 500)
+    if not location:
+        raise WeatherError(f'Could not geocode location: {location_str}', 400)
+    return location
+
+def climate_from_means(mean_values, start_date, end_date, data_source='Google Earth Engine'):
+    """
+    Convert averaged ERA5 band values into the climate summary returned by /weather.
+    
+    Args:
+        mean_values: Dict of ERA5 band name to mean value
+        start_date: First day of the averaged period
+        end_date: Last day of the averaged period
+        data_source: Label reported as 'data_source' in the response
+        
+    Returns:
+        A dict with temperature (°C), rainfall (mm), wind speed (m/s), wind
+        direction (degrees, meteorological), rain class, period and data source
+    """
+    # Extract values from the result
+    temp_kelvin = mean_values['mean_2m_air_temperature']
+    rain_m = mean_values['total_precipitation']
+    u_wind = mean_values['u_component_of_wind_10m']
+    v_wind = mean_values['v_component_of_wind_10m']
+    
+    # Convert from Kelvin to Celsius
+    temp_celsius = temp_kelvin - 273.15
+    logger.debug("Mean temperature: %.2f°C", temp_celsius)
+    
+    # Convert from m to mm
+    rain_mm = rain_m * 1000
+    logger.debug("Mean rainfall: %.2f mm", rain_mm)
+    
+    # Extract wind components
+    if u_wind is None or v_wind is None:
+        logger.warning("Wind data not available")
+        raise WeatherError('Wind data not available from Earth Engine', 500)
+    
+    logger.debug("Wind components: u=%.2f, v=%.2f", u_wind, v_wind)
+    
+    # Calculate wind speed (magnitude of the wind vector)
+    wind_speed = math.sqrt(u_wind**2 + v_wind**2)
+    
+    # Calculate wind direction in radians and convert to meteorological convention
+    # (direction FROM which the wind is blowing)
+    wind_dir_rad = math.atan2(v_wind, u_wind)
+    wind_dir_deg = (math.degrees(wind_dir_rad) + 180) % 360
+    
+    logger.debug("Wind speed: %.2f m/s, direction %.1f° (meteorological)", wind_speed, wind_dir_deg)
+    
+    # Calculate rain class - assume medium exposure by default
+    with timed('rain_class'):
+        rain_class = get_rain_class(rain_mm, wind_speed, wind_dir_rad, 'medium')
+    logger.debug("Calculated rain class: %s", rain_class)
+    
+    return {
+        'average_temperature': round(temp_celsius, 2),
+        'average_rainfall': round(rain_mm, 2),
+        'average_wind_speed': round(wind_speed, 2),
+        'average_wind_direction': round(wind_dir_deg, 1),
+        'recommended_rain_class': rain_class,
+        'period': f'{start_date} to {end_date}',
+        'data_source': data_source
+    }
+
+def weather_statistics_response(location):
+    """/weather response in statistics mode: the summary plus monthly, percentile and wind rose arrays"""
+    if WEATHER_ENGINE == 'grid':
+        return jsonify({'error': 'Statistics mode needs Earth Engine; the offline grid only holds means'}), 400
+    
+    with timed('cache_lookup'):
+        climate = statistics_cache.get(location.latitude, location.longitude)
+    cached = climate is not None
+    if not cached:
+        if not earth_engine.ready:
+            return jsonify({'error': 'Earth Engine is not ready yet. Cannot calculate weather data.'}), 503
+        try:
+            climate = fetch_climate_statistics(location.latitude, location.longitude)
+        except WeatherError as e:
+            return jsonify({'error': str(e)}), e.status_code
+        except ClientDisconnected:
+            raise
+        except Exception as e:
+            logger.exception("Error getting weather statistics")
+            return jsonify({'error': f'Earth Engine error: {str(e)}'}), 500
+        statistics_cache.put(location.latitude, location.longitude, climate)
+    
+    return json_response({
+        'location': location.address,
+        'coordinates': [location.latitude, location.longitude],
+        **climate,
+        'cached': cached
+    })
+
 @app.route('/weather', methods=['POST', 'GET', 'OPTIONS'])
 def get_weather():
-    """Get weather data for a location"""
+    """
+    Get weather data for a location.
+    
+    With ?statistics=1 (GET) or "statistics": true (POST) the response also
+    carries a 'statistics' entry with monthly means, daily percentiles, a wind
+    rose and the design rain class (see fetch_climate_statistics).
+    """
     try:
         location_str = ""
         
@@ -161,14 +857,9 @@ def get_weather():
                 return jsonify({'error': 'Please provide lat and lon parameters'}), 400
                 
             # Create a location object with the coordinates
-            class LocationObj:
-                def __init__(self, lat, lon):
-                    self.latitude = float(lat)
-                    self.longitude = float(lon)
-                    self.address = f"Coordinates: {lat}, {lon}"
-            
             location = LocationObj(lat, lon)
             location_str = f"Coordinates: {lat}, {lon}"
+            statistics = request.args.get('statistics', '').lower() in ('1', 'true', 'yes')
         else:  # POST request
             # Get location from request body
             data = request.get_json()
@@ -176,174 +867,391 @@ def get_weather():
                 return jsonify({'error': 'Please provide a location'}), 400
             
             location_str = data['location']
+            statistics = bool(data.get('statistics'))
             
             # Geocode the location
             try:
-                location = geolocator.geocode(location_str)
+                location = geocode_location(location_str)
                 if not location:
                     return jsonify({'error': f'Could not geocode location: {location_str}'}), 400
+            except ClientDisconnected:
+                raise
             except Exception as e:
                 return jsonify({'error': f'Geocoding error: {str(e)}'}), 500
         
         # Print debug information
-        print(f"Processing weather request for: {location_str}")
-        print(f"Coordinates: {location.latitude}, {location.longitude}")
+        logger.debug("Processing weather request for %s at %s, %s",
+                     location_str, location.latitude, location.longitude)
         
-        # If Earth Engine is not initialized, return an error
-        if not EE_INITIALIZED:
-            print("Earth Engine not initialized, returning error")
-            return jsonify({'error': 'Earth Engine is not initialized. Cannot calculate weather data.'}), 503
+        if statistics:
+            return weather_statistics_response(location)
         
-        # If Earth Engine is initialized, try to get real data
-        if EE_INITIALIZED:
+        # The offline grid answers in microseconds, so it bypasses the cache and Earth Engine
+        if WEATHER_ENGINE == 'grid':
             try:
-                # Create Earth Engine point
-                print(f"Creating Earth Engine point for coordinates: {location.longitude}, {location.latitude}")
-                point = ee.Geometry.Point([location.longitude, location.latitude])
-                
-                # Define date range for weather data (using a 5-year range for faster queries)
-                end_date = '2020-07-09'  # Latest date in the dataset
-                start_date = '2015-07-09'  # 5 years before the end date
-                print(f"Using 5-year climate data range: {start_date} to {end_date}")
-                
-                # Fetch dataset with optimized query - select only bands we need
-                dataset = ee.ImageCollection('ECMWF/ERA5/DAILY') \
-                            .select(['mean_2m_air_temperature', 'total_precipitation', 'u_component_of_wind_10m', 'v_component_of_wind_10m']) \
-                            .filterDate(start_date, end_date) \
-                            .filterBounds(point)
-                
-                # Check if the dataset is empty
-                dataset_size = dataset.size().getInfo()
-                print(f"Dataset size: {dataset_size} images")
-                
-                if dataset_size == 0:
-                    print("WARNING: Dataset is empty! Trying a different date range...")
-                    # Try a different date range (3 years from an earlier period)
-                    start_date = '1997-01-01'
-                    end_date = '2000-01-01'
-                    print(f"Using alternative 3-year climate data range: {start_date} to {end_date}")
-                    
-                    dataset = ee.ImageCollection('ECMWF/ERA5/DAILY') \
-                                .select(['mean_2m_air_temperature', 'total_precipitation', 'u_component_of_wind_10m', 'v_component_of_wind_10m']) \
-                                .filterDate(start_date, end_date) \
-                                .filterBounds(point)
-                    
-                    dataset_size = dataset.size().getInfo()
-                    print(f"New dataset size: {dataset_size} images")
-                    
-                    if dataset_size == 0:
-                        return jsonify({
-                            'error': 'No Earth Engine data available for this location'
-                        }), 404
-                
-                print(f"Successfully fetched dataset from Earth Engine with {dataset_size} images")
-                
-                # Get a single image from the collection (first image)
-                first_image = dataset.first()
-                
-                # Check if first_image is None
-                if first_image is None:
-                    print("ERROR: first_image is None despite dataset size > 0")
-                    return jsonify({
-                        'error': 'Earth Engine dataset is empty or invalid'
-                    }), 500
-                
-                # Print available bands to debug
-                print("Available bands:")
-                band_names = first_image.bandNames().getInfo()
-                print(band_names)
-                
-                # Create a buffer around the point to make it a small region
-                # This helps avoid CRS issues
-                buffer_distance = 1000  # 1km buffer
-                region = point.buffer(buffer_distance)
-                
+                climate = fetch_grid_climate(location.latitude, location.longitude)
+            except WeatherError as e:
+                return jsonify({'error': str(e)}), e.status_code
+            return json_response({
+                'location': location.address,
+                'coordinates': [location.latitude, location.longitude],
+                **climate,
+                'cached': False
+            })
+        
+        # Serve from the climate cache when this grid cell has been resolved before
+        with timed('cache_lookup'):
+            climate = climate_cache.get(location.latitude, location.longitude)
+        if climate is not None:
+            logger.debug("Climate cache hit")
+            return json_response({
+                'location': location.address,
+                'coordinates': [location.latitude, location.longitude],
+                **climate,
+                'cached': True
+            })
+        
+        # Otherwise reuse a site resolved close by, if there is one
+        with timed('cache_lookup'):
+            climate = nearby_climate(location.latitude, location.longitude)
+        if climate is not None:
+            logger.debug("Using climate of site %s km away", climate['nearest_site']['distance_km'])
+            return json_response({
+                'location': location.address,
+                'coordinates': [location.latitude, location.longitude],
+                **climate,
+                'cached': True
+            })
+        
+        # Until Earth Engine is ready, fall back to the offline grid if there is one
+        if not earth_engine.ready:
+            if climate_grid is None:
+                logger.debug("Earth Engine not ready, returning error")
+                return jsonify({'error': 'Earth Engine is not ready yet. Cannot calculate weather data.'}), 503
+            try:
+                climate = fetch_grid_climate(location.latitude, location.longitude)
+            except WeatherError as e:
+                return jsonify({'error': str(e)}), e.status_code
+            return json_response({
+                'location': location.address,
+                'coordinates': [location.latitude, location.longitude],
+                **climate,
+                'cached': False
+            })
+        
+        try:
+            climate = fetch_climate(location.latitude, location.longitude)
+        except WeatherError as e:
+            return jsonify({'error': str(e)}), e.status_code
+        except ClientDisconnected:
+            raise
+        except Exception as e:
+            logger.exception("Error getting weather data")
+            return jsonify({'error': f'Earth Engine error: {str(e)}'}), 500
+        
+        climate_cache.put(location.latitude, location.longitude, climate)
+        site_index.add(location.latitude, location.longitude, climate, location.address)
+        
+        # Prepare response data
+        weather_data = {
+            'location': location.address,
+            'coordinates': [location.latitude, location.longitude],
+            **climate,
+            'cached': False
+        }
+        
+        return json_response(weather_data)
+    except ClientDisconnected:
+        raise
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/weather/batch', methods=['POST', 'OPTIONS'])
+def get_weather_batch():
+    """
+    Get weather data for many sites in one request.
+    
+    Expects {"sites": [...]} where each site is an address string,
+    {"location": "..."} or {"lat": ..., "lon": ...}. Results come back in input
+    order; a site that fails carries its own 'error' and 'status' instead of
+    failing the whole batch.
+    """
+    try:
+        data = request.get_json()
+        sites = data.get('sites') if isinstance(data, dict) else None
+        if not isinstance(sites, list) or not sites:
+            return jsonify({'error': 'Please provide a non-empty list of sites'}), 400
+        if len(sites) > MAX_BATCH_SITES:
+            return jsonify({'error': f'A batch can contain at most {MAX_BATCH_SITES} sites'}), 400
+        
+        # Geocode every distinct address up front through the shared, rate-limited queue
+        addresses = list(dict.fromkeys(
+            address for address in (site_address(site) for site in sites) if address is not None
+        ))
+        with timed('geocode'):
+            lookups = {address: geocoder.submit(address) for address in addresses}
+            geocoded = {}
+            for address, lookup in lookups.items():
                 try:
-                    # Use a single reduceRegion call to get all values at once (much faster)
-                    mean_values = dataset.mean().reduceRegion(
-                        reducer=ee.Reducer.mean(),
-                        geometry=point,
-                        scale=30000,  # Scale in meters
-                        maxPixels=1e9
-                    ).getInfo()
-                    
-                    # Extract values from the result
-                    temp_kelvin = mean_values['mean_2m_air_temperature']
-                    rain_m = mean_values['total_precipitation']
-                    u_wind = mean_values['u_component_of_wind_10m']
-                    v_wind = mean_values['v_component_of_wind_10m']
-                    
-                    # Convert from Kelvin to Celsius
-                    temp_celsius = temp_kelvin - 273.15
-                    print(f"Mean temperature: {temp_celsius:.2f}°C")
-                    
-                    # Convert from m to mm
-                    rain_mm = rain_m * 1000
-                    print(f"Mean rainfall: {rain_mm:.2f} mm")
-                    
-                    print(f"Wind components: u={u_wind:.2f}, v={v_wind:.2f}")
-                    
-                    # Extract wind components
-                    if u_wind is not None and v_wind is not None:
-                        # Calculate wind speed (magnitude of the wind vector)
-                        wind_speed = math.sqrt(u_wind**2 + v_wind**2)
-                        
-                        # Calculate wind direction in radians and convert to meteorological convention
-                        # (direction FROM which the wind is blowing)
-                        wind_dir_rad = math.atan2(v_wind, u_wind)
-                        wind_dir_deg = (math.degrees(wind_dir_rad) + 180) % 360
-                        
-                        print(f"Wind speed: {wind_speed:.2f} m/s")
-                        print(f"Wind direction: {wind_dir_deg:.1f}° (meteorological)")
-                        
-                        # Calculate rain class - assume medium exposure by default
-                        rain_class = get_rain_class(rain_mm, wind_speed, wind_dir_rad, 'medium')
-                        print(f"Calculated rain class: {rain_class}")
-                    else:
-                        print("Warning: Wind data not available")
-                        return jsonify({'error': 'Wind data not available from Earth Engine'}), 500
-                except Exception as wind_error:
-                    print(f"Error calculating wind data: {wind_error}")
-                    print("Detailed error traceback:")
-                    traceback.print_exc()
-                    return jsonify({'error': f'Wind data calculation error: {str(wind_error)}'}), 500
-                
-                # Prepare response data
-                weather_data = {
+                    geocoded[address] = wait_or_cancel(lookup, request_environ())
+                except ClientDisconnected:
+                    raise
+                except Exception as e:
+                    geocoded[address] = e
+        
+        # The offline grid answers cache misses, always in grid mode and otherwise until Earth Engine is ready
+        use_grid = WEATHER_ENGINE == 'grid' or (not earth_engine.ready and climate_grid is not None)
+        results = [None] * len(sites)
+        # Sites still needing Earth Engine, grouped by cache cell so each cell is reduced once
+        pending = {}
+        
+        for index, site in enumerate(sites):
+            try:
+                location = resolve_site(site, geocoded)
+            except WeatherError as e:
+                results[index] = {'index': index, 'error': str(e), 'status': e.status_code}
+                continue
+            
+            climate = None
+            if WEATHER_ENGINE != 'grid':
+                climate = climate_cache.get(location.latitude, location.longitude)
+                if climate is None:
+                    climate = nearby_climate(location.latitude, location.longitude)
+            if climate is not None:
+                results[index] = {
+                    'index': index,
                     'location': location.address,
                     'coordinates': [location.latitude, location.longitude],
-                    'average_temperature': round(temp_celsius, 2),
-                    'average_rainfall': round(rain_mm, 2),
-                    'average_wind_speed': round(wind_speed, 2),
-                    'average_wind_direction': round(wind_dir_deg, 1),
-                    'recommended_rain_class': rain_class,
-                    'period': f'{start_date} to {end_date}',
-                    'data_source': 'Google Earth Engine'
+                    **climate,
+                    'cached': True
                 }
-                
-                return jsonify(weather_data)
-            except Exception as e:
-                print(f"Error getting weather data: {e}")
-                print(f"Detailed error type: {type(e).__name__}")
-                print("Detailed error traceback:")
-                traceback.print_exc()
-                return jsonify({'error': f'Earth Engine error: {str(e)}'}), 500
-        
-        # If Earth Engine is not initialized, return an error
-        return jsonify({'error': 'Earth Engine is not initialized'}), 503
+            else:
+                # The grid interpolates within a cell, so only identical coordinates can share a lookup
+                if use_grid:
+                    cell = (location.latitude, location.longitude)
+                else:
+                    cell = climate_cache.cell_key(location.latitude, location.longitude)
+                pending.setdefault(cell, []).append((index, location))
+        
+        logger.debug("Batch of %d sites: %d grid cells to look up", len(sites), len(pending))
+        
+        if pending:
+            cells = list(pending.values())
+            if use_grid:
+                climates = fetch_grid_climate_many([
+                    (members[0][1].latitude, members[0][1].longitude) for members in cells
+                ])
+            elif not earth_engine.ready:
+                climates = [WeatherError('Earth Engine is not ready yet. Cannot calculate weather data.', 503)] * len(cells)
+            else:
+                try:
+                    climates = fetch_climate_many([
+                        (members[0][1].latitude, members[0][1].longitude) for members in cells
+                    ])
+                except ClientDisconnected:
+                    raise
+                except Exception as e:
+                    logger.exception("Error getting batch weather data")
+                    climates = [WeatherError(f'Earth Engine error: {str(e)}', 500)] * len(cells)
+            
+            resolved = []
+            for members, climate in zip(cells, climates):
+                if not use_grid and not isinstance(climate, WeatherError):
+                    first_location = members[0][1]
+                    climate_cache.put(first_location.latitude, first_location.longitude, climate)
+                    resolved.append((first_location.latitude, first_location.longitude,
+                                     climate, first_location.address))
+                for index, location in members:
+                    if isinstance(climate, WeatherError):
+                        results[index] = {'index': index, 'error': str(climate), 'status': climate.status_code}
+                    else:
+                        results[index] = {
+                            'index': index,
+                            'location': location.address,
+                            'coordinates': [location.latitude, location.longitude],
+                            **climate,
+                            'cached': False
+                        }
+            site_index.add_many(resolved)
+        
+        return json_response({
+            'results': results,
+            'count': len(results),
+            'errors': sum(1 for result in results if 'error' in result)
+        })
+    except ClientDisconnected:
+        raise
+    except Exception as e:
+        logger.exception("Error in get_weather_batch")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/catalogue', methods=['GET', 'OPTIONS'])
+def get_catalogue():
+    """
+    Serve the louver catalogue as JSON, versioned by a hash of the CSV.
+    
+    ?format=columns (default) returns one array per column plus the velocity
+    rain class table; ?format=rows returns one object per louver keyed by the
+    CSV headers. Responses carry an ETag, and If-None-Match gets a 304.
+    """
+    try:
+        output_format = request.args.get('format', 'columns')
+        if output_format not in ('columns', 'rows'):
+            return jsonify({'error': "format must be 'columns' or 'rows'"}), 400
+        
+        catalogue = current_catalogue()
+        if catalogue.version in request.if_none_match:
+            response = make_response('', 304)
+        else:
+            with catalogue_lock:
+                body = catalogue_responses.get(output_format)
+                if body is None:
+                    payload = {'version': catalogue.version, 'count': len(catalogue)}
+                    if output_format == 'rows':
+                        payload['rows'] = catalogue.to_rows()
+                    else:
+                        payload.update(catalogue.to_columns())
+                    body = json.dumps(payload, separators=(',', ':'))
+                    catalogue_responses[output_format] = body
+            response = make_response(body)
+            response.mimetype = 'application/json'
+        
+        response.set_etag(catalogue.version)
+        # Clients may keep the catalogue but must revalidate it with the ETag
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
+        logger.exception("Error in get_catalogue")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/louvers/match', methods=['POST', 'OPTIONS'])
+def match_louvers():
+    """
+    Find louvers that meet a rain class at a design face velocity.
+    
+    Expects {"rain_class": "B", "velocity": 1.5} for one opening, or
+    {"openings": [{"rain_class": ..., "velocity": ...}, ...]} for many; an
+    optional "limit" caps the matches returned per opening. Matches are ranked
+    by Airflow Coefficient, best first.
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Please provide rain_class and velocity, or a list of openings'}), 400
+        
+        openings = data.get('openings')
+        if openings is None:
+            openings = [data]
+        if not isinstance(openings, list) or not openings:
+            return jsonify({'error': 'openings must be a non-empty list'}), 400
+        if len(openings) > MAX_MATCH_OPENINGS:
+            return jsonify({'error': f'A request can contain at most {MAX_MATCH_OPENINGS} openings'}), 400
+        
+        limit = data.get('limit')
+        if limit is not None and (isinstance(limit, bool) or not isinstance(limit, int) or limit < 0):
+            return jsonify({'error': 'limit must be a non-negative integer'}), 400
+        rain_classes = []
+        velocities = []
+        for index, opening in enumerate(openings):
+            if not isinstance(opening, dict) or 'rain_class' not in opening or 'velocity' not in opening:
+                return jsonify({'error': f'Opening {index} needs rain_class and velocity'}), 400
+            try:
+                velocities.append(float(opening['velocity']))
+            except (TypeError, ValueError):
+                return jsonify({'error': f'Opening {index} velocity must be a number'}), 400
+            rain_classes.append(opening['rain_class'])
+        
+        matcher = current_matcher()
+        try:
+            matches = matcher.match_many(rain_classes, velocities)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        results = []
+        for rain_class, velocity, positions in zip(rain_classes, velocities, matches):
+            if limit is not None:
+                positions = positions[:limit]
+            results.append({
+                'rain_class': str(rain_class).upper(),
+                'velocity': velocity,
+                'count': len(positions),
+                'louvers': [{
+                    'model': matcher.models[i],
+                    'airflow_coefficient': float(matcher.airflow_coefficients[i]),
+                    'airflow_class': int(matcher.airflow_classes[i]),
+                    'max_velocity': float(matcher.max_velocity[matcher.class_index(rain_class), i])
+                } for i in positions.tolist()]
+            })
+        
+        return jsonify({'catalogue_version': matcher.version, 'results': results})
+    except Exception as e:
+        logger.exception("Error in match_louvers")
+        return jsonify({'error': str(e)}), 500
+
+@app.errorhandler(ClientDisconnected)
+def handle_client_disconnected(error):
+    """The client is gone, so nobody reads this response; 499 follows the nginx convention"""
+    logger.debug("Client disconnected, abandoning request")
+    return '', 499
+
 @app.route('/health', methods=['GET', 'OPTIONS'])
 def health_check():
-    """Simple endpoint to check if the API is running"""
+    """Liveness, Earth Engine readiness, latency histograms and cache statistics"""
     return jsonify({
         'status': 'ok',
-        'earth_engine_initialized': EE_INITIALIZED
+        'earth_engine_initialized': earth_engine.ready,
+        'earth_engine': earth_engine.status() if WEATHER_ENGINE == 'earthengine' else {'state': 'disabled'},
+        'offline_grid': climate_grid is not None,
+        'latency': {
+            'requests': request_latency.snapshot(),
+            'earth_engine': ee_latency.snapshot()
+        },
+        'weather_engine': WEATHER_ENGINE,
+        'climate_cache': climate_cache.stats(),
+        'statistics_cache': statistics_cache.stats(),
+        'site_index': site_index.stats(),
+        'geocode_cache': geocoder.stats()
     })
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Latency histograms and cache counters in the Prometheus text format"""
+    caches = {
+        'climate': climate_cache.stats(),
+        'statistics': statistics_cache.stats(),
+        'site_index': site_index.stats(),
+        'geocode': geocoder.stats()
+    }
+    lines = [
+        *prometheus_histogram('weather_api_request_duration_seconds', 'Request latency by route',
+                              request_latency, label='route'),
+        *prometheus_histogram('weather_api_stage_duration_seconds', 'Time spent in each stage of a request',
+                              stage_latency, label='stage'),
+        *prometheus_histogram('weather_api_earth_engine_call_duration_seconds',
+                              'Latency of Earth Engine getInfo() calls', ee_latency),
+        *prometheus_histogram('weather_api_earth_engine_probe_duration_seconds',
+                              'Latency of Earth Engine liveness probes', earth_engine.probe_latency),
+        *prometheus_metric('weather_api_earth_engine_ready', 'gauge',
+                           '1 while Earth Engine answers its liveness probe', [({}, earth_engine.ready)]),
+        *prometheus_metric('weather_api_cache_hits_total', 'counter', 'Cache hits by cache',
+                           [({'cache': name}, stats['hits']) for name, stats in caches.items()]),
+        *prometheus_metric('weather_api_cache_misses_total', 'counter', 'Cache misses by cache',
+                           [({'cache': name}, stats['misses']) for name, stats in caches.items()]),
+        *prometheus_metric('weather_api_geocoder_backend_calls_total', 'counter',
+                           'Lookups sent to the geocoding service', [({}, caches['geocode']['backend_calls'])]),
+    ]
+    response = make_response('\n'.join(lines) + '\n')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
 # Start the Flask server
 if __name__ == '__main__':
-    print("Starting Flask server for weather API...")
-    print(f"Earth Engine initialized: {EE_INITIALIZED}")
-    app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
+    logger.info("Starting Flask server for weather API...")
+    logger.info("Earth Engine: %s (initializing in the background)", earth_engine.state)
+    # WEATHER_SERVER=pooled serves requests concurrently on a bounded thread pool;
+    # the default is Flask's single-threaded development server
+    if os.environ.get('WEATHER_SERVER', 'dev') == 'pooled':
+        run_pooled(app, host='0.0.0.0', port=5000, workers=int(os.environ.get('WEATHER_SERVER_WORKERS', '32')),
+                   max_pending=int(os.environ.get('WEATHER_SERVER_MAX_PENDING', '64')))
+    else:
+        app.run(debug=True, port=5000, host='0.0.0.0')